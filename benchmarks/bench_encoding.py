@@ -0,0 +1,112 @@
+"""工具结果编码耗时对比
+
+对替身服务生成的合成日志（tests/standin.py）构造 {"data": [...], "message": "success"} 形式的工具结果，
+分别统计 FastMCP 默认转换（pydantic，缩进 2 个空格）和 ResultEncoder 各编码器的：
+
+- p50_ms: 单次编码的耗时中位数
+- bytes: 编码后的文本长度（UTF-8 字节数）
+- memo_p50_ms: 同一个结果对象再次编码（命中按对象缓存的编码结果）的耗时中位数
+
+orjson/msgspec 未安装时跳过。
+
+    python -m benchmarks.bench_encoding --rows 1000,10000 --runs 20
+"""
+
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+import time
+from importlib.metadata import version as package_version
+from pathlib import Path
+from typing import Any, Callable
+
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server_aliyun_observability.encoding import ResultEncoder
+from tests.standin import StandinConfig, StandinData
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+
+def timed(func: Callable[[], Any], runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(timings), 3)
+
+
+def fastmcp_convert() -> Callable[[Any], str]:
+    server = FastMCP(name="bench")
+
+    @server.tool()
+    def query() -> dict:
+        return {}
+
+    convert = server._tool_manager.get_tool("query").fn_metadata.convert_result
+    return lambda result: convert(result)[0].text
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="tool result encoding benchmark")
+    parser.add_argument("--rows", default="1000,10000", help="comma separated row counts")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--output", help="result file, default benchmarks/results/encoding-<version>.json")
+    args = parser.parse_args()
+
+    results = []
+    for rows in [int(value) for value in args.rows.split(",")]:
+        data = StandinData(StandinConfig(rows=rows)).logs(1700000000, 1700000900, rows)
+        result = {"data": data, "message": "success"}
+        convert = fastmcp_convert()
+        text = convert(result)
+        results.append(
+            {
+                "encoder": "fastmcp",
+                "rows": rows,
+                "p50_ms": timed(lambda: convert(result), args.runs),
+                "bytes": len(text.encode("utf-8")),
+                "memo_p50_ms": None,
+            }
+        )
+        for name in ("pydantic", "orjson", "msgspec"):
+            if name != "pydantic" and importlib.util.find_spec(name) is None:
+                continue
+            encoder = ResultEncoder(name)
+            encoded = encoder.encode(result)
+            assert json.loads(encoded) == json.loads(text)
+            encoder.encode(result, cacheable=True)
+            results.append(
+                {
+                    "encoder": name,
+                    "rows": rows,
+                    "p50_ms": timed(lambda: encoder.encode(result), args.runs),
+                    "bytes": len(encoded.encode("utf-8")),
+                    "memo_p50_ms": timed(lambda: encoder.encode(result, cacheable=True), args.runs),
+                }
+            )
+        for item in results[-4:]:
+            if item["rows"] == rows:
+                print(
+                    f"rows={rows:>6} {item['encoder']:>8}: p50 {item['p50_ms']:8.3f}ms "
+                    f"bytes {item['bytes']:>10} memo {item['memo_p50_ms'] or '-'}"
+                )
+
+    version = package_version("mcp-server-aliyun-observability")
+    output = Path(args.output) if args.output else RESULTS_DIR / f"encoding-{version}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(
+        json.dumps(
+            {"version": version, "python": sys.version.split()[0], "runs": args.runs, "results": results},
+            indent=2,
+        )
+    )
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""冷启动耗时分析
+
+stdio 模式下 MCP 客户端每个会话都会拉起一个新进程，启动耗时直接影响首次响应。本脚本在全新的子进程中
+分阶段统计启动耗时，并通过 -X importtime 列出累计导入耗时最高的模块：
+
+- import_package_ms: 导入入口包（命令行解析所需的依赖）
+- import_server_ms: 导入 server 模块（MCP Server 和各 toolkit）
+- init_server_ms: 创建 FastMCP 应用并注册全部工具
+- cli_help_ms: 执行 `python -m mcp_server_aliyun_observability --help` 的总耗时
+- sdk_modules: 启动完成时已加载的阿里云 SDK 模块数，应为 0（SDK 在首次调用工具时才导入）
+
+    python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --budget-ms 800
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from importlib.metadata import version as package_version
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+SDK_PREFIXES = ("alibabacloud_", "Tea", "darabonba")
+
+_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import mcp_server_aliyun_observability
+package = time.perf_counter()
+from mcp_server_aliyun_observability.server import init_server
+server = time.perf_counter()
+init_server()
+ready = time.perf_counter()
+print(json.dumps({{
+    "import_package_ms": (package - started) * 1000,
+    "import_server_ms": (server - package) * 1000,
+    "init_server_ms": (ready - server) * 1000,
+    "total_ms": (ready - started) * 1000,
+    "sdk_modules": sorted(m for m in sys.modules if m.startswith({SDK_PREFIXES!r})),
+}}))
+"""
+
+
+def probe() -> dict[str, Any]:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def cli_help() -> float:
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "mcp_server_aliyun_observability", "--help"],
+        cwd=ROOT,
+        capture_output=True,
+        check=True,
+    )
+    return (time.perf_counter() - started) * 1000
+
+
+def top_imports(limit: int) -> list[dict[str, Any]]:
+    """解析 -X importtime 输出，返回累计耗时最高的模块"""
+    stderr = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            "from mcp_server_aliyun_observability.server import init_server",
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:") :].split("|")
+        if not fields[0].strip().isdigit():
+            continue
+        modules.append(
+            {
+                "module": fields[2].strip(),
+                "self_ms": int(fields[0]) / 1000,
+                "cumulative_ms": int(fields[1]) / 1000,
+            }
+        )
+    return sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="cold start profiling")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=20, help="number of slowest imports to report")
+    parser.add_argument("--budget-ms", type=float, help="fail if median total_ms exceeds budget")
+    parser.add_argument("--output", help="result file, default benchmarks/results/startup-<version>.json")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    phases = ["import_package_ms", "import_server_ms", "init_server_ms", "total_ms"]
+    result = {
+        "version": package_version("mcp-server-aliyun-observability"),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        **{
+            phase: round(statistics.median(run[phase] for run in runs), 3)
+            for phase in phases
+        },
+        "cli_help_ms": round(statistics.median(cli_help() for _ in range(args.runs)), 3),
+        "sdk_modules": runs[0]["sdk_modules"],
+        "top_imports": top_imports(args.top),
+    }
+
+    output = (
+        Path(args.output) if args.output else RESULTS_DIR / f"startup-{result['version']}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2))
+    for phase in phases + ["cli_help_ms"]:
+        print(f"{phase:>20}: {result[phase]:.1f}")
+    print(f"{'sdk_modules':>20}: {len(result['sdk_modules'])}")
+    print(f"results written to {output}")
+
+    if args.budget_ms is not None and result["total_ms"] > args.budget_ms:
+        print(f"cold start {result['total_ms']:.1f}ms exceeds budget {args.budget_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
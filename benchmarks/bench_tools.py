@@ -0,0 +1,379 @@
+"""端到端工具调用基准测试
+
+以子进程方式启动真实的 MCP Server（init_server 创建的 FastMCP 应用），上游指向本地替身服务
+（tests/standin.py，可注入延迟），分别通过 streamable-http 和 stdio 传输并发调用工具，统计：
+
+- 各工具在不同并发度下的 p50/p95/p99 延迟和整体吞吐
+- 每个在途请求占用的内存（服务进程 RSS 峰值相对空闲时的增量 / 并发度，仅 Linux）
+- 启动耗时（从拉起进程到 initialize 完成、到 list_tools 完成）
+
+结果写入 benchmarks/results/<version>.json，可通过 --baseline 与之前版本的结果对比：
+
+    python -m benchmarks.bench_tools --latency-ms 50 --concurrency 1,4,16,64
+    python -m benchmarks.bench_tools --baseline benchmarks/results/0.2.9.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from importlib.metadata import version as package_version
+from pathlib import Path
+from typing import Any, AsyncIterator, Optional
+
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+NOW = int(time.time())
+TOOL_CALLS: list[tuple[str, dict[str, Any]]] = [
+    ("sls_list_projects", {"projectName": "standin", "limit": 10, "regionId": "cn-hangzhou"}),
+    (
+        "sls_list_logstores",
+        {"project": "standin-project-0", "limit": 10, "regionId": "cn-hangzhou"},
+    ),
+    (
+        "sls_execute_sql_query",
+        {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "query": "* | select count(*) as total",
+            "fromTimestampInSeconds": NOW - 3600,
+            "toTimestampInSeconds": NOW,
+            "limit": 100,
+            "regionId": "cn-hangzhou",
+        },
+    ),
+    ("arms_search_apps", {"appNameQuery": "standin-app", "regionId": "cn-hangzhou"}),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"port {port} not ready after {timeout}s")
+
+
+def _rss_bytes(pid: Optional[int]) -> Optional[int]:
+    """读取进程 RSS，仅支持 Linux"""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+def _child_pids() -> set[int]:
+    pids: set[int] = set()
+    try:
+        for task in os.listdir(f"/proc/{os.getpid()}/task"):
+            with open(f"/proc/{os.getpid()}/task/{task}/children") as f:
+                pids.update(int(pid) for pid in f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _summarize(latencies: list[float]) -> dict[str, Any]:
+    return {
+        "count": len(latencies),
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+    }
+
+
+def _server_args(standin_endpoint: str) -> list[str]:
+    return [
+        "-m",
+        "mcp_server_aliyun_observability",
+        "--access-key-id",
+        "standin",
+        "--access-key-secret",
+        "standin",
+        "--log-level",
+        "WARNING",
+        "--sls-endpoint",
+        standin_endpoint,
+        "--arms-endpoint",
+        standin_endpoint,
+    ]
+
+
+@asynccontextmanager
+async def _http_session(standin_endpoint: str) -> AsyncIterator[tuple[ClientSession, Optional[int]]]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable]
+        + _server_args(standin_endpoint)
+        + ["--transport", "streamable-http", "--transport-port", str(port), "--host", "127.0.0.1"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(port)
+        async with streamablehttp_client(f"http://127.0.0.1:{port}/mcp") as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                yield session, process.pid
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+@asynccontextmanager
+async def _stdio_session(standin_endpoint: str) -> AsyncIterator[tuple[ClientSession, Optional[int]]]:
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=_server_args(standin_endpoint),
+        cwd=str(ROOT),
+    )
+    existing = _child_pids()
+    async with stdio_client(params, errlog=open(os.devnull, "w")) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            spawned = _child_pids() - existing
+            yield session, next(iter(spawned)) if len(spawned) == 1 else None
+
+
+async def _run_level(
+    session: ClientSession, pid: Optional[int], concurrency: int, requests: int
+) -> dict[str, Any]:
+    latencies: dict[str, list[float]] = {name: [] for name, _ in TOOL_CALLS}
+    errors = 0
+    idle_rss = _rss_bytes(pid)
+    peak_rss = idle_rss
+    counter = iter(range(requests))
+    done = asyncio.Event()
+
+    async def sample_rss() -> None:
+        nonlocal peak_rss
+        while not done.is_set():
+            rss = _rss_bytes(pid)
+            if rss is not None and (peak_rss is None or rss > peak_rss):
+                peak_rss = rss
+            await asyncio.sleep(0.01)
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in counter:
+            name, arguments = TOOL_CALLS[index % len(TOOL_CALLS)]
+            started = time.perf_counter()
+            result = await session.call_tool(name, arguments)
+            latencies[name].append(time.perf_counter() - started)
+            if result.isError:
+                errors += 1
+
+    sampler = asyncio.create_task(sample_rss())
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await sampler
+
+    memory_per_request = None
+    if idle_rss is not None and peak_rss is not None:
+        memory_per_request = max(peak_rss - idle_rss, 0) // concurrency
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2),
+        "memory_per_inflight_bytes": memory_per_request,
+        "tools": {name: _summarize(values) for name, values in latencies.items() if values},
+    }
+
+
+async def bench_transport(
+    transport: str, standin_endpoint: str, levels: list[int], requests_per_worker: int
+) -> list[dict[str, Any]]:
+    open_session = _http_session if transport == "streamable-http" else _stdio_session
+    results = []
+    async with open_session(standin_endpoint) as (session, pid):
+        # 预热，避免首次调用的导入和连接建立开销计入结果
+        for name, arguments in TOOL_CALLS:
+            await session.call_tool(name, arguments)
+        for concurrency in levels:
+            level = await _run_level(
+                session, pid, concurrency, max(concurrency * requests_per_worker, 20)
+            )
+            print(
+                f"[{transport}] concurrency={concurrency} "
+                f"throughput={level['throughput_rps']} rps errors={level['errors']}",
+                file=sys.stderr,
+            )
+            results.append(level)
+    return results
+
+
+async def bench_startup(standin_endpoint: str, runs: int) -> dict[str, Any]:
+    initialize: list[float] = []
+    list_tools: list[float] = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        async with _stdio_session(standin_endpoint) as (session, _):
+            initialize.append(time.perf_counter() - started)
+            await session.list_tools()
+            list_tools.append(time.perf_counter() - started)
+    return {
+        "runs": runs,
+        "initialize_ms": round(statistics.median(initialize) * 1000, 3),
+        "list_tools_ms": round(statistics.median(list_tools) * 1000, 3),
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """对比两次结果，返回超过阈值的退化项"""
+    regressions = []
+
+    def check(label: str, now: Optional[float], before: Optional[float], higher_is_worse: bool = True):
+        if not now or not before:
+            return
+        change = (now - before) / before if higher_is_worse else (before - now) / before
+        if change > threshold:
+            regressions.append(f"{label}: {before} -> {now} ({change:+.1%})")
+
+    check(
+        "startup.initialize_ms",
+        current["startup"]["initialize_ms"],
+        baseline.get("startup", {}).get("initialize_ms"),
+    )
+    for transport, levels in current["transports"].items():
+        previous = {
+            level["concurrency"]: level
+            for level in baseline.get("transports", {}).get(transport, [])
+        }
+        for level in levels:
+            before = previous.get(level["concurrency"])
+            if before is None:
+                continue
+            prefix = f"{transport}.c{level['concurrency']}"
+            check(
+                f"{prefix}.throughput_rps",
+                level["throughput_rps"],
+                before["throughput_rps"],
+                higher_is_worse=False,
+            )
+            for tool, stats in level["tools"].items():
+                if tool in before["tools"]:
+                    check(f"{prefix}.{tool}.p95_ms", stats["p95_ms"], before["tools"][tool]["p95_ms"])
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    standin_port = _free_port()
+    standin = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "tests.standin",
+            "--port",
+            str(standin_port),
+            "--latency-ms",
+            str(args.latency_ms),
+            "--latency-jitter-ms",
+            str(args.latency_jitter_ms),
+            "--rows",
+            str(args.rows),
+        ],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        _wait_for_port(standin_port)
+        endpoint = f"proxy://127.0.0.1:{standin_port}"
+        levels = [int(level) for level in args.concurrency.split(",")]
+        return {
+            "version": package_version("mcp-server-aliyun-observability"),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "config": {
+                "latency_ms": args.latency_ms,
+                "latency_jitter_ms": args.latency_jitter_ms,
+                "rows": args.rows,
+                "concurrency": levels,
+                "requests_per_worker": args.requests_per_worker,
+            },
+            "startup": await bench_startup(endpoint, args.startup_runs),
+            "transports": {
+                transport: await bench_transport(
+                    transport, endpoint, levels, args.requests_per_worker
+                )
+                for transport in args.transports.split(",")
+            },
+        }
+    finally:
+        standin.terminate()
+        standin.wait(timeout=10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="end-to-end tool dispatch benchmark")
+    parser.add_argument("--transports", default="streamable-http,stdio")
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--requests-per-worker", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--startup-runs", type=int, default=5)
+    parser.add_argument("--output", help="result file, default benchmarks/results/<version>.json")
+    parser.add_argument("--baseline", help="previous result file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="regression threshold")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{result['version']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"results written to {output}")
+
+    if args.baseline:
+        regressions = compare(result, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
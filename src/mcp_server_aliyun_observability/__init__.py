@@ -1,89 +1,8 @@
-import os
-import sys
-
-from alibabacloud_credentials.provider import StaticAKCredentialsProvider, EcsRamRoleCredentialsProvider, \
-    RamRoleArnCredentialsProvider, OIDCRoleArnCredentialsProvider, StaticSTSCredentialsProvider
-from alibabacloud_credentials.exceptions import CredentialException
-from alibabacloud_credentials import provider
-
-def _get_credentials_provider(self, config, profile_name):
-        if profile_name is None or profile_name == '':
-            raise CredentialException('invalid profile name')
-
-        profiles = config.get('profiles', [])
-
-        if not profiles:
-            raise CredentialException(f"unable to get profile with '{profile_name}' form cli credentials file.")
-
-        for profile in profiles:
-            if profile.get('name') is not None and profile['name'] == profile_name:
-                mode = profile.get('mode')
-                if mode == "AK":
-                    return StaticAKCredentialsProvider(
-                        access_key_id=profile.get('access_key_id'),
-                        access_key_secret=profile.get('access_key_secret')
-                    )
-                elif mode == "StsToken" or mode == "CloudSSO":
-                    return StaticSTSCredentialsProvider(
-                        access_key_id=profile.get('access_key_id'),
-                        access_key_secret=profile.get('access_key_secret'),
-                        security_token=profile.get('sts_token')
-                    )
-                elif mode == "RamRoleArn":
-                    pre_provider = StaticAKCredentialsProvider(
-                        access_key_id=profile.get('access_key_id'),
-                        access_key_secret=profile.get('access_key_secret')
-                    )
-                    return RamRoleArnCredentialsProvider(
-                        credentials_provider=pre_provider,
-                        role_arn=profile.get('ram_role_arn'),
-                        role_session_name=profile.get('ram_session_name'),
-                        duration_seconds=profile.get('expired_seconds'),
-                        policy=profile.get('policy'),
-                        external_id=profile.get('external_id'),
-                        sts_region_id=profile.get('sts_region'),
-                        enable_vpc=profile.get('enable_vpc'),
-                    )
-                elif mode == "EcsRamRole":
-                    return EcsRamRoleCredentialsProvider(
-                        role_name=profile.get('ram_role_name')
-                    )
-                elif mode == "OIDC":
-                    return OIDCRoleArnCredentialsProvider(
-                        role_arn=profile.get('ram_role_arn'),
-                        oidc_provider_arn=profile.get('oidc_provider_arn'),
-                        oidc_token_file_path=profile.get('oidc_token_file'),
-                        role_session_name=profile.get('role_session_name'),
-                        duration_seconds=profile.get('expired_seconds'),
-                        policy=profile.get('policy'),
-                        sts_region_id=profile.get('sts_region'),
-                        enable_vpc=profile.get('enable_vpc'),
-                    )
-                elif mode == "ChainableRamRoleArn":
-                    previous_provider = self._get_credentials_provider(config, profile.get('source_profile'))
-                    return RamRoleArnCredentialsProvider(
-                        credentials_provider=previous_provider,
-                        role_arn=profile.get('ram_role_arn'),
-                        role_session_name=profile.get('ram_session_name'),
-                        duration_seconds=profile.get('expired_seconds'),
-                        policy=profile.get('policy'),
-                        external_id=profile.get('external_id'),
-                        sts_region_id=profile.get('sts_region'),
-                        enable_vpc=profile.get('enable_vpc'),
-                    )
-                else:
-                    raise CredentialException(f"unsupported profile mode '{mode}' form cli credentials file.")
-
-        raise CredentialException(f"unable to get profile with '{profile_name}' form cli credentials file.")
-
-provider.cli_profile.CLIProfileCredentialsProvider._get_credentials_provider = _get_credentials_provider
-
 import click
 import dotenv
-from typing import Dict
 
-from mcp_server_aliyun_observability.server import server
-from mcp_server_aliyun_observability.utils import CredentialWrapper
+# 入口模块只导入命令行解析所需的轻量依赖，MCP Server、各 toolkit 和阿里云 SDK 在 main 中按需导入，
+# 缩短 stdio 模式下每次拉起进程的启动耗时
 dotenv.load_dotenv()
 
 
@@ -124,6 +43,81 @@ dotenv.load_dotenv()
 )
 @click.option("--log-level", type=str, help="log level", default="INFO")
 @click.option("--transport-port", type=int, help="transport port", default=8000)
+@click.option(
+    "--sls-endpoint",
+    type=str,
+    help="override sls endpoint, like '{region}-intranet.log.aliyuncs.com' or 'http://127.0.0.1:18080'",
+    required=False,
+    envvar="MCP_SLS_ENDPOINT",
+)
+@click.option(
+    "--arms-endpoint",
+    type=str,
+    help="override arms endpoint, like 'arms-vpc.{region}.aliyuncs.com' or 'http://127.0.0.1:18080'",
+    required=False,
+    envvar="MCP_ARMS_ENDPOINT",
+)
+@click.option(
+    "--toolkits",
+    type=str,
+    help="comma separated toolkits or tools to enable, like 'sls,arms' or 'sls.sls_execute_sql_query,util', default all",
+    required=False,
+    envvar="MCP_TOOLKITS",
+)
+@click.option(
+    "--toolkits-config",
+    type=str,
+    help="toolkits config file path, json like {\"toolkits\": [\"sls\", \"arms.arms_search_apps\"]}",
+    required=False,
+)
+@click.option(
+    "--compact-tool-descriptions",
+    is_flag=True,
+    help="return compact tool descriptions in tools/list to reduce payload and context size",
+    envvar="MCP_COMPACT_TOOL_DESCRIPTIONS",
+)
+@click.option(
+    "--cache-dir",
+    type=str,
+    help="directory of the persistent result cache for GetLogs/GetIndex/CallAiTools, shared by processes on the same host, default disabled",
+    required=False,
+    envvar="MCP_CACHE_DIR",
+)
+@click.option(
+    "--cache-max-mb",
+    type=click.IntRange(min=1),
+    help="max size of the persistent result cache in MB",
+    default=256,
+    envvar="MCP_CACHE_MAX_MB",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=1),
+    help="number of worker processes for sse/streamable-http transport, sharing the listening port",
+    default=1,
+    envvar="MCP_WORKERS",
+)
+@click.option(
+    "--export-dir",
+    type=str,
+    help="directory where sls_export_query_results writes parquet/arrow files, the tool is unavailable if not set",
+    required=False,
+    envvar="MCP_EXPORT_DIR",
+)
+@click.option(
+    "--sls-compression",
+    type=click.Choice(["none", "lz4", "zstd", "gzip"]),
+    help="compression of log query responses, uses GetLogsV2 when enabled",
+    default="none",
+    envvar="MCP_SLS_COMPRESSION",
+)
+@click.option(
+    "--result-encoder",
+    type=click.Choice(["fastmcp", "pydantic", "orjson", "msgspec"]),
+    help="json encoder for tool results, fastmcp keeps the default indented output",
+    default="fastmcp",
+    envvar="MCP_RESULT_ENCODER",
+)
 def main(
     access_key_id,
     access_key_secret,
@@ -133,8 +127,30 @@ def main(
     log_level,
     transport_port,
     host,
+    sls_endpoint,
+    arms_endpoint,
+    toolkits,
+    toolkits_config,
+    compact_tool_descriptions,
+    cache_dir,
+    cache_max_mb,
+    workers,
+    export_dir,
+    sls_compression,
+    result_encoder,
 ):
-    
+    from mcp_server_aliyun_observability.server import (
+        load_toolkits_config,
+        parse_toolkits,
+        server,
+    )
+    from mcp_server_aliyun_observability.utils import CredentialWrapper
+
+    if workers > 1 and transport == "stdio":
+        raise click.BadParameter(
+            "multiple workers require sse or streamable-http transport", param_hint="--workers"
+        )
+
     if access_key_id and access_key_secret:
         credential = CredentialWrapper(
             access_key_id, access_key_secret, knowledge_config, security_token
@@ -142,4 +158,31 @@ def main(
     else:
         credential = None
 
-    server(credential, transport, log_level, transport_port, host=host)
+    selected_toolkits = None
+    if toolkits_config:
+        selected_toolkits = load_toolkits_config(toolkits_config)
+    if toolkits:
+        selected_toolkits = (selected_toolkits or []) + toolkits.split(",")
+    if selected_toolkits is not None:
+        try:
+            parse_toolkits(selected_toolkits)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--toolkits")
+
+    server(
+        credential,
+        transport,
+        log_level,
+        transport_port,
+        host=host,
+        sls_endpoint=sls_endpoint,
+        arms_endpoint=arms_endpoint,
+        toolkits=selected_toolkits,
+        compact_tool_descriptions=compact_tool_descriptions,
+        cache_dir=cache_dir,
+        cache_max_mb=cache_max_mb,
+        workers=workers,
+        export_dir=export_dir,
+        sls_compression=None if sls_compression == "none" else sls_compression,
+        result_encoder=result_encoder,
+    )
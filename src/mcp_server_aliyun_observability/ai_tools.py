@@ -0,0 +1,384 @@
+import asyncio
+import codecs
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+from mcp.server.fastmcp import Context
+
+from mcp_server_aliyun_observability.disk_cache import CALL_AI_TOOLS_TTL, get_result_cache
+from mcp_server_aliyun_observability.logger import log_warning
+
+if TYPE_CHECKING:
+    from alibabacloud_sls20201230.client import Client as SLSClient
+    from alibabacloud_sls20201230.models import CallAiToolsRequest
+    from alibabacloud_tea_util.models import RuntimeOptions
+
+ANSWER_MARKER = "------answer------\n"
+
+# utils.append_current_time 在问题前添加的当前时间
+_CURRENT_TIME_PREFIX = re.compile(r"^当前时间: \{.*?\},问题:", re.DOTALL)
+
+
+def _marker_prefix_length(text: str) -> int:
+    """text 的末尾与 ANSWER_MARKER 开头重合的最大长度"""
+    for length in range(min(len(text), len(ANSWER_MARKER) - 1), 0, -1):
+        if text.endswith(ANSWER_MARKER[:length]):
+            return length
+    return 0
+
+
+class AnswerExtractor:
+    """从 CallAiTools 的响应中增量提取答案
+
+    响应内容为 "思考过程 + ANSWER_MARKER + 答案"，与原先 split(ANSWER_MARKER)[1] 的语义一致：
+    - 出现标记之前的内容先缓存，标记出现后逐段输出答案
+    - 再次出现标记时答案结束
+    - 直到响应结束都没有标记时，整个响应即为答案
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._pending = ""
+        self._started = False
+        self._ended = False
+        self.answer = ""
+
+    def feed(self, chunk: bytes) -> str:
+        """输入一段响应，返回新增的答案内容"""
+        return self._consume(self._decoder.decode(chunk))
+
+    def finish(self) -> str:
+        """响应结束，返回剩余的答案内容"""
+        text = self._consume(self._decoder.decode(b"", final=True))
+        if not self._started:
+            # 没有答案标记，整个响应即为答案
+            self._started = True
+            text, self._pending = self._pending, ""
+            self.answer = text
+            return text
+        if not self._ended and self._pending:
+            text += self._pending
+            self.answer += self._pending
+            self._pending = ""
+        return text
+
+    def _consume(self, text: str) -> str:
+        if self._ended or not text:
+            return ""
+        self._pending += text
+        if not self._started:
+            index = self._pending.find(ANSWER_MARKER)
+            if index < 0:
+                return ""
+            self._started = True
+            self._pending = self._pending[index + len(ANSWER_MARKER) :]
+        index = self._pending.find(ANSWER_MARKER)
+        if index >= 0:
+            output, self._pending = self._pending[:index], ""
+            self._ended = True
+        else:
+            # 末尾可能是被截断的下一个标记，留到下一段再判断
+            keep = _marker_prefix_length(self._pending)
+            split = len(self._pending) - keep
+            output, self._pending = self._pending[:split], self._pending[split:]
+        self.answer += output
+        return output
+
+
+# 构造流式请求时读取的 SDK 客户端内部属性
+_STREAM_CLIENT_ATTRIBUTES = (
+    "get_rpc_headers",
+    "_spi",
+    "_product_id",
+    "_protocol",
+    "_method",
+    "_credential",
+    "_signature_version",
+    "_signature_algorithm",
+    "_user_agent",
+    "_region_id",
+    "_endpoint",
+    "_endpoint_rule",
+    "_endpoint_map",
+    "_endpoint_type",
+    "_network",
+    "_suffix",
+    "_attribute_map",
+    "_key",
+    "_cert",
+    "_ca",
+    "_read_timeout",
+    "_connect_timeout",
+    "_http_proxy",
+    "_https_proxy",
+    "_no_proxy",
+    "_tls_min_version",
+)
+
+
+class CallAiToolsStream:
+    """以流式方式调用 CallAiTools
+
+    请求的构造和签名与 SDK 的 call_ai_tools_with_options 相同（经过 SLS Gateway 签名），
+    区别在于响应不会整体读入内存，而是在数据到达时逐段返回。流式请求不做 SDK 层的重试。
+    构造请求依赖 SDK 的内部实现，使用前通过 supported 检查，不支持时改用 call_ai_tools_with_options。
+    """
+
+    @staticmethod
+    def supported(sls_client: "SLSClient") -> bool:
+        """SDK 是否提供构造流式请求所依赖的内部属性和方法（SDK 的私有实现，不同版本可能不同）"""
+        try:
+            from alibabacloud_gateway_spi import models as spi_models
+            from alibabacloud_tea_openapi.utils import Utils
+            from darabonba.core import DaraCore
+            from darabonba.request import DaraRequest  # noqa: F401
+        except ImportError:
+            return False
+        if not callable(getattr(DaraCore, "do_sse_action", None)) or not callable(
+            getattr(Utils, "get_user_agent", None)
+        ):
+            return False
+        if not all(
+            hasattr(spi_models, name)
+            for name in (
+                "InterceptorContext",
+                "InterceptorContextRequest",
+                "InterceptorContextConfiguration",
+                "InterceptorContextResponse",
+                "AttributeMap",
+            )
+        ):
+            return False
+        if not all(hasattr(sls_client, name) for name in _STREAM_CLIENT_ATTRIBUTES):
+            return False
+        spi = sls_client._spi
+        return all(
+            callable(getattr(spi, name, None))
+            for name in ("modify_configuration", "modify_request", "modify_response")
+        )
+
+    def __init__(
+        self,
+        sls_client: "SLSClient",
+        request: "CallAiToolsRequest",
+        runtime: "RuntimeOptions",
+    ):
+        from alibabacloud_gateway_spi import models as spi_models
+        from alibabacloud_tea_openapi.utils import Utils
+        from darabonba.core import DaraCore
+        from darabonba.request import DaraRequest
+
+        body: Dict[str, Any] = {}
+        if request.params is not None:
+            body["params"] = request.params
+        if request.region_id is not None:
+            body["regionId"] = request.region_id
+        if request.tool_name is not None:
+            body["toolName"] = request.tool_name
+
+        client = sls_client
+        interceptor_context = spi_models.InterceptorContext(
+            request=spi_models.InterceptorContextRequest(
+                headers=dict(client.get_rpc_headers() or {}),
+                query={},
+                body=body,
+                pathname="/ml/tool/call",
+                product_id=client._product_id,
+                action="CallAiTools",
+                version="2020-12-30",
+                protocol=client._protocol or "HTTPS",
+                method=client._method or "POST",
+                auth_type="AK",
+                body_type="string",
+                req_body_type="json",
+                style="ROA",
+                credential=client._credential,
+                signature_version=client._signature_version,
+                signature_algorithm=client._signature_algorithm,
+                user_agent=Utils.get_user_agent(client._user_agent),
+            ),
+            configuration=spi_models.InterceptorContextConfiguration(
+                region_id=client._region_id,
+                endpoint=client._endpoint,
+                endpoint_rule=client._endpoint_rule,
+                endpoint_map=client._endpoint_map,
+                endpoint_type=client._endpoint_type,
+                network=client._network,
+                suffix=client._suffix,
+            ),
+        )
+        attribute_map = client._attribute_map or spi_models.AttributeMap()
+        client._spi.modify_configuration(interceptor_context, attribute_map)
+        client._spi.modify_request(interceptor_context, attribute_map)
+
+        http_request = DaraRequest()
+        http_request.protocol = interceptor_context.request.protocol
+        http_request.method = interceptor_context.request.method
+        http_request.pathname = interceptor_context.request.pathname
+        http_request.query = interceptor_context.request.query
+        http_request.body = interceptor_context.request.stream
+        http_request.headers = interceptor_context.request.headers
+        response = DaraCore.do_sse_action(
+            http_request,
+            {
+                "key": runtime.key or client._key,
+                "cert": runtime.cert or client._cert,
+                "ca": runtime.ca or client._ca,
+                "readTimeout": runtime.read_timeout or client._read_timeout,
+                "connectTimeout": runtime.connect_timeout or client._connect_timeout,
+                "httpProxy": runtime.http_proxy or client._http_proxy,
+                "httpsProxy": runtime.https_proxy or client._https_proxy,
+                "noProxy": runtime.no_proxy or client._no_proxy,
+                "ignoreSSL": runtime.ignore_ssl,
+                "tlsMinVersion": client._tls_min_version,
+            },
+        )
+        self._body = response.body
+        self.headers: Dict[str, str] = response.headers
+        if response.status_code >= 400:
+            # 错误响应交给 Gateway 解析，抛出与 SDK 相同的异常
+            interceptor_context.response = spi_models.InterceptorContextResponse(
+                status_code=response.status_code,
+                headers=response.headers,
+                body=self._body.response.content,
+            )
+            client._spi.modify_response(interceptor_context, attribute_map)
+
+    @property
+    def request_id(self) -> str:
+        return self.headers.get("x-log-requestid", "")
+
+    def __iter__(self) -> Iterator[bytes]:
+        try:
+            # chunk_size 为 None 时按服务端发送的 chunk 返回，不等待凑满缓冲区
+            for chunk in self._body.response.iter_content(chunk_size=None):
+                if chunk:
+                    yield chunk
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        # 只关闭本次响应的连接，SDK 的 close 会一并关闭共享的 HTTP Session
+        self._body.response.close()
+
+
+async def _report_answer(ctx: Context, answer: str, text: str) -> None:
+    """推送新到达的答案内容
+
+    - 上下文带有进度记录（后台任务的 JobContext）时记录截至目前的完整答案
+    - 没有会话的上下文（不在 MCP 请求中调用）不推送
+    - 其他情况通过进度通知推送新到达的内容，客户端未提供进度令牌时由 Context 忽略
+    """
+    sink = getattr(ctx, "progress_sink", None)
+    if sink is not None:
+        sink.record(len(answer), None, answer)
+        return
+    if ctx.request_context.session is None:
+        return
+    await ctx.report_progress(len(answer), None, text)
+
+
+async def call_ai_tools_streaming(
+    ctx: Context,
+    sls_client: "SLSClient",
+    request: "CallAiToolsRequest",
+    runtime: "RuntimeOptions",
+) -> Dict[str, Any]:
+    """流式调用 CallAiTools，答案内容到达时即通过进度通知推送给客户端
+
+    请求在工作线程中执行，不阻塞事件循环；客户端取消请求时关闭连接，后台线程随之结束。
+    SDK 不支持构造流式请求时（见 CallAiToolsStream.supported）改用 call_ai_tools_with_options，读取完整响应后一次推送。
+    配置了持久化缓存时，相同的请求直接返回缓存的答案。
+    返回 {"data": 完整答案, "requestId": 请求ID}。
+    """
+    cache = get_result_cache(ctx)
+    cache_key = ai_tools_cache_key(request)
+    if cache is not None:
+        result = await asyncio.to_thread(cache.get, "CallAiTools", cache_key)
+        if result is not None:
+            await _report_answer(ctx, result["data"], result["data"])
+            return result
+    if not CallAiToolsStream.supported(sls_client):
+        result = await _call_ai_tools(ctx, sls_client, request, runtime)
+    else:
+        result = await _call_ai_tools_stream(ctx, sls_client, request, runtime)
+    if cache is not None:
+        await asyncio.to_thread(cache.set, "CallAiTools", cache_key, result, CALL_AI_TOOLS_TTL)
+    return result
+
+
+async def _call_ai_tools(
+    ctx: Context,
+    sls_client: "SLSClient",
+    request: "CallAiToolsRequest",
+    runtime: "RuntimeOptions",
+) -> Dict[str, Any]:
+    """SDK 不支持流式请求时，在工作线程中以 call_ai_tools_with_options 整体读取响应"""
+    log_warning("当前 SDK 版本不支持流式调用 CallAiTools，改为读取完整响应后返回")
+    response = await asyncio.to_thread(
+        sls_client.call_ai_tools_with_options, request, {}, runtime
+    )
+    body = response.body or ""
+    extractor = AnswerExtractor()
+    extractor.feed(body.encode("utf-8") if isinstance(body, str) else body)
+    extractor.finish()
+    if extractor.answer:
+        await _report_answer(ctx, extractor.answer, extractor.answer)
+    headers = {key.lower(): value for key, value in (response.headers or {}).items()}
+    return {"data": extractor.answer, "requestId": headers.get("x-log-requestid", "")}
+
+
+async def _call_ai_tools_stream(
+    ctx: Context,
+    sls_client: "SLSClient",
+    request: "CallAiToolsRequest",
+    runtime: "RuntimeOptions",
+) -> Dict[str, Any]:
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancelled = threading.Event()
+    holder: Dict[str, CallAiToolsStream] = {}
+
+    def produce() -> None:
+        try:
+            stream = CallAiToolsStream(sls_client, request, runtime)
+            holder["stream"] = stream
+            if cancelled.is_set():
+                stream.close()
+                return
+            for chunk in stream:
+                loop.call_soon_threadsafe(queue.put_nowait, ("chunk", chunk))
+            loop.call_soon_threadsafe(queue.put_nowait, ("end", None))
+        except Exception as e:
+            if not cancelled.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+
+    extractor = AnswerExtractor()
+    producer = threading.Thread(target=produce, name="call-ai-tools-stream", daemon=True)
+    producer.start()
+    try:
+        while True:
+            kind, payload = await queue.get()
+            if kind == "error":
+                raise payload
+            text = extractor.finish() if kind == "end" else extractor.feed(payload)
+            if text:
+                await _report_answer(ctx, extractor.answer, text)
+            if kind == "end":
+                break
+    finally:
+        cancelled.set()
+        stream: Optional[CallAiToolsStream] = holder.get("stream")
+        if stream is not None:
+            stream.close()
+    return {"data": extractor.answer, "requestId": holder["stream"].request_id}
+
+
+def ai_tools_cache_key(request: "CallAiToolsRequest") -> list:
+    """CallAiTools 结果的缓存键，sys.query 中 append_current_time 添加的当前时间不参与缓存键"""
+    params = request.params
+    query = (params or {}).get("sys.query")
+    if isinstance(query, str):
+        params = dict(params, **{"sys.query": _CURRENT_TIME_PREFIX.sub("", query, count=1)})
+    return [request.tool_name, request.region_id, params]
@@ -0,0 +1,280 @@
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from mcp_server_aliyun_observability.cache import TTLCache
+from mcp_server_aliyun_observability.logger import log_debug, log_error
+from mcp_server_aliyun_observability.utils import get_arms_user_trace_log_store
+
+if TYPE_CHECKING:
+    from mcp_server_aliyun_observability.utils import ArmsClientWrapper
+
+_MISSING = object()
+
+
+class ArmsAppMetadataCache:
+    """ARMS 应用元数据缓存
+
+    按 (region, pid) 缓存 GetTraceApp 返回的应用名、语言、用户ID，以及据此计算的调用链
+    project/logstore，同一应用的多次火焰图分析、应用信息查询只需调用一次 GetTraceApp：
+    - 找到的应用缓存 ttl 秒
+    - 不存在的应用（负缓存）缓存 negative_ttl 秒，避免对错误 pid 反复发起请求
+    - 调用失败（异常）不缓存
+    """
+
+    def __init__(
+        self,
+        ttl: float = 600,
+        negative_ttl: float = 60,
+        max_entries: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.negative_ttl = negative_ttl
+        self._apps = TTLCache(max_entries=max_entries, ttl=ttl, clock=clock)
+        self._log_stores = TTLCache(max_entries=max_entries, clock=clock)
+
+    def get(
+        self, arms_client: "ArmsClientWrapper", pid: str, region_id: str
+    ) -> Optional[dict[str, Any]]:
+        """获取应用元数据，应用不存在时返回 None"""
+        from alibabacloud_arms20190808.models import GetTraceAppRequest
+
+        key = (region_id, pid)
+        metadata = self._apps.get(key, _MISSING)
+        if metadata is not _MISSING:
+            return dict(metadata) if metadata is not None else None
+
+        response = arms_client.with_region(region_id).get_trace_app(
+            GetTraceAppRequest(pid=pid, region_id=region_id)
+        )
+        trace_app = response.body.trace_app if response.body else None
+        if trace_app is None:
+            self._apps.set(key, None, ttl=self.negative_ttl)
+            return None
+
+        metadata = {
+            "pid": trace_app.pid,
+            "app_name": trace_app.app_name,
+            "language": trace_app.language,
+            "user_id": trace_app.user_id,
+            "region_id": trace_app.region_id or region_id,
+        }
+        if trace_app.user_id:
+            metadata.update(self.trace_log_store(trace_app.user_id, region_id))
+        self._apps.set(key, metadata)
+        return dict(metadata)
+
+    def trace_log_store(self, user_id: Any, region_id: str) -> dict[str, str]:
+        """获取用户调用链数据所在的 project/logstore"""
+        key = (str(user_id), region_id)
+        log_store = self._log_stores.get(key)
+        if log_store is None:
+            log_store = get_arms_user_trace_log_store(user_id, region_id)
+            self._log_stores.set(key, log_store)
+        return dict(log_store)
+
+    def invalidate(self, pid: str, region_id: str) -> None:
+        self._apps.delete((region_id, pid))
+
+
+def _trigrams(text: str) -> set[str]:
+    text = f"  {text} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+class _RegionIndex:
+    def __init__(self):
+        self.apps: dict[str, dict[str, Any]] = {}
+        self.versions: dict[str, Any] = {}
+        self.postings: dict[str, set[str]] = {}
+        self.synced_at: Optional[float] = None
+
+    def add(self, app: dict[str, Any], version: Any) -> None:
+        pid = app["pid"]
+        self.apps[pid] = app
+        self.versions[pid] = version
+        for gram in _trigrams(app["app_name"].lower()):
+            self.postings.setdefault(gram, set()).add(pid)
+
+    def remove(self, pid: str) -> None:
+        app = self.apps.pop(pid)
+        self.versions.pop(pid, None)
+        for gram in _trigrams(app["app_name"].lower()):
+            pids = self.postings.get(gram)
+            if pids is not None:
+                pids.discard(pid)
+                if not pids:
+                    del self.postings[gram]
+
+
+class ArmsAppIndex:
+    """ARMS 应用的本地检索索引
+
+    每个 region 的全部调用链应用在后台线程中通过 SearchTraceAppByPage 分页同步到内存，
+    按应用名的三元组（trigram）建立倒排索引，支持前缀、子串和模糊匹配，结果排序后直接在本地分页：
+    - 某个 region 首次查询时触发后台同步，同步完成前查询仍走 SearchTraceAppByPage
+    - 索引超过 refresh_interval 秒后，下一次查询触发后台刷新，刷新期间继续使用旧索引
+    - SearchTraceAppByPage 不支持按更新时间过滤，刷新时仍需拉取全量列表，
+      但只对新增、变更（UpdateTime 变化）和删除的应用增量更新倒排索引
+    - 同步失败后 retry_interval 秒内不再发起同步，避免每次查询都重试并输出错误日志
+    """
+
+    def __init__(
+        self,
+        refresh_interval: float = 300,
+        page_size: int = 100,
+        fuzzy_threshold: float = 0.5,
+        retry_interval: float = 60,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.page_size = page_size
+        self.fuzzy_threshold = fuzzy_threshold
+        self._clock = clock
+        self._regions: dict[str, _RegionIndex] = {}
+        self._syncing: set[str] = set()
+        self._failed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def is_ready(self, region_id: str) -> bool:
+        index = self._regions.get(region_id)
+        return index is not None and index.synced_at is not None
+
+    def ensure_synced(self, arms_client: "ArmsClientWrapper", region_id: str) -> None:
+        """索引不存在或已过期时在后台线程中同步"""
+        index = self._regions.get(region_id)
+        if index is not None and index.synced_at is not None:
+            if self._clock() - index.synced_at < self.refresh_interval:
+                return
+        with self._lock:
+            if region_id in self._syncing:
+                return
+            failed_at = self._failed_at.get(region_id)
+            if failed_at is not None and self._clock() - failed_at < self.retry_interval:
+                return
+            self._syncing.add(region_id)
+        threading.Thread(
+            target=self._sync_in_background,
+            args=(arms_client, region_id),
+            name=f"arms-app-index-{region_id}",
+            daemon=True,
+        ).start()
+
+    def _sync_in_background(self, arms_client: "ArmsClientWrapper", region_id: str) -> None:
+        try:
+            self.sync(arms_client, region_id)
+        except Exception as e:
+            with self._lock:
+                self._failed_at[region_id] = self._clock()
+            log_error(
+                f"同步 ARMS 应用索引失败, region: {region_id}, error: {e}，"
+                f"{self.retry_interval:g} 秒后重试"
+            )
+        else:
+            with self._lock:
+                self._failed_at.pop(region_id, None)
+        finally:
+            with self._lock:
+                self._syncing.discard(region_id)
+
+    def sync(self, arms_client: "ArmsClientWrapper", region_id: str) -> dict[str, int]:
+        """拉取 region 的全部应用并增量更新索引，返回新增、变更和删除的数量"""
+        from alibabacloud_arms20190808.models import SearchTraceAppByPageRequest
+
+        client = arms_client.with_region(region_id)
+        fetched: dict[str, tuple[dict[str, Any], Any]] = {}
+        page_number = 1
+        while True:
+            response = client.search_trace_app_by_page(
+                SearchTraceAppByPageRequest(
+                    region_id=region_id,
+                    page_size=self.page_size,
+                    page_number=page_number,
+                )
+            )
+            page_bean = response.body.page_bean
+            trace_apps = (page_bean.trace_apps if page_bean else None) or []
+            for app in trace_apps:
+                fetched[app.pid] = (
+                    {
+                        "app_name": app.app_name or "",
+                        "pid": app.pid,
+                        "user_id": app.user_id,
+                        "type": app.type,
+                    },
+                    app.update_time,
+                )
+            if len(trace_apps) < self.page_size or len(fetched) >= (page_bean.total_count or 0):
+                break
+            page_number += 1
+
+        index = self._regions.get(region_id)
+        # 在副本上更新，完成后整体替换，查询线程不会看到更新到一半的索引
+        updated = _RegionIndex()
+        if index is not None:
+            updated.apps = dict(index.apps)
+            updated.versions = dict(index.versions)
+            updated.postings = {gram: set(pids) for gram, pids in index.postings.items()}
+        stats = {"added": 0, "updated": 0, "removed": 0}
+        for pid in set(updated.apps) - set(fetched):
+            updated.remove(pid)
+            stats["removed"] += 1
+        for pid, (app, version) in fetched.items():
+            if pid in updated.apps:
+                if updated.versions.get(pid) == version and updated.apps[pid] == app:
+                    continue
+                updated.remove(pid)
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            updated.add(app, version)
+        updated.synced_at = self._clock()
+        self._regions[region_id] = updated
+        log_debug(f"arms app index {region_id} synced: {len(updated.apps)} apps, {stats}")
+        return stats
+
+    def search(
+        self, region_id: str, query: str, page_size: int = 20, page_number: int = 1
+    ) -> dict[str, Any]:
+        """在本地索引中检索应用
+
+        排序依次为：完全匹配、前缀匹配、子串匹配、模糊匹配（三元组重合度不低于 fuzzy_threshold），
+        同一档内按相似度和应用名长度排序。
+        """
+        index = self._regions[region_id]
+        needle = query.strip().lower()
+        ranked: list[tuple] = []
+        if not needle:
+            ranked = [(3, 0.0, len(app["app_name"]), app["app_name"], pid) for pid, app in index.apps.items()]
+        else:
+            grams = _trigrams(needle)
+            overlap: dict[str, int] = {}
+            for gram in grams:
+                for pid in index.postings.get(gram, ()):
+                    overlap[pid] = overlap.get(pid, 0) + 1
+            # 三元组在查询串两端补了空格，短查询串的子串匹配需要扫描全部应用名
+            candidates = index.apps.keys() if len(needle) < 3 else overlap.keys()
+            for pid in candidates:
+                name = index.apps[pid]["app_name"]
+                lowered = name.lower()
+                score = overlap.get(pid, 0) / len(grams)
+                if lowered == needle:
+                    tier = 0
+                elif lowered.startswith(needle):
+                    tier = 1
+                elif needle in lowered:
+                    tier = 2
+                elif score >= self.fuzzy_threshold:
+                    tier = 3
+                else:
+                    continue
+                ranked.append((tier, -score, len(name), name, pid))
+        ranked.sort()
+        offset = (page_number - 1) * page_size
+        return {
+            "total": len(ranked),
+            "page_size": page_size,
+            "page_number": page_number,
+            "trace_apps": [dict(index.apps[item[-1]]) for item in ranked[offset : offset + page_size]],
+        }
@@ -0,0 +1,118 @@
+from typing import Optional
+
+from mcp_server_aliyun_observability.logger import log_warning
+
+_patched = False
+
+
+def _get_credentials_provider(self, config, profile_name):
+    from alibabacloud_credentials.exceptions import CredentialException
+    from alibabacloud_credentials.provider import (
+        EcsRamRoleCredentialsProvider,
+        OIDCRoleArnCredentialsProvider,
+        RamRoleArnCredentialsProvider,
+        StaticAKCredentialsProvider,
+        StaticSTSCredentialsProvider,
+    )
+
+    if profile_name is None or profile_name == '':
+        raise CredentialException('invalid profile name')
+
+    profiles = config.get('profiles', [])
+
+    if not profiles:
+        raise CredentialException(f"unable to get profile with '{profile_name}' form cli credentials file.")
+
+    for profile in profiles:
+        if profile.get('name') is not None and profile['name'] == profile_name:
+            mode = profile.get('mode')
+            if mode == "AK":
+                return StaticAKCredentialsProvider(
+                    access_key_id=profile.get('access_key_id'),
+                    access_key_secret=profile.get('access_key_secret')
+                )
+            elif mode == "StsToken" or mode == "CloudSSO":
+                return StaticSTSCredentialsProvider(
+                    access_key_id=profile.get('access_key_id'),
+                    access_key_secret=profile.get('access_key_secret'),
+                    security_token=profile.get('sts_token')
+                )
+            elif mode == "RamRoleArn":
+                pre_provider = StaticAKCredentialsProvider(
+                    access_key_id=profile.get('access_key_id'),
+                    access_key_secret=profile.get('access_key_secret')
+                )
+                return RamRoleArnCredentialsProvider(
+                    credentials_provider=pre_provider,
+                    role_arn=profile.get('ram_role_arn'),
+                    role_session_name=profile.get('ram_session_name'),
+                    duration_seconds=profile.get('expired_seconds'),
+                    policy=profile.get('policy'),
+                    external_id=profile.get('external_id'),
+                    sts_region_id=profile.get('sts_region'),
+                    enable_vpc=profile.get('enable_vpc'),
+                )
+            elif mode == "EcsRamRole":
+                return EcsRamRoleCredentialsProvider(
+                    role_name=profile.get('ram_role_name')
+                )
+            elif mode == "OIDC":
+                return OIDCRoleArnCredentialsProvider(
+                    role_arn=profile.get('ram_role_arn'),
+                    oidc_provider_arn=profile.get('oidc_provider_arn'),
+                    oidc_token_file_path=profile.get('oidc_token_file'),
+                    role_session_name=profile.get('role_session_name'),
+                    duration_seconds=profile.get('expired_seconds'),
+                    policy=profile.get('policy'),
+                    sts_region_id=profile.get('sts_region'),
+                    enable_vpc=profile.get('enable_vpc'),
+                )
+            elif mode == "ChainableRamRoleArn":
+                previous_provider = self._get_credentials_provider(config, profile.get('source_profile'))
+                return RamRoleArnCredentialsProvider(
+                    credentials_provider=previous_provider,
+                    role_arn=profile.get('ram_role_arn'),
+                    role_session_name=profile.get('ram_session_name'),
+                    duration_seconds=profile.get('expired_seconds'),
+                    policy=profile.get('policy'),
+                    external_id=profile.get('external_id'),
+                    sts_region_id=profile.get('sts_region'),
+                    enable_vpc=profile.get('enable_vpc'),
+                )
+            else:
+                raise CredentialException(f"unsupported profile mode '{mode}' form cli credentials file.")
+
+    raise CredentialException(f"unable to get profile with '{profile_name}' form cli credentials file.")
+
+
+def patch_cli_profile_provider() -> None:
+    """替换 CLIProfileCredentialsProvider 的 profile 解析逻辑，支持 CloudSSO 等模式
+
+    凭证相关模块导入较慢，仅在首次创建默认凭证客户端时打补丁，重复调用无副作用。
+    """
+    global _patched
+    if _patched:
+        return
+    from alibabacloud_credentials import provider
+
+    provider.cli_profile.CLIProfileCredentialsProvider._get_credentials_provider = (
+        _get_credentials_provider
+    )
+    _patched = True
+
+
+def default_credentials_client():
+    """创建使用默认凭证链的凭证客户端"""
+    from alibabacloud_credentials.client import Client as CredClient
+
+    patch_cli_profile_provider()
+    return CredClient()
+
+
+def default_access_key_id() -> Optional[str]:
+    """解析默认凭证链当前使用的 AccessKey ID，无法获取凭证时返回 None"""
+    try:
+        return default_credentials_client().get_access_key_id() or None
+    except Exception as e:
+        log_warning(f"无法从默认凭证链获取凭证: {e}")
+        return None
@@ -0,0 +1,257 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from mcp_server_aliyun_observability.logger import log_warning
+
+if TYPE_CHECKING:
+    from mcp.server.fastmcp import Context
+
+# 结束时间早于当前时间超过该秒数的 GetLogs 查询才会缓存，避免缓存仍在写入的时间窗口
+GET_LOGS_SETTLE_SECONDS = 300
+GET_LOGS_TTL = 24 * 3600
+GET_INDEX_TTL = 300
+CALL_AI_TOOLS_TTL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expire_at REAL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (id, total) VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS entries_insert AFTER INSERT ON entries BEGIN
+    UPDATE meta SET total = total + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_delete AFTER DELETE ON entries BEGIN
+    UPDATE meta SET total = total - OLD.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS entries_update AFTER UPDATE OF size ON entries BEGIN
+    UPDATE meta SET total = total - OLD.size + NEW.size WHERE id = 0;
+END;
+"""
+
+
+class DiskCache:
+    """基于 SQLite 的持久化结果缓存，可在同一主机的多个进程之间共享
+
+    - 值以 JSON 序列化保存，键为 namespace + 任意可 JSON 序列化的参数，经 SHA-256 摘要后存储
+    - 数据库使用 WAL 模式，写操作在 BEGIN IMMEDIATE 事务中执行，多进程并发读写由 SQLite 文件锁保证一致
+    - 所有条目的总字节数由触发器维护，超过 max_bytes 时先删除过期条目，再按最近访问时间淘汰
+    - 过期时间使用墙上时钟，进程重启后仍然有效
+    - 缓存读写失败时记录告警并视为未命中，不影响工具调用
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        scope: str = "",
+        busy_timeout: float = 5.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(os.path.expandvars(path)).expanduser().resolve()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.scope = scope
+        self.busy_timeout = busy_timeout
+        self._clock = clock
+        # sqlite3 连接不能跨线程使用，每个线程（以及 fork 出的子进程）使用各自的连接
+        self._local = threading.local()
+        # 命中统计在多个线程中更新，由锁保护
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # 建表使用临时连接，避免多进程模式下 fork 前的连接被子进程继承
+        conn = sqlite3.connect(str(self.path), timeout=busy_timeout, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _key(self, namespace: str, key: Any) -> str:
+        raw = json.dumps([self.scope, namespace, key], sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        value = self._get(namespace, key)
+        return default if value is None else json.loads(value)
+
+    def get_bytes(self, namespace: str, key: Any, default: Any = None) -> Any:
+        """读取 set_bytes 写入的原始字节"""
+        value = self._get(namespace, key)
+        return default if value is None else value
+
+    def _get(self, namespace: str, key: Any) -> Optional[bytes]:
+        value = self._read(namespace, key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _read(self, namespace: str, key: Any) -> Optional[bytes]:
+        digest = self._key(namespace, key)
+        now = self._clock()
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT value, expire_at, accessed_at FROM entries WHERE key = ?", (digest,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expire_at, accessed_at = row
+            if expire_at is not None and expire_at <= now:
+                conn.execute("DELETE FROM entries WHERE key = ? AND expire_at <= ?", (digest, now))
+                return None
+            if accessed_at < now - 1:
+                # 访问时间精确到秒即可满足 LRU，减少读操作带来的写锁竞争
+                conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, digest))
+        except sqlite3.Error as e:
+            log_warning(f"读取持久化缓存失败: {e}")
+            return None
+        return value
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None) -> None:
+        self.set_bytes(namespace, key, json.dumps(value, ensure_ascii=False).encode("utf-8"), ttl)
+
+    def set_bytes(self, namespace: str, key: Any, data: bytes, ttl: Optional[float] = None) -> None:
+        """写入已编码的字节，读取时使用 get_bytes，不经过 JSON 编解码"""
+        if len(data) > self.max_bytes:
+            return
+        now = self._clock()
+        expire_at = now + ttl if ttl is not None else None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "INSERT INTO entries (key, namespace, value, size, expire_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                    "value = excluded.value, size = excluded.size, "
+                    "expire_at = excluded.expire_at, accessed_at = excluded.accessed_at",
+                    (self._key(namespace, key), namespace, data, len(data), expire_at, now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            log_warning(f"写入持久化缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self._total(conn) <= self.max_bytes:
+            return
+        conn.execute("DELETE FROM entries WHERE expire_at IS NOT NULL AND expire_at <= ?", (now,))
+        excess = self._total(conn) - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+
+    @staticmethod
+    def _total(conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT total FROM meta WHERE id = 0").fetchone()[0]
+
+    def delete(self, namespace: str, key: Any) -> None:
+        try:
+            self._connect().execute("DELETE FROM entries WHERE key = ?", (self._key(namespace, key),))
+        except sqlite3.Error as e:
+            log_warning(f"删除持久化缓存失败: {e}")
+
+    def clear(self) -> None:
+        try:
+            self._connect().execute("DELETE FROM entries")
+        except sqlite3.Error as e:
+            log_warning(f"清空持久化缓存失败: {e}")
+
+    def total_bytes(self) -> int:
+        """所有条目的总字节数，读取失败时返回 0"""
+        try:
+            return self._total(self._connect())
+        except sqlite3.Error as e:
+            log_warning(f"读取持久化缓存大小失败: {e}")
+            return 0
+
+    def __len__(self) -> int:
+        try:
+            return self._connect().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        except sqlite3.Error as e:
+            log_warning(f"读取持久化缓存条目数失败: {e}")
+            return 0
+
+
+_MISSING = object()
+
+
+def get_result_cache(ctx: "Context") -> Optional[DiskCache]:
+    """返回服务启动时配置的持久化缓存，未配置时返回 None"""
+    return ctx.request_context.lifespan_context.get("result_cache")
+
+
+def cached(
+    cache: Optional[DiskCache],
+    namespace: str,
+    key: Any,
+    compute: Callable[[], Any],
+    ttl: Optional[float] = None,
+) -> Any:
+    """缓存命中时直接返回，否则调用 compute 并写入缓存；cache 为 None 时直接调用 compute"""
+    if cache is None:
+        return compute()
+    value = cache.get(namespace, key, _MISSING)
+    if value is _MISSING:
+        value = compute()
+        cache.set(namespace, key, value, ttl)
+    return value
+
+
+def cached_bytes(
+    cache: Optional[DiskCache],
+    namespace: str,
+    key: Any,
+    compute: Callable[[], bytes],
+    ttl: Optional[float] = None,
+) -> bytes:
+    """与 cached 相同，缓存的值为原始字节"""
+    if cache is None:
+        return compute()
+    value = cache.get_bytes(namespace, key)
+    if value is None:
+        value = compute()
+        cache.set_bytes(namespace, key, value, ttl)
+    return value
+
+
+def get_logs_cacheable(to_ts: int, now: Optional[float] = None) -> bool:
+    """查询的结束时间（秒）早于当前时间超过 GET_LOGS_SETTLE_SECONDS 时，结果不会再变化，可以缓存"""
+    now = time.time() if now is None else now
+    return to_ts <= now - GET_LOGS_SETTLE_SECONDS
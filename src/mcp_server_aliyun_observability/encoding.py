@@ -0,0 +1,145 @@
+import inspect
+from typing import Any, Callable, Iterable, Optional
+
+from mcp.server.fastmcp import FastMCP
+from mcp.types import TextContent
+
+from mcp_server_aliyun_observability.cache import TTLCache
+from mcp_server_aliyun_observability.disk_cache import GET_INDEX_TTL
+from mcp_server_aliyun_observability.logger import log_warning
+
+# fastmcp 表示不替换 FastMCP 默认的结果转换（pydantic 编码，缩进 2 个空格）
+RESULT_ENCODERS = ("fastmcp", "pydantic", "orjson", "msgspec")
+
+# 返回缓存中同一个对象的工具，编码结果按对象缓存
+CACHEABLE_TOOLS = ("sls_describe_logstore",)
+
+
+def _pydantic_encoder() -> Callable[[Any], str]:
+    import pydantic_core
+
+    return lambda value: pydantic_core.to_json(value, fallback=str).decode("utf-8")
+
+
+def _orjson_encoder() -> Callable[[Any], str]:
+    import orjson
+
+    option = orjson.OPT_NON_STR_KEYS
+    return lambda value: orjson.dumps(value, default=str, option=option).decode("utf-8")
+
+
+def _msgspec_encoder() -> Callable[[Any], str]:
+    import msgspec
+
+    encoder = msgspec.json.Encoder(enc_hook=str)
+    return lambda value: encoder.encode(value).decode("utf-8")
+
+
+_LOADERS = {
+    "pydantic": _pydantic_encoder,
+    "orjson": _orjson_encoder,
+    "msgspec": _msgspec_encoder,
+}
+
+
+def load_encoder(name: str) -> Callable[[Any], str]:
+    """返回把工具结果编码为紧凑 JSON 文本的函数，orjson/msgspec 未安装时退回 pydantic"""
+    if name not in _LOADERS:
+        raise ValueError(f"不支持的编码方式: {name}，可选值为 {', '.join(_LOADERS)}")
+    try:
+        return _LOADERS[name]()
+    except ImportError as e:
+        log_warning(f"未安装 {name}，工具结果改用 pydantic 编码: {e}")
+        return _pydantic_encoder()
+
+
+class ResultEncoder:
+    """替换 FastMCP 对工具结果的默认编码
+
+    FastMCP 把工具返回的 dict 用 pydantic 以缩进格式编码为文本，这里改用可选的编码器（pydantic/orjson/msgspec）
+    输出紧凑的 JSON：
+
+    - 只处理没有 outputSchema 且返回 dict 的工具，其他结果（str、列表、结构化输出）仍由 FastMCP 转换
+    - 编码失败（如遇到编码器不支持的类型）时退回 FastMCP 的转换
+    - cacheable_tools 中的工具返回的是缓存中的同一个对象（如日志库索引），编码结果按对象缓存，
+      再次返回同一个对象时直接复用已编码的文本；缓存持有对象的引用，保证对象ID不会被复用
+    """
+
+    def __init__(
+        self,
+        name: str = "pydantic",
+        cacheable_tools: Iterable[str] = CACHEABLE_TOOLS,
+        memo_entries: int = 256,
+        memo_ttl: Optional[float] = GET_INDEX_TTL,
+    ):
+        self.name = name
+        self.encode_value = load_encoder(name)
+        self.cacheable_tools = frozenset(cacheable_tools)
+        self._memo = TTLCache(max_entries=memo_entries, ttl=memo_ttl)
+
+    def encode(self, result: Any, cacheable: bool = False) -> str:
+        if not cacheable:
+            return self.encode_value(result)
+        entry = self._memo.get(id(result))
+        if entry is not None and entry[0] is result:
+            return entry[1]
+        text = self.encode_value(result)
+        self._memo.set(id(result), (result, text))
+        return text
+
+    @property
+    def memo_hits(self) -> int:
+        return self._memo.hits
+
+    @staticmethod
+    def supported(server: FastMCP) -> bool:
+        """server 是否提供替换工具结果转换所依赖的内部实现（mcp 的私有实现，不同版本可能不同）
+
+        需要 ToolManager.call_tool 支持 convert_result 参数，FuncMetadata 提供 output_schema 和 convert_result。
+        """
+        try:
+            from mcp.server.fastmcp.utilities.func_metadata import FuncMetadata
+        except ImportError:
+            return False
+        call_tool = getattr(getattr(server, "_tool_manager", None), "call_tool", None)
+        if call_tool is None:
+            return False
+        try:
+            parameters = inspect.signature(call_tool).parameters
+        except (TypeError, ValueError):
+            return False
+        return (
+            "convert_result" in parameters
+            and "output_schema" in getattr(FuncMetadata, "model_fields", {})
+            and callable(getattr(FuncMetadata, "convert_result", None))
+        )
+
+    def install(self, server: FastMCP) -> "ResultEncoder":
+        """替换 server 的工具调用入口，对工具结果使用本编码器，当前 mcp 版本不支持时保留默认的结果转换"""
+        if not self.supported(server):
+            log_warning(f"当前 mcp 版本不支持替换工具结果的编码，{self.name} 编码不生效，使用默认的结果转换")
+            return self
+        tool_manager = server._tool_manager
+        call_tool = tool_manager.call_tool
+
+        async def encoded_call_tool(
+            name: str,
+            arguments: dict[str, Any],
+            context: Any = None,
+            convert_result: bool = False,
+        ) -> Any:
+            tool = tool_manager.get_tool(name)
+            if not convert_result or tool is None or tool.fn_metadata.output_schema is not None:
+                return await call_tool(name, arguments, context=context, convert_result=convert_result)
+            result = await call_tool(name, arguments, context=context, convert_result=False)
+            if isinstance(result, dict):
+                try:
+                    text = self.encode(result, name in self.cacheable_tools)
+                except Exception as e:
+                    log_warning(f"{self.name} 编码工具 {name} 的结果失败，改用默认转换: {e}")
+                else:
+                    return [TextContent(type="text", text=text)]
+            return tool.fn_metadata.convert_result(result)
+
+        tool_manager.call_tool = encoded_call_tool
+        return self
@@ -0,0 +1,162 @@
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from mcp_server_aliyun_observability.logger import log_warning
+from mcp_server_aliyun_observability.query_validation import split_query
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+# 检索语句每次 GetLogs 最多返回 100 行
+SEARCH_PAGE_SIZE = 100
+_TAIL_LIMIT_PATTERN = re.compile(r"\blimit\s+\d+(\s*,\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+# 日志的保留字段及类型，GetLogs 返回的值都是字符串
+_RESERVED_FIELDS = {"__time__": "long", "__source__": "text", "__topic__": "text"}
+
+
+class ExportError(Exception):
+    """导出参数或环境不满足要求"""
+
+
+def load_pyarrow():
+    """返回 (pyarrow, pyarrow.parquet)，未安装可选依赖 export 时抛出 ExportError"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportError(
+            "导出需要安装 pyarrow，请执行 pip install 'mcp-server-aliyun-observability[export]'"
+        ) from None
+    return pyarrow, pyarrow.parquet
+
+
+def index_field_types(index: Dict[str, Any]) -> Dict[str, str]:
+    """sls_describe_logstore 返回的索引结构到 字段名 -> 索引类型 的映射，JSON 子字段为 key.sub"""
+    types = dict(_RESERVED_FIELDS)
+    for key, config in index.items():
+        config = config or {}
+        types[key] = config.get("type") or "text"
+        for sub_key, sub_config in (config.get("json_keys") or {}).items():
+            types[f"{key}.{sub_key}"] = (sub_config or {}).get("type") or "text"
+    return types
+
+
+def paged_queries(query: str, max_rows: int) -> Iterator[tuple[str, int, int]]:
+    """生成分页查询 (查询语句, offset, 行数)
+
+    - 检索语句按 offset/line 分页，每页 SEARCH_PAGE_SIZE 行
+    - 分析语句只查询一次：未指定 limit 时追加 limit max_rows。
+      按 limit offset, count 分页时每页都会重新执行一遍分析，且没有 order by 时各页的行顺序不确定，可能重复或遗漏
+    """
+    _, sql = split_query(query)
+    if sql is None:
+        for offset in range(0, max_rows, SEARCH_PAGE_SIZE):
+            yield query, offset, min(SEARCH_PAGE_SIZE, max_rows - offset)
+    elif _TAIL_LIMIT_PATTERN.search(sql):
+        yield query, 0, max_rows
+    else:
+        yield f"{query.rstrip().rstrip(';')} limit {max_rows}", 0, max_rows
+
+
+class ArrowExporter:
+    """把分页返回的日志逐批转换为 Arrow RecordBatch 并写入 Parquet 或 Arrow IPC 文件
+
+    - 列的类型按索引推断：long 为 int64，double 为 float64，其他为 string；无法转换的值写为 null
+    - 列取第一页出现的字段，检索语句还包含索引中的全部字段；之后新出现的字段不写入，记录在 droppedColumns 中
+    - 先写入临时文件，完成后重命名，失败时删除临时文件
+    """
+
+    def __init__(self, directory: str, file_format: str = "parquet"):
+        if file_format not in EXPORT_FORMATS:
+            raise ExportError(f"不支持的导出格式 {file_format}，可选 {', '.join(EXPORT_FORMATS)}")
+        self.directory = Path(os.path.expandvars(directory)).expanduser().resolve()
+        self.file_format = file_format
+
+    def _schema(self, pa, rows: List[Dict[str, str]], field_types: Dict[str, str], include_index: bool):
+        names = list(dict.fromkeys(name for row in rows for name in row))
+        if include_index:
+            names += [name for name in field_types if name not in names and "." not in name]
+        arrow_types = {"long": pa.int64(), "double": pa.float64()}
+        return pa.schema(
+            [pa.field(name, arrow_types.get(field_types.get(name), pa.string())) for name in names]
+        )
+
+    @staticmethod
+    def _convert(values: Iterable[Optional[str]], convert: Callable[[str], Any]) -> List[Any]:
+        converted = []
+        for value in values:
+            try:
+                converted.append(None if value is None or value == "" else convert(value))
+            except (TypeError, ValueError):
+                converted.append(None)
+        return converted
+
+    def _batch(self, pa, schema, rows: List[Dict[str, str]]):
+        columns = []
+        for field in schema:
+            values = [row.get(field.name) for row in rows]
+            if pa.types.is_int64(field.type):
+                values = self._convert(values, lambda v: int(float(v)))
+            elif pa.types.is_float64(field.type):
+                values = self._convert(values, float)
+            else:
+                values = [None if v is None else str(v) for v in values]
+            columns.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    def export(
+        self,
+        pages: Iterable[List[Dict[str, str]]],
+        field_types: Dict[str, str],
+        name: str,
+        include_index: bool = False,
+    ) -> Dict[str, Any]:
+        pa, pq = load_pyarrow()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name)
+        path = self.directory / f"{safe_name}-{uuid.uuid4().hex[:8]}{EXPORT_FORMATS[self.file_format]}"
+        temp_path = path.with_name(path.name + ".tmp")
+        started = time.monotonic()
+        writer = None
+        schema = None
+        rows_written = 0
+        dropped: set = set()
+        try:
+            for rows in pages:
+                if not rows:
+                    continue
+                if writer is None:
+                    schema = self._schema(pa, rows, field_types, include_index)
+                    if self.file_format == "parquet":
+                        writer = pq.ParquetWriter(str(temp_path), schema, compression="zstd")
+                    else:
+                        writer = pa.ipc.new_file(str(temp_path), schema)
+                dropped.update(name for row in rows for name in row if schema.get_field_index(name) < 0)
+                writer.write_batch(self._batch(pa, schema, rows))
+                rows_written += len(rows)
+            if writer is None:
+                return {"path": None, "rows": 0, "bytes": 0, "format": self.file_format}
+            writer.close()
+            writer = None
+            os.replace(temp_path, path)
+        except BaseException:
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception as e:
+                    log_warning(f"关闭导出文件失败: {e}")
+            temp_path.unlink(missing_ok=True)
+            raise
+        result: Dict[str, Any] = {
+            "path": str(path),
+            "rows": rows_written,
+            "bytes": path.stat().st_size,
+            "format": self.file_format,
+            "columns": [{"name": field.name, "type": str(field.type)} for field in schema],
+            "elapsedSeconds": round(time.monotonic() - started, 3),
+        }
+        if dropped:
+            result["droppedColumns"] = sorted(dropped)
+        return result
@@ -0,0 +1,240 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from mcp.server.fastmcp import Context
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.logger import log_debug, log_error
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobProgress:
+    """后台任务的进度，由任务中的工具通过 JobContext 上报，job_get 返回最近一次上报的进度"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._progress: Optional[Dict[str, Any]] = None
+
+    def record(self, progress: float, total: Optional[float] = None, message: Optional[str] = None) -> None:
+        with self._lock:
+            self._progress = {"progress": progress, "total": total, "message": message}
+
+    def snapshot(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return dict(self._progress) if self._progress is not None else None
+
+
+class JobContext(Context):
+    """后台任务中执行工具使用的上下文
+
+    提交任务的请求结束后其会话和进度令牌随之失效，且任务在另一个事件循环中执行，不能再向该会话发送通知：
+    - 只保留 lifespan_context，没有会话和请求元数据
+    - report_progress 记录到任务的 JobProgress 上，由 job_get 返回
+    - log 写入服务端日志
+    """
+
+    _progress_sink: Optional[JobProgress] = None
+
+    def __init__(self, ctx: Context, progress_sink: JobProgress):
+        super().__init__(
+            request_context=RequestContext(
+                request_id=f"job-{uuid.uuid4().hex}",
+                meta=None,
+                session=None,
+                lifespan_context=ctx.request_context.lifespan_context,
+            ),
+            fastmcp=ctx._fastmcp,
+        )
+        self._progress_sink = progress_sink
+
+    @property
+    def progress_sink(self) -> JobProgress:
+        return self._progress_sink
+
+    async def report_progress(
+        self, progress: float, total: Optional[float] = None, message: Optional[str] = None
+    ) -> None:
+        self._progress_sink.record(progress, total, message)
+
+    async def log(self, level: str, message: str, *, logger_name: Optional[str] = None) -> None:
+        log_debug(f"后台任务 {self.request_id} [{level}] {message}")
+
+
+class Job:
+    __slots__ = (
+        "job_id",
+        "owner",
+        "name",
+        "status",
+        "result",
+        "error",
+        "submitted_at",
+        "started_at",
+        "finished_at",
+        "future",
+        "progress",
+    )
+
+    def __init__(self, owner: Any, name: str, now: float, progress: Optional[JobProgress] = None):
+        self.job_id = uuid.uuid4().hex
+        self.owner = owner
+        self.name = name
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.submitted_at = now
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.future: Optional[Future] = None
+        self.progress = progress
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+    def snapshot(self, now: float) -> Dict[str, Any]:
+        end = self.finished_at if self.finished_at is not None else now
+        snapshot = {
+            "jobId": self.job_id,
+            "toolName": self.name,
+            "status": self.status,
+            "elapsedSeconds": round(end - self.submitted_at, 3),
+        }
+        progress = self.progress.snapshot() if self.progress is not None else None
+        if progress is not None:
+            snapshot["progress"] = progress
+        if self.status == SUCCEEDED:
+            snapshot["result"] = self.result
+        elif self.status == FAILED:
+            snapshot["error"] = self.error
+        return snapshot
+
+
+class JobManager:
+    """后台任务管理
+
+    耗时较长的工具调用（如 CallAiTools 分析）提交为后台任务，提交后立即返回任务ID：
+    - 任务在有界线程池中执行，同时运行的任务数不超过 max_workers，不占用事件循环
+    - 任务与提交它的 MCP 会话绑定，其他会话无法查询或取消
+    - 最多保留 max_jobs 个任务，已结束的任务保留 result_ttl 秒；任务数已满且全部未结束时拒绝提交
+    - 排队中的任务取消后不再执行；运行中的任务无法中断底层请求，取消后丢弃其结果
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_jobs: int = 256,
+        result_ttl: float = 3600,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_workers = max_workers
+        self.max_jobs = max_jobs
+        self.result_ttl = result_ttl
+        self._clock = clock
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def _evict(self) -> None:
+        now = self._clock()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished and job.finished_at + self.result_ttl <= now:
+                del self._jobs[job_id]
+        if len(self._jobs) < self.max_jobs:
+            return
+        for job_id, job in self._jobs.items():
+            if job.finished:
+                del self._jobs[job_id]
+                return
+        raise RuntimeError(f"too many unfinished jobs (max {self.max_jobs}), retry later")
+
+    def submit(
+        self, owner: Any, name: str, fn: Callable[[], Any], progress: Optional[JobProgress] = None
+    ) -> Dict[str, Any]:
+        """提交任务，progress 为任务上报进度的 JobProgress，查询任务时一并返回"""
+        with self._lock:
+            self._evict()
+            job = Job(owner, name, self._clock(), progress)
+            self._jobs[job.job_id] = job
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="mcp-job"
+                )
+            job.future = self._executor.submit(self._run, job, fn)
+            return job.snapshot(self._clock())
+
+    def _run(self, job: Job, fn: Callable[[], Any]) -> None:
+        with self._lock:
+            if job.status != PENDING:
+                return
+            job.status = RUNNING
+            job.started_at = self._clock()
+        try:
+            result = fn()
+        except Exception as e:
+            log_error(f"后台任务 {job.name} 执行失败: {e}")
+            status, result, error = FAILED, None, str(e)
+        else:
+            status, error = SUCCEEDED, None
+        with self._lock:
+            if job.status == RUNNING:
+                job.status, job.result, job.error = status, result, error
+                job.finished_at = self._clock()
+
+    def _get(self, owner: Any, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.owner != owner:
+            return None
+        return job
+
+    def get(self, owner: Any, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._get(owner, job_id)
+            return job.snapshot(self._clock()) if job else None
+
+    def cancel(self, owner: Any, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._get(owner, job_id)
+            if job is None:
+                return None
+            if not job.finished:
+                job.future.cancel()
+                job.status = CANCELLED
+                job.finished_at = self._clock()
+            return job.snapshot(self._clock())
+
+    async def wait(
+        self,
+        owner: Any,
+        job_id: str,
+        timeout: float,
+        on_progress: Optional[Callable[[Dict[str, Any]], Awaitable[None]]] = None,
+        poll_interval: float = 0.5,
+    ) -> Optional[Dict[str, Any]]:
+        """等待任务结束，最多等待 timeout 秒，等待期间每个 poll_interval 回调一次当前状态"""
+        deadline = time.monotonic() + timeout
+        while True:
+            snapshot = self.get(owner, job_id)
+            if snapshot is None or snapshot["status"] in FINISHED_STATUSES:
+                return snapshot
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return snapshot
+            if on_progress is not None:
+                await on_progress(snapshot)
+            await asyncio.sleep(min(poll_interval, remaining))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,152 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from mcp_server_aliyun_observability.logger import log_info, log_warning
+
+Endpoint = Dict[str, str]
+
+
+def _endpoint(value: Any) -> Optional[Endpoint]:
+    """只保留同时包含 uri 和 key 的 endpoint 配置"""
+    if isinstance(value, dict) and "uri" in value and "key" in value:
+        return value
+    return None
+
+
+class KnowledgeTable:
+    """编译后的外部知识库配置，创建后不再修改
+
+    (project, logstore) 为 logstore 级配置，(project, None) 为 project 默认配置，
+    不在表中的 project 使用全局默认配置。
+    """
+
+    def __init__(self, config: Dict[str, Any], signature: Optional[tuple] = None):
+        self.signature = signature
+        self.global_default = _endpoint(config.get("default_endpoint"))
+        self.entries: Dict[Tuple[str, Optional[str]], Optional[Endpoint]] = {}
+        for project, project_config in (config.get("projects") or {}).items():
+            if not isinstance(project_config, dict):
+                continue
+            self.entries[(project, None)] = _endpoint(project_config.get("default_endpoint"))
+            for logstore, value in project_config.items():
+                if logstore != "default_endpoint":
+                    self.entries[(project, logstore)] = _endpoint(value)
+        self._resolved: Dict[Tuple[str, str], Optional[Endpoint]] = {}
+
+    def resolve(self, project: str, logstore: str) -> Optional[Endpoint]:
+        """优先级：logstore > project default > global default"""
+        key = (project, logstore)
+        try:
+            return self._resolved[key]
+        except KeyError:
+            pass
+        if key in self.entries:
+            endpoint = self.entries[key]
+        elif (project, None) in self.entries:
+            endpoint = self.entries[(project, None)]
+        else:
+            endpoint = self.global_default
+        self._resolved[key] = endpoint
+        return endpoint
+
+
+class KnowledgeEndpoint:
+    """外部知识库配置
+    该类用于加载和管理外部知识库的配置，包括全局/Project/Logstore级别的外部知识库 endpoint 配置。
+    其配置优先级：Logstore > Project default > Global default
+    配置文件示例如下：
+    ```json
+    {
+    "default_endpoint": {"uri": "https://api.default.com", "key": "Bearer dataset-***"},
+    "projects": {
+        "project1": {
+            "default_endpoint": {"uri": "https://api.project1.com", "key": "Bearer dataset-***"},
+            "logstore1": {"uri": "https://api.project1.logstore1.com","key": "Bearer dataset-***"},
+            "logstore2": {"uri": "https://api.project1.logstore2.com","key": "Bearer dataset-***"}
+        },
+        "project2": {
+            "logstore3": {"uri": "https://api.project2.logstore3.com","key": "Bearer dataset-***"}
+        }
+    }
+    }
+    ```
+
+    配置文件编译为 KnowledgeTable 后整体替换，查询不加锁：
+    - 每次查询距离上次检查超过 poll_interval 秒时检查文件的修改时间和大小，变化后重新加载，无需重启服务
+    - 新配置解析失败时保留当前配置；文件被删除时清空配置
+    - 查询结果缓存在当前 KnowledgeTable 中，配置替换后自然失效
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        poll_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # 将路径转换为绝对路径，支持用户目录（~）和环境变量（如 $HOME）
+        expanded_path = os.path.expandvars(file_path)
+        self.file_path = Path(expanded_path).expanduser().resolve()
+        self.poll_interval = poll_interval
+        self.reloads = 0
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._table = KnowledgeTable({})
+        self._failed_signature: Optional[tuple] = None
+        self._checked_at = clock()
+        self._reload()
+
+    def _signature(self) -> Optional[tuple]:
+        try:
+            stat = self.file_path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _reload(self) -> None:
+        signature = self._signature()
+        if signature in (self._table.signature, self._failed_signature):
+            return
+        if signature is None:
+            log_warning(f"外部知识库配置文件 {self.file_path} 不存在")
+            if self._table.signature is not None:
+                self._table = KnowledgeTable({})
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as file:
+                config = json.load(file)
+            table = KnowledgeTable(config, signature)
+        except (OSError, ValueError, AttributeError) as e:
+            log_warning(f"外部知识库配置 {self.file_path} 加载失败，继续使用当前配置: {e}")
+            # 记录签名，文件再次变化前不重复解析
+            self._failed_signature = signature
+            return
+        self._table = table
+        self.reloads += 1
+        log_info(f"已加载外部知识库配置文件 {self.file_path}")
+
+    def maybe_reload(self) -> None:
+        now = self._clock()
+        if now - self._checked_at < self.poll_interval:
+            return
+        # 只有一个线程执行检查，其他线程继续使用当前配置
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = now
+            self._reload()
+        finally:
+            self._lock.release()
+
+    def get_config(self, project: str, logstore: str) -> Optional[Endpoint]:
+        """获取指定项目和日志仓库的外部知识库 endpoint 配置
+        优先级：logstore > project default > global default
+        :param project: 项目名称
+        :param logstore: 日志仓库名称
+        :return: 外部知识库 endpoint，未配置时返回 None
+        """
+        self.maybe_reload()
+        return self._table.resolve(project, logstore)
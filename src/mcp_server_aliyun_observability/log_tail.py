@@ -0,0 +1,190 @@
+import asyncio
+import time
+import uuid
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional
+
+from mcp_server_aliyun_observability.cache import TTLCache
+
+if TYPE_CHECKING:
+    from alibabacloud_sls20201230.client import Client as SLSClient
+    from alibabacloud_sls20201230.models import GetCursorResponse
+
+
+def flatten_log_group_list(log_group_list: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """将 PullLogs 返回的 LogGroupList 展开为与 GetLogs 结果一致的扁平日志列表"""
+    logs: List[Dict[str, Any]] = []
+    for log_group in log_group_list.get("logGroupList") or []:
+        topic = log_group.get("Topic", "")
+        source = log_group.get("Source", "")
+        tags = {
+            f"__tag__:{tag['Key']}": tag["Value"]
+            for tag in log_group.get("LogTags") or []
+        }
+        for item in log_group.get("LogItems") or []:
+            log = {"__time__": item.get("Time"), "__topic__": topic, "__source__": source}
+            log.update(tags)
+            for content in item.get("Contents") or []:
+                log[content["Key"]] = content["Value"]
+            logs.append(log)
+    return logs
+
+
+def pull_logs(
+    sls_client: "SLSClient",
+    project: str,
+    log_store: str,
+    shard_id: int,
+    cursor: str,
+    count: int,
+    query: Optional[str] = None,
+) -> tuple[List[Dict[str, Any]], str]:
+    """按游标拉取一个 shard 的日志，返回 (日志列表, 下一个游标)
+
+    SDK 中的 pull_logs_with_options 没有把 project 放入 Host，且按 JSON 解析 protobuf 响应，
+    因此这里直接构造 PullLogs 请求，并使用 aliyun_log_fastpb 解析 LogGroupList。
+    """
+    import aliyun_log_fastpb
+    from alibabacloud_tea_openapi import models as open_api_models
+    from alibabacloud_tea_util import models as util_models
+
+    query_params: Dict[str, Any] = {"type": "log", "cursor": cursor, "count": str(count)}
+    if query:
+        query_params["query"] = query
+    request = open_api_models.OpenApiRequest(
+        host_map={"project": project},
+        headers={"accept": "application/x-protobuf"},
+        query=query_params,
+    )
+    params = open_api_models.Params(
+        action="PullLogs",
+        version="2020-12-30",
+        protocol="HTTPS",
+        pathname=f"/logstores/{log_store}/shards/{shard_id}",
+        method="GET",
+        auth_type="AK",
+        style="ROA",
+        req_body_type="none",
+        body_type="byte",
+    )
+    runtime = util_models.RuntimeOptions(read_timeout=60000, connect_timeout=60000)
+    response = sls_client.execute(params, request, runtime)
+    headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+    next_cursor = headers.get("x-log-cursor", cursor)
+    body = response.get("body")
+    if not body:
+        return [], next_cursor
+    return flatten_log_group_list(aliyun_log_fastpb.deserialize_log_group_list(body)), next_cursor
+
+
+class LogTailer:
+    """基于 shard 游标的日志跟踪
+
+    - 每个跟踪会话保存各 shard 的游标，再次调用时只拉取新写入的数据
+    - 各 shard 并行拉取，单次返回的日志条数不超过 max_logs；PullLogs 按 LogGroup 拉取，
+      一轮拉取到的日志超过 max_logs 时，多出的日志保存在会话中，下次调用时优先返回
+    - 会话状态保存在有界的 TTLCache 中，会话 ID 与 MCP 会话绑定
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        session_ttl: int = 1800,
+        max_concurrency: int = 8,
+    ):
+        self._sessions = TTLCache(max_entries=max_sessions, ttl=session_ttl)
+        self._max_concurrency = max_concurrency
+
+    def get_session(self, owner: Any, tail_id: Optional[str], key: tuple) -> tuple[str, dict]:
+        if tail_id:
+            state = self._sessions.get((owner, tail_id))
+            if state is not None and state["key"] == key:
+                return tail_id, state
+        tail_id = uuid.uuid4().hex
+        state = {"key": key, "cursors": {}, "start": None, "pending": []}
+        return tail_id, state
+
+    def save_session(self, owner: Any, tail_id: str, state: dict) -> None:
+        self._sessions.set((owner, tail_id), state)
+
+    async def tail(
+        self,
+        sls_client: "SLSClient",
+        project: str,
+        log_store: str,
+        state: dict,
+        max_logs: int,
+        follow_seconds: float,
+        query: Optional[str] = None,
+        on_batch: Optional[Callable[[List[Dict[str, Any]], int], Awaitable[None]]] = None,
+        poll_interval: float = 1.0,
+    ) -> List[Dict[str, Any]]:
+        from alibabacloud_sls20201230.models import GetCursorRequest
+
+        # 先返回上次调用超出 max_logs 的日志
+        pending: List[Dict[str, Any]] = state["pending"]
+        collected = pending[:max_logs]
+        state["pending"] = pending[max_logs:]
+        if collected and on_batch is not None:
+            await on_batch(collected, len(collected))
+        if len(collected) >= max_logs:
+            return collected
+
+        shards = await asyncio.to_thread(sls_client.list_shards, project, log_store)
+        shard_ids = [shard.shard_id for shard in shards.body or []]
+        cursors: Dict[int, str] = state["cursors"]
+        start = state["start"] if state["start"] is not None else "end"
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        started_at = int(time.time())
+
+        async def ensure_cursor(shard_id: int) -> None:
+            if shard_id in cursors:
+                return
+            async with semaphore:
+                response: GetCursorResponse = await asyncio.to_thread(
+                    sls_client.get_cursor,
+                    project,
+                    log_store,
+                    str(shard_id),
+                    GetCursorRequest(from_=str(start)),
+                )
+            cursors[shard_id] = response.body.cursor
+
+        await asyncio.gather(*(ensure_cursor(shard_id) for shard_id in shard_ids))
+        if state["start"] is None:
+            # 后续新增的 shard 从本次跟踪开始的时间点读取
+            state["start"] = started_at
+
+        deadline = time.monotonic() + follow_seconds
+        while True:
+            remaining = max_logs - len(collected)
+            # PullLogs 的 count 是 LogGroup 数量，单个 LogGroup 可能包含多条日志
+            per_shard = max(1, min(remaining // max(len(shard_ids), 1), 100))
+
+            async def pull(shard_id: int) -> List[Dict[str, Any]]:
+                async with semaphore:
+                    logs, next_cursor = await asyncio.to_thread(
+                        pull_logs,
+                        sls_client,
+                        project,
+                        log_store,
+                        shard_id,
+                        cursors[shard_id],
+                        per_shard,
+                        query,
+                    )
+                cursors[shard_id] = next_cursor
+                return logs
+
+            batches = await asyncio.gather(*(pull(shard_id) for shard_id in shard_ids))
+            batch = [log for logs in batches for log in logs]
+            # 游标已经前移，超出 max_logs 的日志留到下次调用返回
+            state["pending"] = batch[remaining:]
+            batch = batch[:remaining]
+            if batch:
+                collected.extend(batch)
+                if on_batch is not None:
+                    await on_batch(batch, len(collected))
+            if len(collected) >= max_logs or time.monotonic() >= deadline:
+                return collected
+            if not batch:
+                await asyncio.sleep(min(poll_interval, max(deadline - time.monotonic(), 0)))
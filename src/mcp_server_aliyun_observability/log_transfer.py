@@ -0,0 +1,295 @@
+import io
+import json
+import re
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from mcp_server_aliyun_observability.logger import log_debug
+
+if TYPE_CHECKING:
+    from alibabacloud_sls20201230.client import Client
+    from alibabacloud_sls20201230.models import GetLogsRequest
+    from alibabacloud_tea_util.models import RuntimeOptions
+
+# GetLogsV2 支持的响应压缩方式
+COMPRESSION_TYPES = ("lz4", "zstd", "gzip")
+
+
+class TransferStats:
+    """压缩传输的字节统计：wire_bytes 为实际传输的（压缩后）字节数，raw_bytes 为解压后的字节数"""
+
+    def __init__(self):
+        self.requests = 0
+        self.wire_bytes = 0
+        self.raw_bytes = 0
+        self._lock = threading.Lock()
+
+    def record(self, wire_bytes: int, raw_bytes: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += wire_bytes
+            self.raw_bytes += raw_bytes
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "wireBytes": self.wire_bytes,
+                "rawBytes": self.raw_bytes,
+                "savedBytes": self.raw_bytes - self.wire_bytes,
+                "ratio": round(self.wire_bytes / self.raw_bytes, 4) if self.raw_bytes else None,
+            }
+
+
+def get_logs(
+    sls_client: "Client",
+    project: str,
+    logstore: str,
+    request: "GetLogsRequest",
+    runtime: "RuntimeOptions",
+    compression: Optional[str] = None,
+    stats: Optional[TransferStats] = None,
+) -> List[Dict[str, Any]]:
+    """执行查询并返回日志列表
+
+    compression 为空时调用 GetLogs；否则改用 GetLogsV2 并通过 Accept-Encoding 请求压缩的响应，
+    由 SDK 的 SLS 网关解压（lz4/zstd 为 C 扩展实现），两者返回的日志格式相同。
+    压缩传输时根据响应头记录传输字节数和原始字节数。
+    """
+    return get_logs_with_progress(
+        sls_client, project, logstore, request, runtime, compression, stats
+    )[0]
+
+
+def get_logs_with_progress(
+    sls_client: "Client",
+    project: str,
+    logstore: str,
+    request: "GetLogsRequest",
+    runtime: "RuntimeOptions",
+    compression: Optional[str] = None,
+    stats: Optional[TransferStats] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """与 get_logs 相同，另返回查询进度：GetLogs 取响应头 x-log-progress，GetLogsV2 取 meta.progress
+
+    进度为 Complete 以外的值（如 Incomplete）表示本次返回的结果不完整，响应中没有进度时为 None
+    """
+    if not compression:
+        response = sls_client.get_logs_with_options(
+            project, logstore, request, headers={}, runtime=runtime
+        )
+        headers = {key.lower(): value for key, value in (response.headers or {}).items()}
+        return response.body, headers.get("x-log-progress")
+    body = _get_logs_v2(sls_client, project, logstore, request, runtime, compression, stats)
+    parsed = json.loads(body) or {}
+    return parsed.get("data") or [], (parsed.get("meta") or {}).get("progress")
+
+
+EMPTY_RAW_ARRAY = b"[]"
+
+
+def get_logs_raw(
+    sls_client: "Client",
+    project: str,
+    logstore: str,
+    request: "GetLogsRequest",
+    runtime: "RuntimeOptions",
+    compression: Optional[str] = None,
+    stats: Optional[TransferStats] = None,
+) -> bytes:
+    """执行查询并返回日志列表的原始 JSON 字节（JSON 数组），不解析为 Python 对象
+
+    compression 为空时以 binary 响应体调用 GetLogs，响应体本身即为日志数组；
+    否则调用 GetLogsV2，从 {"meta": ..., "data": [...]} 中截取 data 部分，结构不符合预期时退回解析后重新序列化。
+    """
+    if compression:
+        body = _get_logs_v2(sls_client, project, logstore, request, runtime, compression, stats)
+        data = _data_member(body)
+        if data is None:
+            data = json.dumps(
+                (json.loads(body) or {}).get("data") or [], ensure_ascii=False
+            ).encode("utf-8")
+        return data
+
+    from alibabacloud_openapi_util.client import Client as OpenApiUtilClient
+    from alibabacloud_tea_openapi import models as open_api_models
+
+    query = {
+        "from": request.from_,
+        "line": request.line,
+        "offset": request.offset,
+        "powerSql": request.power_sql,
+        "query": request.query,
+        "reverse": request.reverse,
+        "to": request.to,
+        "topic": request.topic,
+    }
+    # 与 SDK 的 get_logs_with_options 相同，区别是响应体类型为 binary
+    params = open_api_models.Params(
+        action="GetLogs",
+        version="2020-12-30",
+        protocol="HTTPS",
+        pathname=f"/logstores/{logstore}?type=log",
+        method="GET",
+        auth_type="AK",
+        style="ROA",
+        req_body_type="json",
+        body_type="binary",
+    )
+    api_request = open_api_models.OpenApiRequest(
+        host_map={"project": project},
+        headers={},
+        query=OpenApiUtilClient.query({k: v for k, v in query.items() if v is not None}),
+    )
+    response = sls_client.execute(params, api_request, runtime)
+    data = _read_body(response.get("body")).strip()
+    return data if data not in (b"", b"null") else EMPTY_RAW_ARRAY
+
+
+def raw_is_empty(raw: bytes) -> bool:
+    """get_logs_raw 返回的日志数组是否为空（兼容未归一化的空响应体、null 和带空白的 []）"""
+    data = raw.strip()
+    return data in (b"", b"null") or (data[:1] == b"[" and data[1:].lstrip() == b"]")
+
+
+def embed_raw_json(result: Dict[str, Any], key: str, raw: bytes) -> str:
+    """把 result 序列化为 JSON 对象文本，并将已编码的 JSON 字节 raw 原样作为 key 的值拼接在最后"""
+    head = json.dumps(result, ensure_ascii=False).encode("utf-8")
+    separator = b", " if len(head) > 2 else b""
+    member = json.dumps(key).encode("utf-8") + b": "
+    return b"".join((head[:-1], separator, member, raw, b"}")).decode("utf-8")
+
+
+def _get_logs_v2(
+    sls_client: "Client",
+    project: str,
+    logstore: str,
+    request: "GetLogsRequest",
+    runtime: "RuntimeOptions",
+    compression: str,
+    stats: Optional[TransferStats],
+) -> bytes:
+    from alibabacloud_openapi_util.client import Client as OpenApiUtilClient
+    from alibabacloud_tea_openapi import models as open_api_models
+
+    body = {
+        "from": request.from_,
+        "to": request.to,
+        "query": request.query,
+        "line": request.line,
+        "offset": request.offset,
+        "reverse": request.reverse,
+        "powerSql": request.power_sql,
+        "topic": request.topic,
+    }
+    # 与 SDK 的 get_logs_v2with_options 相同，区别是响应体类型为 binary：SDK 解压后的 BytesIO 直接返回，
+    # 由调用方一次性解析 JSON，避免 SDK 按 1KB 分块拼接响应体（大结果下耗时随大小平方增长）
+    params = open_api_models.Params(
+        action="GetLogsV2",
+        version="2020-12-30",
+        protocol="HTTPS",
+        pathname=f"/logstores/{logstore}/logs",
+        method="POST",
+        auth_type="AK",
+        style="ROA",
+        req_body_type="json",
+        body_type="binary",
+    )
+    api_request = open_api_models.OpenApiRequest(
+        host_map={"project": project},
+        headers={"Accept-Encoding": compression},
+        body=OpenApiUtilClient.parse_to_map({k: v for k, v in body.items() if v is not None}),
+    )
+    response = sls_client.execute(params, api_request, runtime)
+    headers = {key.lower(): value for key, value in (response.get("headers") or {}).items()}
+    if stats is not None and headers.get("content-length") and headers.get("x-log-bodyrawsize"):
+        wire_bytes = int(headers["content-length"])
+        raw_bytes = int(headers["x-log-bodyrawsize"])
+        stats.record(wire_bytes, raw_bytes)
+        log_debug(
+            f"GetLogsV2 {project}/{logstore}: {wire_bytes} bytes on wire, {raw_bytes} bytes raw, "
+            f"compression {headers.get('x-log-compresstype')}"
+        )
+    return _read_body(response.get("body"))
+
+
+_META_PREFIX = re.compile(rb'\s*\{\s*"meta"\s*:')
+_DATA_KEY = re.compile(rb'\s*,\s*"data"\s*:\s*')
+
+
+def _unescaped_quotes(body: bytes, start: int, end: int) -> int:
+    """body[start:end] 中未转义的双引号数量：前面有奇数个连续反斜杠的引号是转义的"""
+    count = body.count(b'"', start, end)
+    run, sign = b'\\"', 1
+    while True:
+        # 前面至少有 k 个反斜杠的引号数量，按 k 的奇偶交替加减得到转义的引号数量
+        matched = body.count(run, start, end)
+        if not matched:
+            return count
+        count -= sign * matched
+        run, sign = b"\\" + run, -sign
+
+
+def _array_end(body: bytes, start: int) -> Optional[int]:
+    """body[start] 为 [ 时返回与之匹配的 ] 之后的位置，括号不匹配时返回 None
+
+    只在方括号处按两个括号之间未转义的引号数量判断是否处于字符串中，其余内容由 bytes.find/count 跳过
+    """
+    depth = 0
+    position = start
+    in_string = False
+    next_open, next_close = body.find(b"[", start), body.find(b"]", start)
+    while True:
+        if next_close < 0:
+            return None
+        if 0 <= next_open < next_close:
+            bracket, next_open = next_open, body.find(b"[", next_open + 1)
+        else:
+            bracket, next_close = next_close, body.find(b"]", next_close + 1)
+        if _unescaped_quotes(body, position, bracket) % 2:
+            in_string = not in_string
+        position = bracket + 1
+        if in_string:
+            continue
+        depth += 1 if body[bracket] == ord("[") else -1
+        if depth == 0:
+            return position
+
+
+def _data_member(body: bytes) -> Optional[bytes]:
+    """从 GetLogsV2 的响应体中截取 data 数组的字节
+
+    服务端按 meta、data 的顺序输出：找到 meta 对象之后的 ,"data": ，只解析较小的 meta 部分用于确认位置，
+    再跳过字符串找到与之匹配的 ]，要求其后只有对象结尾的 }（data 为最后一个成员）；不符合该结构时返回 None。
+    """
+    prefix = _META_PREFIX.match(body)
+    if prefix is None:
+        return None
+    for attempt, data_key in enumerate(_DATA_KEY.finditer(body, prefix.end())):
+        if attempt >= 8:
+            return None
+        try:
+            json.loads(body[prefix.end() : data_key.start()])
+        except ValueError:
+            # meta 中的字符串或嵌套对象也可能包含 "data":，继续查找下一个
+            continue
+        start = data_key.end()
+        if body[start : start + 1] != b"[":
+            return None
+        end = _array_end(body, start)
+        if end is None or body[end:].strip() != b"}":
+            return None
+        return body[start:end]
+    return None
+
+
+def _read_body(body: Any) -> bytes:
+    if body is None:
+        return b"null"
+    if isinstance(body, (bytes, bytearray)):
+        return bytes(body)
+    if isinstance(body, io.BytesIO):
+        return body.getvalue()
+    if hasattr(body, "read"):
+        return body.read()
+    return str(body).encode("utf-8")
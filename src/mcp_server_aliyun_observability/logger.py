@@ -1,6 +1,7 @@
 import logging
 import logging.handlers
 import os
+import threading
 from datetime import datetime
 from os import getenv
 from pathlib import Path
@@ -12,6 +13,8 @@ from rich.text import Text
 
 LOGGER_NAME = "mcp_server_aliyun_observability"
 
+_handlers_lock = threading.Lock()
+
 # Define custom styles for log sources
 LOG_STYLES = {
     "server": {
@@ -42,6 +45,18 @@ class ColoredRichHandler(RichHandler):
 class MCPLogger(logging.Logger):
     def __init__(self, name: str, level: int = logging.NOTSET):
         super().__init__(name, level)
+        self.source_type: Optional[str] = None
+        self._handlers_ready = True
+
+    def handle(self, record: logging.LogRecord) -> None:
+        # 控制台和文件处理器在第一条日志输出时才创建，避免导入时创建 rich 控制台和打开日志文件
+        if not self._handlers_ready:
+            with _handlers_lock:
+                if not self._handlers_ready:
+                    setup_console_handler(self, self.source_type)
+                    setup_file_handler(self)
+                    self._handlers_ready = True
+        super().handle(record)
 
     def debug(self, msg: str, center: bool = False, symbol: str = "*", *args, **kwargs):
         if center:
@@ -79,16 +94,8 @@ def setup_file_handler(logger_instance: logging.Logger) -> None:
     logger_instance.addHandler(file_handler)
 
 
-def build_logger(logger_name: str, source_type: Optional[str] = None) -> Any:
-    # Set the custom logger class as the default for this logger
-    logging.setLoggerClass(MCPLogger)
-
-    # Create logger with custom class
-    _logger = logging.getLogger(logger_name)
-
-    # Reset logger class to default to avoid affecting other loggers
-    logging.setLoggerClass(logging.Logger)
-
+def setup_console_handler(logger_instance: logging.Logger, source_type: Optional[str] = None) -> None:
+    """设置控制台处理器，日志通过 rich 输出到 stderr"""
     # 创建自定义控制台，设置合适的宽度
     try:
         import shutil
@@ -99,7 +106,9 @@ def build_logger(logger_name: str, source_type: Optional[str] = None) -> Any:
     except Exception:
         console_width = 120  # 默认宽度
 
+    # 日志输出到 stderr，stdio 传输模式下 stdout 是 MCP 协议通道
     console = Console(
+        stderr=True,
         width=console_width,
         force_terminal=True,
         no_color=False,
@@ -126,10 +135,22 @@ def build_logger(logger_name: str, source_type: Optional[str] = None) -> Any:
         )
     )
 
-    _logger.addHandler(rich_handler)
+    logger_instance.addHandler(rich_handler)
+
 
-    # 添加文件处理器
-    setup_file_handler(_logger)
+def build_logger(logger_name: str, source_type: Optional[str] = None) -> Any:
+    # Set the custom logger class as the default for this logger
+    logging.setLoggerClass(MCPLogger)
+
+    # Create logger with custom class
+    _logger = logging.getLogger(logger_name)
+
+    # Reset logger class to default to avoid affecting other loggers
+    logging.setLoggerClass(logging.Logger)
+
+    # 处理器延迟到第一条日志输出时创建
+    _logger.source_type = source_type or "server"
+    _logger._handlers_ready = False
 
     _logger.setLevel(logging.INFO)
     _logger.propagate = False
@@ -168,6 +189,11 @@ def set_log_level_to_info(source_type: Optional[str] = None):
     debug_on = False
 
 
+def is_debug_enabled(level: Literal[1, 2] = 1) -> bool:
+    """是否会输出指定级别的DEBUG日志，用于在构造较大的日志内容前提前判断"""
+    return debug_on and debug_level >= level
+
+
 def center_header(message: str, symbol: str = "*") -> str:
     """将消息居中显示"""
     try:
@@ -0,0 +1,259 @@
+import math
+import re
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp_server_aliyun_observability.logger import log_debug
+from mcp_server_aliyun_observability.query_validation import split_query, tokenize
+from mcp_server_aliyun_observability.sliding_window import (
+    IncrementalQueryError,
+    detect_time_bucket,
+)
+
+DIRECT = "direct"
+SLICED = "sliced"
+SAMPLED = "sampled"
+REFUSED = "refused"
+
+# 分析语句未指定 limit 时 SLS 默认返回的行数
+SQL_DEFAULT_LIMIT = 100
+
+_AGGREGATE_FUNCTIONS = frozenset(
+    """
+    count count_if sum avg min max min_by max_by arbitrary approx_distinct approx_percentile
+    approx_set array_agg map_agg histogram numeric_histogram stddev stddev_pop stddev_samp
+    variance var_pop var_samp bool_and bool_or every checksum geometric_mean kurtosis skewness
+    bitwise_and_agg bitwise_or_agg corr covar_pop covar_samp regr_intercept regr_slope
+    """.split()
+)
+_ORDER_BY_PATTERN = re.compile(r"\border\s+by\b", re.IGNORECASE)
+_TAIL_ORDER_PATTERN = re.compile(
+    r"\border\s+by\s+(\"?)([A-Za-z_][A-Za-z0-9_]*)\1\s*(asc|desc)?\s*(?:limit\s+(\d+))?\s*;?\s*$",
+    re.IGNORECASE,
+)
+_TAIL_LIMIT_PATTERN = re.compile(r"\blimit\s+(\d+)\s*;?\s*$", re.IGNORECASE)
+_ANY_TAIL_LIMIT_PATTERN = re.compile(r"\blimit\s+\d+(\s*,\s*\d+)?\s*;?\s*$", re.IGNORECASE)
+
+
+def is_heavy_query(query: str) -> bool:
+    """查询是否包含需要扫描全部命中日志的分析语句（聚合、分组、排序或去重）
+
+    纯检索语句和 SPL 语句按 limit 返回即可结束，不需要估算代价。
+    """
+    _, sql = split_query(query)
+    if sql is None:
+        return False
+    tokens = tokenize(sql)
+    if not tokens or tokens[0].lower not in ("select", "with"):
+        return False
+    for i, token in enumerate(tokens):
+        if token.kind != "ident":
+            continue
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.lower in ("group", "order", "distinct", "join"):
+            return True
+        if token.lower in _AGGREGATE_FUNCTIONS and following is not None and following.text == "(":
+            return True
+    return False
+
+
+def _slice_order(query: str) -> Optional[Dict[str, Any]]:
+    """按时间桶聚合且结果可以按时间切片后拼接的查询，返回时间桶及合并方式，否则返回 None
+
+    要求：
+    - 分析语句中能识别出带别名的时间桶表达式，并且按时间桶分组
+    - 没有排序，或者只按时间桶排序（切片结果拼接后重新排序即可得到相同结果）
+    """
+    _, sql = split_query(query)
+    if sql is None:
+        return None
+    detected = detect_time_bucket(sql)
+    if not detected or not detected[1]:
+        return None
+    bucket_seconds, bucket_field = detected
+    if not re.search(r"\bgroup\s+by\b", sql, re.IGNORECASE):
+        return None
+    descending = False
+    limit = None
+    if _ORDER_BY_PATTERN.search(sql):
+        match = _TAIL_ORDER_PATTERN.search(sql)
+        if match is None or match.group(2).lower() != bucket_field.lower():
+            return None
+        if len(_ORDER_BY_PATTERN.findall(sql)) > 1:
+            return None
+        descending = (match.group(3) or "").lower() == "desc"
+        limit = int(match.group(4)) if match.group(4) else None
+    else:
+        match = _TAIL_LIMIT_PATTERN.search(sql)
+        limit = int(match.group(1)) if match else None
+    return {
+        "bucket_seconds": bucket_seconds,
+        "bucket_field": bucket_field,
+        "descending": descending,
+        "limit": limit if limit is not None else SQL_DEFAULT_LIMIT,
+    }
+
+
+def incremental_order(query: str, bucket_field: str) -> bool:
+    """检查查询能否按时间桶分段执行后合并（增量模式），返回是否按时间桶倒序排列
+
+    分段结果拼接后只能按时间桶重新排序，因此要求没有 limit，并且没有排序或只按时间桶排序，
+    不满足时抛出 IncrementalQueryError。
+    """
+    _, sql = split_query(query)
+    if sql is None:
+        raise IncrementalQueryError("增量模式只支持分析语句")
+    if _ANY_TAIL_LIMIT_PATTERN.search(sql):
+        raise IncrementalQueryError("增量模式不支持带 limit 的查询，分段结果合并后会超过原查询的行数")
+    if not _ORDER_BY_PATTERN.search(sql):
+        return False
+    match = _TAIL_ORDER_PATTERN.search(sql)
+    if (
+        match is None
+        or match.group(2).lower() != bucket_field.lower()
+        or len(_ORDER_BY_PATTERN.findall(sql)) > 1
+    ):
+        raise IncrementalQueryError(f"增量模式只支持不排序或只按时间桶 {bucket_field} 排序的查询")
+    return (match.group(3) or "").lower() == "desc"
+
+
+class QueryPlanner:
+    """根据 GetHistograms 返回的命中行数分布，在执行分析查询前选择执行策略
+
+    - direct: 命中行数不超过 direct_max_rows，或不是需要全量扫描的分析查询，直接执行
+    - sliced: 按时间桶聚合的查询，在桶边界处按行数均匀切分时间范围，各切片并行执行后拼接
+    - sampled: 无法切片的聚合查询，只查询结束时间之前约 direct_max_rows 行的时间窗口，并在结果中标注覆盖比例
+    - refused: 命中行数超过 max_rows，或需要抽样但不允许抽样时，不执行查询并返回建议
+
+    阈值均为行数，可以通过构造参数调整。
+    """
+
+    def __init__(
+        self,
+        direct_max_rows: int = 50_000_000,
+        slice_rows: Optional[int] = None,
+        max_slices: int = 8,
+        max_rows: int = 2_000_000_000,
+        allow_sampling: bool = True,
+        histogram_attempts: int = 3,
+    ):
+        self.direct_max_rows = direct_max_rows
+        self.slice_rows = slice_rows or direct_max_rows
+        self.max_slices = max_slices
+        self.max_rows = max_rows
+        self.allow_sampling = allow_sampling
+        self.histogram_attempts = histogram_attempts
+
+    def fetch_histograms(
+        self, get_histograms: Callable[[], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """获取命中行数分布，结果不完整（progress 不是 Complete）时重试，最多 histogram_attempts 次"""
+        histograms: List[Dict[str, Any]] = []
+        for _ in range(self.histogram_attempts):
+            histograms = get_histograms()
+            if all(bucket.get("progress") == "Complete" for bucket in histograms):
+                break
+        return sorted(histograms, key=lambda bucket: bucket["from"])
+
+    def plan(
+        self,
+        query: str,
+        from_ts: int,
+        to_ts: int,
+        histograms: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        total = sum(int(bucket.get("count") or 0) for bucket in histograms)
+        plan: Dict[str, Any] = {
+            "strategy": DIRECT,
+            "estimatedRows": total,
+            "complete": all(bucket.get("progress") == "Complete" for bucket in histograms),
+        }
+        if not is_heavy_query(query) or total <= self.direct_max_rows:
+            return plan
+        if total > self.max_rows:
+            return self._refuse(
+                plan, histograms, f"预计扫描 {total} 行，超过上限 {self.max_rows} 行"
+            )
+
+        order = _slice_order(query)
+        slice_count = math.ceil(total / self.slice_rows)
+        if order is not None and slice_count <= self.max_slices:
+            slices = self._slices(histograms, from_ts, to_ts, slice_count, order["bucket_seconds"])
+            if len(slices) > 1:
+                plan.update(strategy=SLICED, slices=slices, merge=order)
+                return plan
+
+        if not self.allow_sampling:
+            return self._refuse(
+                plan, histograms, f"预计扫描 {total} 行，超过直接查询的上限 {self.direct_max_rows} 行"
+            )
+        window_from, rows = self._sample_window(histograms, from_ts)
+        plan.update(
+            strategy=SAMPLED,
+            sampled={
+                "from": window_from,
+                "to": to_ts,
+                "estimatedRows": rows,
+                "ratio": round(rows / total, 4),
+            },
+        )
+        return plan
+
+    def _slices(
+        self,
+        histograms: List[Dict[str, Any]],
+        from_ts: int,
+        to_ts: int,
+        slice_count: int,
+        bucket_seconds: int,
+    ) -> List[List[int]]:
+        """按累计行数切分时间范围，内部边界向下对齐到时间桶边界，保证每个桶只落在一个切片中"""
+        total = sum(int(bucket.get("count") or 0) for bucket in histograms)
+        boundaries = [from_ts]
+        accumulated = 0
+        for bucket in histograms:
+            accumulated += int(bucket.get("count") or 0)
+            if len(boundaries) >= slice_count:
+                break
+            if accumulated < total * len(boundaries) / slice_count:
+                continue
+            boundary = bucket["to"] - bucket["to"] % bucket_seconds
+            if boundaries[-1] < boundary < to_ts:
+                boundaries.append(boundary)
+        boundaries.append(to_ts)
+        return [[start, end] for start, end in zip(boundaries, boundaries[1:])]
+
+    def _sample_window(self, histograms: List[Dict[str, Any]], from_ts: int) -> tuple[int, int]:
+        """从结束时间向前累计，直到覆盖约 direct_max_rows 行"""
+        rows = 0
+        window_from = from_ts
+        for bucket in reversed(histograms):
+            count = int(bucket.get("count") or 0)
+            if rows and rows + count > self.direct_max_rows:
+                break
+            rows += count
+            window_from = max(from_ts, bucket["from"])
+        return window_from, rows
+
+    @staticmethod
+    def _refuse(plan: Dict[str, Any], histograms: List[Dict[str, Any]], reason: str) -> Dict[str, Any]:
+        hotspots = sorted(histograms, key=lambda bucket: int(bucket.get("count") or 0), reverse=True)
+        plan.update(
+            strategy=REFUSED,
+            reason=reason,
+            hotspots=[
+                {"from": bucket["from"], "to": bucket["to"], "count": int(bucket.get("count") or 0)}
+                for bucket in hotspots[:3]
+            ],
+        )
+        return plan
+
+    @staticmethod
+    def merge_slices(plan: Dict[str, Any], results: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """拼接各切片的结果，按时间桶重新排序并按原查询的 limit 截断"""
+        merge = plan["merge"]
+        rows = [row for result in results for row in result]
+        try:
+            rows.sort(key=lambda row: float(row[merge["bucket_field"]]), reverse=merge["descending"])
+        except (KeyError, TypeError, ValueError) as e:
+            log_debug(f"切片结果中的时间桶无法排序，保持切片顺序: {e}")
+        return rows[: merge["limit"]]
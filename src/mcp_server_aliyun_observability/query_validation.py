@@ -0,0 +1,237 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 查询分析语句中不是列名的关键字、类型名和时间单位
+SQL_KEYWORDS = frozenset(
+    """
+    select from where group by order having limit offset as and or not in is null true false
+    like between case when then else end distinct all asc desc on join inner left right full
+    outer cross natural using union except intersect with over partition rows range preceding
+    following unbounded current row interval date time timestamp zone at second minute hour day
+    week month quarter year millisecond exists any some escape nulls first last filter within
+    array map varchar char bigint integer int smallint tinyint double real decimal boolean json
+    varbinary ipaddress current_date current_time current_timestamp localtime localtimestamp
+    lateral unnest values ordinality grouping sets cube rollup fetch next only
+    """.split()
+)
+
+_TOKEN_PATTERN = re.compile(
+    r"""
+    (?P<space>\s+)
+    |(?P<string>'(?:[^']|'')*')
+    |(?P<quoted>"(?:[^"]|"")*")
+    |(?P<number>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+    |(?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+    |(?P<op>->|\|\||<=|>=|<>|!=|.)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+class Token:
+    __slots__ = ("kind", "text", "start", "end")
+
+    def __init__(self, kind: str, text: str, start: int, end: int):
+        self.kind = kind
+        self.text = text
+        self.start = start
+        self.end = end
+
+    @property
+    def lower(self) -> str:
+        return self.text.lower()
+
+    @property
+    def name(self) -> str:
+        """标识符的名称，双引号标识符去掉引号"""
+        if self.kind == "quoted":
+            return self.text[1:-1].replace('""', '"')
+        return self.text
+
+
+def tokenize(sql: str) -> List[Token]:
+    return [
+        Token(match.lastgroup, match.group(), match.start(), match.end())
+        for match in _TOKEN_PATTERN.finditer(sql)
+        if match.lastgroup != "space"
+    ]
+
+
+def split_query(query: str) -> Tuple[str, Optional[str]]:
+    """将查询拆分为检索语句和分析语句（第一个不在引号中的 |），没有分析语句时返回 None"""
+    quote = None
+    for i, char in enumerate(query):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == "|":
+            return query[:i], query[i + 1 :]
+    return query, None
+
+
+def _index_fields(index: Dict[str, Any]) -> Dict[str, Optional[bool]]:
+    """索引中可用于分析语句的字段（小写）到是否开启统计的映射，None 表示未知"""
+    fields: Dict[str, Optional[bool]] = {}
+    for key, config in index.items():
+        config = config or {}
+        doc_value = config.get("doc_value")
+        fields[key.lower()] = doc_value
+        if config.get("alias"):
+            fields[config["alias"].lower()] = doc_value
+        for sub_key, sub_config in (config.get("json_keys") or {}).items():
+            sub_doc_value = (sub_config or {}).get("doc_value")
+            fields[f"{key}.{sub_key}".lower()] = sub_doc_value
+            if (sub_config or {}).get("alias"):
+                fields[sub_config["alias"].lower()] = sub_doc_value
+    return fields
+
+
+def _declared_names(tokens: List[Token]) -> set:
+    """语句中以括号列表声明的名称
+
+    - 表别名后的列名列表，如 cross join unnest(tags) as t(tag) 中的 tag
+    - 括号中的 lambda 参数，如 map_filter(m, (k, v) -> v > 0) 中的 k 和 v
+    """
+    names: set = set()
+    for i, token in enumerate(tokens):
+        if token.text == "->" and i > 0 and tokens[i - 1].text == ")":
+            # 向前找到参数列表的左括号
+            j = i - 2
+            while j >= 0 and tokens[j].text != "(":
+                j -= 1
+            names.update(t.name.lower() for t in tokens[j + 1 : i - 1] if t.kind in ("ident", "quoted"))
+        elif (
+            token.text == "("
+            and i >= 2
+            and tokens[i - 1].kind in ("ident", "quoted")
+            and tokens[i - 2].lower == "as"
+        ):
+            # as 之后紧跟括号的是表别名的列名列表；with 中的 name as (...) 是子查询，不会匹配
+            j = i + 1
+            while j < len(tokens) and tokens[j].text != ")":
+                if tokens[j].kind in ("ident", "quoted"):
+                    names.add(tokens[j].name.lower())
+                j += 1
+    return names
+
+
+def _column_references(tokens: List[Token], json_roots: set) -> Tuple[List[Tuple[str, Token, Token]], set]:
+    """找出分析语句中引用的列，返回 [(列名, 起始 token, 结束 token)] 和语句中定义的别名"""
+    references: List[Tuple[str, Token, Token]] = []
+    aliases: set = _declared_names(tokens)
+    previous: Optional[Token] = None
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if token.kind in ("ident", "quoted"):
+            after_as = previous is not None and previous.lower == "as"
+            after_table = previous is not None and previous.lower in ("from", "join")
+            # with 中定义的子查询名：name as (...)
+            cte_name = (
+                following is not None
+                and following.lower == "as"
+                and i + 2 < len(tokens)
+                and tokens[i + 2].text == "("
+            )
+            # 紧跟在表达式之后的标识符是省略了 AS 的别名，如 count(1) c
+            implicit_alias = previous is not None and (
+                previous.text == ")"
+                or previous.kind in ("quoted", "number", "string")
+                or (previous.kind == "ident" and previous.lower not in SQL_KEYWORDS)
+            )
+            if token.kind == "ident" and token.lower in SQL_KEYWORDS and not after_as:
+                pass
+            elif (
+                after_as
+                or cte_name
+                or implicit_alias
+                or (following is not None and following.text == "->")
+            ):
+                # 别名、with 中的子查询名、lambda 参数
+                aliases.add(token.name.lower())
+            elif following is not None and following.text == "(":
+                pass  # 函数
+            elif after_table:
+                # from 之后的表名，以及紧跟的表别名
+                if following is not None and following.kind == "ident" and following.lower not in SQL_KEYWORDS:
+                    aliases.add(following.lower)
+                    i += 1
+            elif token.kind == "ident" and previous is not None and previous.text == ".":
+                pass  # 限定名的后半部分
+            elif token.kind == "ident" and following is not None and following.text == ".":
+                # 未加引号的 json 子字段，如 attributes.user_id；其他限定名（如表别名.列名）不校验
+                end = i
+                while (
+                    end + 2 < len(tokens)
+                    and tokens[end + 1].text == "."
+                    and tokens[end + 2].kind == "ident"
+                ):
+                    end += 2
+                if token.lower in json_roots and end > i:
+                    name = "".join(t.text for t in tokens[i : end + 1])
+                    references.append((name, token, tokens[end]))
+                    previous = tokens[end]
+                    i = end + 1
+                    continue
+            else:
+                references.append((token.name, token, token))
+        previous = token
+        i += 1
+    return references, aliases
+
+
+def validate_query(query: str, index: Dict[str, Any]) -> Dict[str, Any]:
+    """根据日志库索引校验查询中分析语句引用的列
+
+    index 为 sls_describe_logstore 返回的结构（字段名到 alias/type/doc_value/json_keys 的映射）。
+    返回：
+    - query: 校验后的查询，未加引号的 json 子字段会改写为带双引号的形式
+    - unknownColumns: 索引中不存在的列
+    - noStatisticsColumns: 未开启统计（doc_value）的列
+    - rewrites: 改写记录
+    检索语句、SPL 语句和无法识别的语句不做校验，原样返回。
+    """
+    result: Dict[str, Any] = {
+        "query": query,
+        "unknownColumns": [],
+        "noStatisticsColumns": [],
+        "rewrites": [],
+    }
+    search, sql = split_query(query)
+    if sql is None:
+        return result
+    tokens = tokenize(sql)
+    if not tokens or tokens[0].lower not in ("select", "with"):
+        return result
+    if any(token.text == "|" for token in tokens):
+        return result  # SPL 多级管道
+    fields = _index_fields(index)
+    json_roots = {
+        key.lower() for key, config in index.items() if (config or {}).get("json_keys")
+    }
+    references, aliases = _column_references(tokens, json_roots)
+
+    rewritten = sql
+    # 从后向前改写，保证前面 token 的位置不变
+    for name, first, last in reversed(references):
+        lower = name.lower()
+        if lower.startswith("__") or lower in aliases:
+            continue
+        if lower not in fields:
+            if name not in result["unknownColumns"]:
+                result["unknownColumns"].insert(0, name)
+            continue
+        if fields[lower] is False and name not in result["noStatisticsColumns"]:
+            result["noStatisticsColumns"].insert(0, name)
+        if first is not last:
+            quoted = '"' + name.replace('"', '""') + '"'
+            rewritten = rewritten[: first.start] + quoted + rewritten[last.end :]
+            rewrite = {"from": name, "to": quoted}
+            if rewrite not in result["rewrites"]:
+                result["rewrites"].insert(0, rewrite)
+    if result["rewrites"]:
+        result["query"] = f"{search}|{rewritten}"
+    return result
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp.server.fastmcp import FastMCP
+
+RESULT_URI_PREFIX = "result://"
+
+
+class ResultNotFoundError(ValueError):
+    """结果不存在或已过期"""
+
+
+class ResultStore:
+    """服务端保存的大结果集，以 MCP 资源的形式分页读取
+
+    - 工具返回的行数超过 inline_rows 时，结果整体存入本地，工具响应只包含第一页和资源 URI
+    - 客户端通过 resources/read 读取 result://{resultId}/{offset}/{limit} 获取需要的分页
+    - 按保存的总行数（max_rows）和结果个数（max_results）限制内存，超出时淘汰最久未访问的结果；结果在 ttl 秒后过期
+    - 结果ID为随机生成，只有拿到工具响应的客户端才能读取
+    """
+
+    def __init__(
+        self,
+        inline_rows: int = 100,
+        page_size: int = 100,
+        max_page_size: int = 1000,
+        max_results: int = 256,
+        max_rows: int = 1_000_000,
+        ttl: float = 1800,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.inline_rows = inline_rows
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.max_results = max_results
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self._clock = clock
+        self._results: "OrderedDict[str, tuple[List[Any], float]]" = OrderedDict()
+        self._rows = 0
+        self._lock = threading.Lock()
+
+    def put(self, rows: List[Any]) -> Optional[str]:
+        """保存结果并返回结果ID，行数超过 max_rows 时不保存，返回 None"""
+        if len(rows) > self.max_rows:
+            return None
+        result_id = uuid.uuid4().hex
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            self._results[result_id] = (rows, now + self.ttl)
+            self._rows += len(rows)
+            while len(self._results) > self.max_results or self._rows > self.max_rows:
+                _, (evicted, _) = self._results.popitem(last=False)
+                self._rows -= len(evicted)
+        return result_id
+
+    def _expire(self, now: float) -> None:
+        for result_id, (rows, expire_at) in list(self._results.items()):
+            if expire_at <= now:
+                del self._results[result_id]
+                self._rows -= len(rows)
+
+    def page(self, result_id: str, offset: int = 0, limit: Optional[int] = None) -> Dict[str, Any]:
+        limit = min(self.page_size if limit is None else limit, self.max_page_size)
+        if offset < 0 or limit < 1:
+            raise ValueError("offset 不能小于 0，limit 不能小于 1")
+        with self._lock:
+            item = self._results.get(result_id)
+            if item is None or item[1] <= self._clock():
+                raise ResultNotFoundError(f"结果 {result_id} 不存在或已过期，请重新调用工具查询")
+            self._results.move_to_end(result_id)
+            rows = item[0]
+        page: Dict[str, Any] = {
+            "resultId": result_id,
+            "offset": offset,
+            "limit": limit,
+            "totalRows": len(rows),
+            "rows": rows[offset : offset + limit],
+        }
+        if offset + limit < len(rows):
+            page["nextUri"] = page_uri(result_id, offset + limit, limit)
+        return page
+
+    def offload(self, result: Dict[str, Any], key: str = "data") -> Dict[str, Any]:
+        """result[key] 的行数超过 inline_rows 时存入本地，只保留第一页，并在 result["resource"] 中返回分页信息"""
+        rows = result.get(key)
+        if not isinstance(rows, list) or len(rows) <= self.inline_rows:
+            return result
+        result_id = self.put(rows)
+        if result_id is None:
+            return result
+        result[key] = rows[: self.inline_rows]
+        result["resource"] = {
+            "uri": f"{RESULT_URI_PREFIX}{result_id}",
+            "totalRows": len(rows),
+            "inlineRows": self.inline_rows,
+            "nextUri": page_uri(result_id, self.inline_rows, self.page_size),
+            "pageUriTemplate": f"{RESULT_URI_PREFIX}{result_id}/{{offset}}/{{limit}}",
+            "expiresInSeconds": int(self.ttl),
+        }
+        return result
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+    @property
+    def total_rows(self) -> int:
+        return self._rows
+
+    def install(self, server: FastMCP) -> None:
+        """注册 result://{result_id} 和 result://{result_id}/{offset}/{limit} 资源模板"""
+
+        @server.resource(
+            RESULT_URI_PREFIX + "{result_id}",
+            name="query_result",
+            description="工具返回的大结果集的第一页及总行数",
+            mime_type="application/json",
+        )
+        def query_result(result_id: str) -> str:
+            return json.dumps(self.page(result_id), ensure_ascii=False)
+
+        @server.resource(
+            RESULT_URI_PREFIX + "{result_id}/{offset}/{limit}",
+            name="query_result_page",
+            description="工具返回的大结果集的分页，offset 从 0 开始，limit 最大 1000",
+            mime_type="application/json",
+        )
+        def query_result_page(result_id: str, offset: int, limit: int) -> str:
+            return json.dumps(self.page(result_id, offset, limit), ensure_ascii=False)
+
+
+def page_uri(result_id: str, offset: int, limit: int) -> str:
+    return f"{RESULT_URI_PREFIX}{result_id}/{offset}/{limit}"
+
+
+_stores: "weakref.WeakKeyDictionary[FastMCP, ResultStore]" = weakref.WeakKeyDictionary()
+_stores_lock = threading.Lock()
+
+
+def get_result_store(server: FastMCP) -> ResultStore:
+    """返回 server 的结果存储，首次调用时创建并注册资源模板，多个 toolkit 共享同一个存储"""
+    with _stores_lock:
+        store = _stores.get(server)
+        if store is None:
+            store = ResultStore()
+            store.install(server)
+            _stores[server] = store
+        return store
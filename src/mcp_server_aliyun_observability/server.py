@@ -1,54 +1,178 @@
+import importlib
+import json
+import os
 from contextlib import asynccontextmanager
-from typing import AsyncIterator, Optional
+from pathlib import Path
+from typing import AsyncIterator, Iterable, Optional
 
-from alibabacloud_credentials.client import Client as CredClient
 from mcp.server import FastMCP
 from mcp.server.fastmcp import FastMCP
 
-from mcp_server_aliyun_observability.toolkit.arms_toolkit import ArmsToolkit
-from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
-from mcp_server_aliyun_observability.toolkit.cms_toolkit import CMSToolkit
-from mcp_server_aliyun_observability.toolkit.util_toolkit import UtilToolkit
+from mcp_server_aliyun_observability.credentials import default_access_key_id
+from mcp_server_aliyun_observability.disk_cache import DiskCache
+from mcp_server_aliyun_observability.encoding import ResultEncoder
+from mcp_server_aliyun_observability.logger import log_warning, set_log_level_to_debug
+from mcp_server_aliyun_observability.tool_catalog import ToolCatalog
 from mcp_server_aliyun_observability.utils import (
     ArmsClientWrapper,
     CredentialWrapper,
     SLSClientWrapper,
 )
 
+# toolkit 名称到 "模块:类" 的映射，只有被启用的 toolkit 才会导入对应模块
+TOOLKITS: dict[str, str] = {
+    "sls": "mcp_server_aliyun_observability.toolkit.sls_toolkit:SLSToolkit",
+    "util": "mcp_server_aliyun_observability.toolkit.util_toolkit:UtilToolkit",
+    "arms": "mcp_server_aliyun_observability.toolkit.arms_toolkit:ArmsToolkit",
+    "cms": "mcp_server_aliyun_observability.toolkit.cms_toolkit:CMSToolkit",
+    "job": "mcp_server_aliyun_observability.toolkit.job_toolkit:JobToolkit",
+}
 
-def create_lifespan(credential: Optional[CredentialWrapper] = None):
+
+def parse_toolkits(entries: Iterable[str]) -> dict[str, Optional[set[str]]]:
+    """解析 toolkit 选择
+
+    每一项为 toolkit 名称（如 sls，启用该 toolkit 的全部工具）或 toolkit.工具名
+    （如 sls.sls_execute_sql_query，只启用该工具），返回 toolkit 名称到工具集合的映射，
+    None 表示启用全部工具。
+    """
+    selection: dict[str, Optional[set[str]]] = {}
+    for entry in entries:
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, tool = entry.partition(".")
+        if name not in TOOLKITS:
+            raise ValueError(
+                f"unknown toolkit {name}, available toolkits: {', '.join(TOOLKITS)}"
+            )
+        if not tool:
+            selection[name] = None
+        elif name not in selection:
+            selection[name] = {tool}
+        elif selection[name] is not None:
+            selection[name].add(tool)
+    return selection
+
+
+def load_toolkits_config(file_path: str) -> list[str]:
+    """从 JSON 配置文件读取 toolkit 选择，格式如 {"toolkits": ["sls", "arms.arms_search_apps"]}"""
+    path = Path(os.path.expandvars(file_path)).expanduser().resolve()
+    with open(path, "r", encoding="utf-8") as file:
+        config = json.load(file)
+    toolkits = config.get("toolkits") if isinstance(config, dict) else None
+    if not isinstance(toolkits, list):
+        raise ValueError(f"toolkits config {path} must contain a 'toolkits' list")
+    return toolkits
+
+
+def register_toolkits(
+    mcp_server: FastMCP, selection: dict[str, Optional[set[str]]]
+) -> None:
+    """按选择导入并注册 toolkit，未选中的工具在注册后移除"""
+    for name, tools in selection.items():
+        module_name, class_name = TOOLKITS[name].split(":")
+        existing = {tool.name for tool in mcp_server._tool_manager.list_tools()}
+        toolkit_class = getattr(importlib.import_module(module_name), class_name)
+        toolkit_class(mcp_server)
+        if tools is None:
+            continue
+        registered = {
+            tool.name for tool in mcp_server._tool_manager.list_tools()
+        } - existing
+        unknown = tools - registered
+        if unknown:
+            raise ValueError(
+                f"tools {', '.join(sorted(unknown))} not found in toolkit {name}, "
+                f"available tools: {', '.join(sorted(registered))}"
+            )
+        for tool in registered - tools:
+            mcp_server.remove_tool(tool)
+
+
+def create_lifespan(
+    credential: Optional[CredentialWrapper] = None,
+    sls_endpoint: Optional[str] = None,
+    arms_endpoint: Optional[str] = None,
+    result_cache: Optional[DiskCache] = None,
+    export_dir: Optional[str] = None,
+    sls_compression: Optional[str] = None,
+):
     @asynccontextmanager
     async def lifespan(fastmcp: FastMCP) -> AsyncIterator[dict]:
-        sls_client = SLSClientWrapper(credential)
-        arms_client = ArmsClientWrapper(credential)
-        cms_client = SLSClientWrapper(credential)
+        sls_client = SLSClientWrapper(credential, endpoint=sls_endpoint, compression=sls_compression)
+        arms_client = ArmsClientWrapper(credential, endpoint=arms_endpoint)
+        cms_client = SLSClientWrapper(credential, endpoint=sls_endpoint, compression=sls_compression)
         yield {
             "sls_client": sls_client,
             "arms_client": arms_client,
             "cms_client": cms_client,
+            "result_cache": result_cache,
+            "export_dir": export_dir,
         }
 
     return lifespan
 
 
+def create_result_cache(
+    credential: Optional[CredentialWrapper], cache_dir: str, cache_max_mb: int = 256
+) -> Optional[DiskCache]:
+    """创建持久化结果缓存
+
+    不同凭证的查询权限可能不同，缓存按 AccessKey ID 隔离。未显式指定凭证时解析默认凭证链当前使用的 AccessKey ID
+    （STS 临时凭证轮换后仍沿用启动时解析的 ID，同一进程内凭证对应的身份不变）；无法解析时不启用缓存，
+    避免不同身份共享缓存结果。
+    """
+    scope = credential.access_key_id if credential else default_access_key_id()
+    if not scope:
+        log_warning(f"无法确定当前凭证的 AccessKey ID，不启用持久化缓存 {cache_dir}")
+        return None
+    return DiskCache(
+        os.path.join(cache_dir, "results.sqlite3"),
+        max_bytes=cache_max_mb * 1024 * 1024,
+        scope=scope,
+    )
+
+
 def init_server(
     credential: Optional[CredentialWrapper] = None,
     log_level: str = "INFO",
     transport_port: int = 8000,
     host: str = "0.0.0.0",
+    sls_endpoint: Optional[str] = None,
+    arms_endpoint: Optional[str] = None,
+    toolkits: Optional[Iterable[str]] = None,
+    compact_tool_descriptions: bool = False,
+    cache_dir: Optional[str] = None,
+    cache_max_mb: int = 256,
+    export_dir: Optional[str] = None,
+    sls_compression: Optional[str] = None,
+    result_encoder: str = "fastmcp",
 ):
-    """initialize the global mcp server instance"""
+    """initialize the global mcp server instance
+
+    toolkits 为空时启用全部 toolkit，格式见 parse_toolkits；
+    compact_tool_descriptions 为 True 时 tools/list 返回精简的工具描述；
+    指定 cache_dir 时 GetLogs、GetIndex 和 CallAiTools 的结果持久化缓存到该目录，同一主机的多个进程共享；
+    export_dir 为 sls_export_query_results 写入导出文件的目录，未指定时该工具不可用；
+    sls_compression 为查询日志时请求的响应压缩方式（lz4/zstd/gzip），指定时改用 GetLogsV2 接口；
+    result_encoder 为工具结果的编码方式，见 encoding.ResultEncoder，fastmcp 表示使用 FastMCP 的默认转换
+    """
+    selection = parse_toolkits(toolkits if toolkits is not None else TOOLKITS)
+    result_cache = create_result_cache(credential, cache_dir, cache_max_mb) if cache_dir else None
     mcp_server = FastMCP(
         name="mcp_aliyun_observability_server",
-        lifespan=create_lifespan(credential),
+        lifespan=create_lifespan(
+            credential, sls_endpoint, arms_endpoint, result_cache, export_dir, sls_compression
+        ),
         log_level=log_level,
         port=transport_port,
         host=host,
     )
-    SLSToolkit(mcp_server)
-    UtilToolkit(mcp_server)
-    ArmsToolkit(mcp_server)
-    CMSToolkit(mcp_server)
+    register_toolkits(mcp_server, selection)
+    ToolCatalog(mcp_server, compact=compact_tool_descriptions).install()
+    if result_encoder != "fastmcp":
+        ResultEncoder(result_encoder).install(mcp_server)
     return mcp_server
 
 
@@ -58,6 +182,38 @@ def server(
     log_level: str = "INFO",
     transport_port: int = 8000,
     host: str = "0.0.0.0",
+    sls_endpoint: Optional[str] = None,
+    arms_endpoint: Optional[str] = None,
+    toolkits: Optional[Iterable[str]] = None,
+    compact_tool_descriptions: bool = False,
+    cache_dir: Optional[str] = None,
+    cache_max_mb: int = 256,
+    workers: int = 1,
+    export_dir: Optional[str] = None,
+    sls_compression: Optional[str] = None,
+    result_encoder: str = "fastmcp",
 ):
-    server: FastMCP = init_server(credential, log_level, transport_port, host)
-    server.run(transport)
+    """启动 MCP Server，workers 大于 1 时 sse/streamable-http 传输以多进程模式运行，见 workers.run_workers"""
+    if log_level.upper() == "DEBUG":
+        set_log_level_to_debug()
+    server: FastMCP = init_server(
+        credential,
+        log_level,
+        transport_port,
+        host,
+        sls_endpoint,
+        arms_endpoint,
+        toolkits,
+        compact_tool_descriptions,
+        cache_dir,
+        cache_max_mb,
+        export_dir,
+        sls_compression,
+        result_encoder,
+    )
+    if workers > 1:
+        from mcp_server_aliyun_observability.workers import run_workers
+
+        run_workers(server, transport, workers)
+    else:
+        server.run(transport)
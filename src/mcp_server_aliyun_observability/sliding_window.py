@@ -0,0 +1,203 @@
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from mcp_server_aliyun_observability.cache import TTLCache
+from mcp_server_aliyun_observability.logger import log_debug
+
+_BUCKET_EXPRESSIONS = [
+    # __time__ - __time__ % 60
+    (re.compile(r"__time__\s*-\s*__time__\s*%\s*(\d+)", re.IGNORECASE), None),
+    # __time__ - __time__ % 60 的另一种写法: __time__ / 60 * 60
+    (re.compile(r"__time__\s*/\s*(\d+)\s*\*\s*\1", re.IGNORECASE), None),
+    # to_unixtime(date_trunc('minute', __time__))
+    (
+        re.compile(
+            r"to_unixtime\s*\(\s*date_trunc\s*\(\s*'(second|minute|hour|day)'\s*,\s*__time__\s*\)\s*\)",
+            re.IGNORECASE,
+        ),
+        {"second": 1, "minute": 60, "hour": 3600, "day": 86400},
+    ),
+]
+_ALIAS_PATTERN = r"\s*\)?\s+as\s+\"?([A-Za-z_][A-Za-z0-9_]*)\"?"
+
+
+class IncrementalQueryError(Exception):
+    """查询结果不满足按时间桶增量合并的前提"""
+
+
+def detect_time_bucket(query: str) -> Optional[tuple[int, Optional[str]]]:
+    """从查询语句中识别时间桶表达式，返回 (桶大小秒数, 结果列名)"""
+    for pattern, units in _BUCKET_EXPRESSIONS:
+        match = pattern.search(query)
+        if not match:
+            continue
+        bucket_seconds = units[match.group(1).lower()] if units else int(match.group(1))
+        if bucket_seconds <= 0:
+            return None
+        alias = re.match(_ALIAS_PATTERN, query[match.end() :], re.IGNORECASE)
+        return bucket_seconds, alias.group(1) if alias else None
+    return None
+
+
+def _bucket_value_to_seconds(value: Any) -> int:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise IncrementalQueryError(f"时间桶的值不是时间戳: {value!r}") from None
+    if number >= 1e11:
+        number /= 1000
+    if number != int(number):
+        raise IncrementalQueryError(f"时间桶的值不是整数秒: {value!r}")
+    return int(number)
+
+
+class BucketedQueryCache:
+    """按时间桶聚合查询的滑动窗口增量缓存
+
+    适用于 "每分钟错误数" 这类按时间桶 group by 的查询：
+    1. 查询起点向下对齐到桶边界，结束时间所在的桶为未结束的尾部桶
+    2. 已结束且超过 settle_seconds 的桶视为已关闭，按桶缓存其结果行
+    3. 再次查询时复用已缓存的桶，只查询缺失部分和尾部窗口，合并后按桶排序返回
+    4. 每一行的桶值都会校验是否对齐到桶边界并落在查询区间内，不满足时抛出 IncrementalQueryError
+    5. 每段查询都指定 limit（段内桶数 * rows_per_bucket），返回行数达到 limit 时结果可能被截断，抛出 IncrementalQueryError，
+       不写入缓存
+
+    查询语句本身不能带 limit，也不能按时间桶以外的列排序，见 query_planner.incremental_order。
+    同一查询的并发调用按 key 串行执行，避免缓存状态的读-改-写交错。
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        settle_seconds: int = 60,
+        rows_per_bucket: int = 100,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.settle_seconds = settle_seconds
+        self.rows_per_bucket = rows_per_bucket
+        self._states = TTLCache(max_entries=max_entries, ttl=3600)
+        self._key_locks = TTLCache(max_entries=max_entries)
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    def _key_lock(self, state_key: tuple) -> threading.Lock:
+        with self._lock:
+            lock = self._key_locks.get(state_key)
+            if lock is None:
+                lock = threading.Lock()
+                self._key_locks.set(state_key, lock)
+            return lock
+
+    def query(
+        self,
+        execute: Callable[[int, int, int], List[Dict[str, Any]]],
+        key: tuple,
+        from_ts: int,
+        to_ts: int,
+        bucket_seconds: int,
+        bucket_field: str,
+        descending: bool = False,
+    ) -> dict:
+        """execute(开始时间, 结束时间, 最大行数) 执行一段查询，最大行数需要以 limit 追加到查询语句中"""
+        if to_ts <= from_ts - from_ts % bucket_seconds:
+            raise IncrementalQueryError("查询结束时间必须大于开始时间")
+        state_key = key + (bucket_seconds, bucket_field)
+        with self._key_lock(state_key):
+            return self._query(
+                execute, key, state_key, from_ts, to_ts, bucket_seconds, bucket_field, descending
+            )
+
+    def _query(
+        self,
+        execute: Callable[[int, int, int], List[Dict[str, Any]]],
+        key: tuple,
+        state_key: tuple,
+        from_ts: int,
+        to_ts: int,
+        bucket_seconds: int,
+        bucket_field: str,
+        descending: bool,
+    ) -> dict:
+        start = from_ts - from_ts % bucket_seconds
+        closed_end = to_ts - to_ts % bucket_seconds
+        settled = int(self._clock()) - self.settle_seconds
+        cacheable_end = max(start, min(closed_end, settled - settled % bucket_seconds))
+
+        state = self._states.get(state_key)
+        if state is not None and (
+            state["covered"][1] < start or state["covered"][0] > cacheable_end
+        ):
+            # 缓存区间与本次查询不连续，无法拼接成连续的覆盖区间
+            state = None
+        if state is None:
+            state = {"covered": (start, start), "buckets": {}}
+        covered_from, covered_to = state["covered"]
+
+        # 缓存覆盖区间之后的部分（含未关闭的尾部桶）总是重新查询
+        main_start = max(start, min(covered_to, cacheable_end))
+        segments: list[tuple[int, int]] = []
+        if start < covered_from:
+            segments.append((start, covered_from))
+        segments.append((main_start, to_ts))
+
+        buckets: dict[int, list] = {
+            bucket: rows
+            for bucket, rows in state["buckets"].items()
+            if start <= bucket < main_start
+        }
+        queried = 0
+        for segment_start, segment_end in segments:
+            if segment_end <= segment_start:
+                continue
+            queried += 1
+            limit = math.ceil((segment_end - segment_start) / bucket_seconds) * self.rows_per_bucket
+            rows = execute(segment_start, segment_end, limit)
+            if len(rows) >= limit:
+                raise IncrementalQueryError(
+                    f"分段查询 [{segment_start}, {segment_end}) 返回的行数达到 limit {limit}，结果可能不完整"
+                )
+            for row in rows:
+                bucket = _bucket_value_to_seconds(row.get(bucket_field))
+                if bucket % bucket_seconds != 0:
+                    raise IncrementalQueryError(
+                        f"时间桶 {bucket} 未对齐到 {bucket_seconds} 秒边界"
+                    )
+                if not segment_start <= bucket < segment_end:
+                    raise IncrementalQueryError(
+                        f"时间桶 {bucket} 超出查询区间 [{segment_start}, {segment_end})"
+                    )
+                buckets.setdefault(bucket, []).append(row)
+
+        # 本次查询后 [start, cacheable_end) 内的桶都已完整，作为新的覆盖区间
+        self._states.set(
+            state_key,
+            {
+                "covered": (start, cacheable_end),
+                "buckets": {
+                    bucket: rows
+                    for bucket, rows in buckets.items()
+                    if bucket < cacheable_end
+                },
+            },
+        )
+
+        cached_buckets = max(0, main_start - max(covered_from, start)) // bucket_seconds
+        log_debug(
+            f"incremental query {key}: {cached_buckets} buckets from cache, "
+            f"{queried} segments queried"
+        )
+        return {
+            "data": [
+                row for bucket in sorted(buckets, reverse=descending) for row in buckets[bucket]
+            ],
+            "incremental": {
+                "bucket_seconds": bucket_seconds,
+                "bucket_field": bucket_field,
+                "aligned_from": start,
+                "cached_buckets": cached_buckets,
+                "queried_segments": queried,
+            },
+        }
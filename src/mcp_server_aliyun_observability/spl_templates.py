@@ -0,0 +1,127 @@
+import re
+from typing import Any, Callable, Dict
+
+_PLACEHOLDER_PATTERN = re.compile(r"<([A-Z][A-Z0-9_]*)>")
+_DURATION_PATTERN = re.compile(r"^\d+[smhd]$")
+
+
+def escape_spl_string(value: str) -> str:
+    """转义单引号字符串字面量中的内容，单引号按 SQL 规则双写"""
+    return value.replace("'", "''")
+
+
+def _render_string(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError(f"expected str, got {type(value).__name__}")
+    return escape_spl_string(value)
+
+
+def _render_duration(value: Any) -> str:
+    if isinstance(value, bool):
+        raise TypeError("expected duration, got bool")
+    if isinstance(value, int):
+        if value <= 0:
+            raise ValueError(f"duration must be positive, got {value}")
+        return f"{value}s"
+    if isinstance(value, str) and _DURATION_PATTERN.match(value):
+        return value
+    raise ValueError(f"invalid duration: {value!r}, expected seconds or like '1m'")
+
+
+def _render_int(value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise TypeError(f"expected int, got {type(value).__name__}")
+    return str(value)
+
+
+PARAM_RENDERERS: Dict[str, Callable[[Any], str]] = {
+    "string": _render_string,
+    "duration": _render_duration,
+    "int": _render_int,
+}
+
+
+class SPLTemplate:
+    """预编译的 SPL 模板
+
+    模板中以 <NAME> 表示参数占位符，构造时一次性拆分为字面量片段和参数片段，
+    渲染时按声明的参数类型校验并转义后拼接，避免每次调用重复解析模板。
+    """
+
+    def __init__(self, name: str, text: str, params: Dict[str, str]):
+        self.name = name
+        self.params = params
+        self._segments: list[tuple[bool, str]] = []
+        cursor = 0
+        placeholders = set()
+        for match in _PLACEHOLDER_PATTERN.finditer(text):
+            self._segments.append((False, text[cursor : match.start()]))
+            param = match.group(1).lower()
+            self._segments.append((True, param))
+            placeholders.add(param)
+            cursor = match.end()
+        self._segments.append((False, text[cursor:]))
+
+        if placeholders != set(params):
+            raise ValueError(
+                f"template {name} placeholders {sorted(placeholders)} "
+                f"do not match declared params {sorted(params)}"
+            )
+        for param, param_type in params.items():
+            if param_type not in PARAM_RENDERERS:
+                raise ValueError(f"unknown param type {param_type} for {param}")
+
+    def render(self, **kwargs: Any) -> str:
+        missing = set(self.params) - set(kwargs)
+        if missing:
+            raise ValueError(f"template {self.name} missing params: {sorted(missing)}")
+        unknown = set(kwargs) - set(self.params)
+        if unknown:
+            raise ValueError(f"template {self.name} got unknown params: {sorted(unknown)}")
+        rendered = {
+            param: PARAM_RENDERERS[self.params[param]](value)
+            for param, value in kwargs.items()
+        }
+        return "".join(
+            rendered[value] if is_param else value for is_param, value in self._segments
+        )
+
+
+SPL_TEMPLATES: Dict[str, SPLTemplate] = {}
+
+
+def register_spl_template(name: str, text: str, params: Dict[str, str]) -> SPLTemplate:
+    template = SPLTemplate(name, text, params)
+    SPL_TEMPLATES[name] = template
+    return template
+
+
+def get_spl_template(name: str) -> SPLTemplate:
+    try:
+        return SPL_TEMPLATES[name]
+    except KeyError:
+        raise KeyError(f"SPL template {name} not found") from None
+
+
+register_spl_template(
+    "raw-promql-template",
+    r"""
+.set "sql.session.velox_support_row_constructor_enabled" = 'true';
+.set "sql.session.presto_velox_mix_run_not_check_linked_agg_enabled" = 'true';
+.set "sql.session.presto_velox_mix_run_support_complex_type_enabled" = 'true';
+.set "sql.session.velox_sanity_limit_enabled" = 'false';
+.metricstore with(promql_query='<PROMQL>',range='1m')| extend latest_ts = element_at(__ts__,cardinality(__ts__)), latest_val = element_at(__value__,cardinality(__value__))
+|  stats arr_ts = array_agg(__ts__), arr_val = array_agg(__value__), title_agg = array_agg(json_format(cast(__labels__ as json))), anomalies_score_series = array_agg(array[0.0]), anomalies_type_series = array_agg(array['']), cnt = count(*), latest_ts = array_agg(latest_ts), latest_val = array_agg(latest_val)
+| extend cluster_res = cluster(arr_val,'kmeans') | extend params = concat('{"n_col": ', cast(cnt as varchar), ',"subplot":true}')
+| extend image = series_anomalies_plot(arr_ts, arr_val, anomalies_score_series, anomalies_type_series, title_agg, params)| project title_agg,cnt,latest_ts,latest_val,image
+""",
+    {"promql": "string"},
+)
+
+register_spl_template(
+    "raw-promql-range-template",
+    r"""
+.metricstore with(promql_query='<PROMQL>',range='<STEP>')
+""",
+    {"promql": "string", "step": "duration"},
+)
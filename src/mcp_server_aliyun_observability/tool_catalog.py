@@ -0,0 +1,116 @@
+import inspect
+from typing import Any, Optional
+
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+from pydantic import PrivateAttr
+
+from mcp_server_aliyun_observability.logger import log_warning
+
+_DUMP_OPTIONS = {"by_alias": True, "mode": "json", "exclude_none": True}
+_SECTION_PREFIXES = ("## ", "Args:", "Returns:")
+
+
+def compact_description(description: Optional[str]) -> Optional[str]:
+    """精简工具描述，只保留第一段摘要和 "## 功能概述" 小节
+
+    参数说明已包含在 inputSchema 中，使用场景、查询示例等小节在精简模式下省略。
+    """
+    if not description:
+        return description
+    summary: list[str] = []
+    overview: list[str] = []
+    section: Optional[str] = None
+    for line in inspect.cleandoc(description).splitlines():
+        stripped = line.strip()
+        if stripped.startswith(_SECTION_PREFIXES):
+            section = stripped.lstrip("# ").strip()
+            continue
+        if not stripped:
+            continue
+        if section is None:
+            summary.append(stripped)
+        elif section == "功能概述":
+            overview.append(stripped)
+    return "\n\n".join(part for part in ("\n".join(summary), "\n".join(overview)) if part)
+
+
+class _SerializedServerResult(types.ServerResult):
+    """model_dump 直接返回预先序列化的结果，避免每次响应重新遍历全部工具的 schema"""
+
+    _serialized: dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    def model_dump(self, *args: Any, **kwargs: Any) -> dict[str, Any]:
+        if not args and kwargs == _DUMP_OPTIONS:
+            return dict(self._serialized)
+        return super().model_dump(*args, **kwargs)
+
+
+class ToolCatalog:
+    """预计算并缓存 tools/list 的响应
+
+    FastMCP 对每个会话的每次 tools/list 请求都会重新构造工具列表并序列化，会话频繁创建的 HTTP 传输下
+    这部分开销会反复出现。这里在首次请求时构造并序列化一次，之后直接复用，工具注册发生变化
+    （增加、移除工具）时根据指纹自动重建。
+
+    - 工具描述去除 docstring 的缩进
+    - compact 为 True 时使用精简描述，见 compact_description
+    """
+
+    def __init__(self, server: FastMCP, compact: bool = False):
+        self.server = server
+        self.compact = compact
+        self.builds = 0
+        self._fingerprint: Optional[tuple] = None
+        self._result: Optional[_SerializedServerResult] = None
+
+    def fingerprint(self) -> tuple:
+        return tuple(
+            (tool.name, id(tool)) for tool in self.server._tool_manager.list_tools()
+        )
+
+    async def result(self) -> types.ServerResult:
+        fingerprint = self.fingerprint()
+        if self._result is None or fingerprint != self._fingerprint:
+            self._result = await self._build()
+            self._fingerprint = fingerprint
+        return self._result
+
+    async def _build(self) -> _SerializedServerResult:
+        tools = []
+        for tool in await self.server.list_tools():
+            description = (
+                compact_description(tool.description)
+                if self.compact
+                else inspect.cleandoc(tool.description or "") or tool.description
+            )
+            tools.append(tool.model_copy(update={"description": description}))
+
+        # 同步刷新底层 server 的工具缓存，call_tool 校验输出时使用
+        lowlevel = self.server._mcp_server
+        lowlevel._tool_cache.clear()
+        lowlevel._tool_cache.update({tool.name: tool for tool in tools})
+
+        result = _SerializedServerResult(types.ListToolsResult(tools=tools))
+        result._serialized = types.ServerResult(result.root).model_dump(**_DUMP_OPTIONS)
+        self.builds += 1
+        return result
+
+    def supported(self) -> bool:
+        """底层 server 是否提供替换 tools/list 所依赖的内部属性（mcp 的私有实现，不同版本可能不同）"""
+        lowlevel = self.server._mcp_server
+        return isinstance(getattr(lowlevel, "_tool_cache", None), dict) and isinstance(
+            getattr(lowlevel, "request_handlers", None), dict
+        )
+
+    def install(self) -> "ToolCatalog":
+        """替换底层 server 的 tools/list 处理函数，当前 mcp 版本不支持时保留默认的 tools/list"""
+        if not self.supported():
+            log_warning("当前 mcp 版本不支持缓存 tools/list 响应，使用默认的工具列表（不精简工具描述）")
+            return self
+
+        async def handler(request: types.ListToolsRequest) -> types.ServerResult:
+            return await self.result()
+
+        self.server._mcp_server.request_handlers[types.ListToolsRequest] = handler
+        return self
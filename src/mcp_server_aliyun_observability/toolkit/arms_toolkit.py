@@ -1,31 +1,74 @@
-from typing import Any
-
-from alibabacloud_arms20190808.client import Client as ArmsClient
-from alibabacloud_sls20201230.client import Client
-from alibabacloud_arms20190808.models import (
-    SearchTraceAppByPageRequest,
-    SearchTraceAppByPageResponse,
-    SearchTraceAppByPageResponseBodyPageBean, GetTraceAppRequest, GetTraceAppResponse,
-    GetTraceAppResponseBodyTraceApp,
-)
-from alibabacloud_tea_util import models as util_models
-from alibabacloud_sls20201230.models import CallAiToolsRequest, CallAiToolsResponse
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, List
+
 from mcp.server.fastmcp import Context, FastMCP
 from pydantic import Field
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
+from mcp_server_aliyun_observability.ai_tools import call_ai_tools_streaming
+from mcp_server_aliyun_observability.arms_apps import (ArmsAppIndex,
+                                                       ArmsAppMetadataCache)
+from mcp_server_aliyun_observability.disk_cache import (GET_LOGS_TTL, cached,
+                                                        get_logs_cacheable,
+                                                        get_result_cache)
 from mcp_server_aliyun_observability.logger import log_error
-from mcp_server_aliyun_observability.utils import (
-    get_arms_user_trace_log_store,
-    text_to_sql,
-)
+from mcp_server_aliyun_observability.trace_analysis import (
+    analyze_trace, analyze_traces, build_batch_trace_query, build_trace_query)
+from mcp_server_aliyun_observability.utils import text_to_sql
+
+if TYPE_CHECKING:
+    from alibabacloud_arms20190808.client import Client as ArmsClient
+    from alibabacloud_arms20190808.models import (
+        SearchTraceAppByPageResponse,
+        SearchTraceAppByPageResponseBodyPageBean,
+    )
+    from alibabacloud_sls20201230.client import Client
 
 
 class ArmsToolkit:
     def __init__(self, server: FastMCP):
         self.server = server
+        self.app_metadata = ArmsAppMetadataCache()
+        self.app_index = ArmsAppIndex()
         self._register_tools()
 
+    def _query_trace_spans(
+        self, ctx: Context, pid: str, region_id: str, query: str, start_ms: int, end_ms: int
+    ) -> List[Dict[str, Any]]:
+        """在应用的调用链日志库中执行 span 查询"""
+        from alibabacloud_sls20201230.models import GetLogsRequest
+        from alibabacloud_tea_util import models as util_models
+
+        trace_app = self.app_metadata.get(
+            ctx.request_context.lifespan_context["arms_client"], pid, region_id
+        )
+        if not trace_app or "project" not in trace_app:
+            raise ValueError(f"没有找到应用信息: {pid}")
+
+        sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
+        sls_client: Client = sls_client_wrapper.with_region(region_id)
+        from_ts, to_ts = start_ms // 1000, end_ms // 1000 + 1
+
+        def get_logs() -> List[Dict[str, Any]]:
+            request: GetLogsRequest = GetLogsRequest(query=query, from_=from_ts, to=to_ts)
+            runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000, connect_timeout=60000)
+            try:
+                logs = sls_client_wrapper.get_logs(
+                    sls_client, trace_app["project"], trace_app["log_store"], request, runtime
+                )
+            except Exception as e:
+                log_error(f"查询调用链数据失败: {str(e)}")
+                raise
+            return logs or []
+
+        return cached(
+            get_result_cache(ctx) if get_logs_cacheable(to_ts) else None,
+            "GetLogs",
+            (region_id, trace_app["project"], trace_app["log_store"], query, from_ts, to_ts),
+            get_logs,
+            GET_LOGS_TTL,
+        )
+
     def _register_tools(self):
         """register arms related tools functions"""
 
@@ -41,7 +84,7 @@ class ArmsToolkit:
                 20, description="page size,max is 100", ge=1, le=100
             ),
             pageNumber: int = Field(1, description="page number,default is 1", ge=1),
-        ) -> list[dict[str, Any]]:
+        ) -> dict[str, Any]:
             """搜索ARMS应用。
 
             ## 功能概述
@@ -58,6 +101,7 @@ class ArmsToolkit:
 
             - app_name_query必须是应用名称的一部分，而非自然语言
             - 搜索结果将分页返回，可以指定页码和每页大小
+            - 区域的应用列表同步到本地索引后，支持前缀、子串和模糊匹配，结果按完全匹配、前缀、子串、模糊匹配的顺序排序
 
             ## 返回数据结构
 
@@ -82,9 +126,16 @@ class ArmsToolkit:
             Returns:
                 包含应用信息的字典
             """
-            arms_client: ArmsClient = ctx.request_context.lifespan_context[
-                "arms_client"
-            ].with_region(regionId)
+            from alibabacloud_arms20190808.models import SearchTraceAppByPageRequest
+
+            arms_client_wrapper = ctx.request_context.lifespan_context["arms_client"]
+            self.app_index.ensure_synced(arms_client_wrapper, regionId)
+            if self.app_index.is_ready(regionId):
+                return self.app_index.search(
+                    regionId, appNameQuery, page_size=pageSize, page_number=pageNumber
+                )
+
+            arms_client: ArmsClient = arms_client_wrapper.with_region(regionId)
             request: SearchTraceAppByPageRequest = SearchTraceAppByPageRequest(
                 trace_app_name=appNameQuery,
                 region_id=regionId,
@@ -180,7 +231,7 @@ class ArmsToolkit:
                 包含查询信息的字典，包括sls_query、project和log_store
             """
 
-            data: dict[str, str] = get_arms_user_trace_log_store(user_id, region_id)
+            data: dict[str, str] = self.app_metadata.trace_log_store(user_id, region_id)
             instructions = [
                 "1. pid为" + pid,
                 "2. 响应时间字段为 duration,单位为纳秒，转换成毫秒",
@@ -207,7 +258,7 @@ class ArmsToolkit:
             }
           
         @self.server.tool()
-        def arms_profile_flame_analysis(
+        async def arms_profile_flame_analysis(
                 ctx: Context,
                 pid: str = Field(..., description="arms application id"),
                 startMs: str = Field(..., description="profile start ms"),
@@ -245,24 +296,29 @@ class ArmsToolkit:
                 threadGroup: 服务聚合线程组名称，非必要参数，用于选择对应线程组，如有多个填写时以英文逗号","分隔，如'http-nio-*-exec-*,http-nio-*-ClientPoller-*'，不填写默认查询服务所有聚合线程组
                 regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
                 valid_types = ['cpu', 'memory']
                 profileType = profileType.lower()
                 if profileType not in valid_types:
                     raise ValueError(f"无效的profileType: {profileType}, 仅支持: {', '.join(valid_types)}")
 
-                # Connect to ARMS client
-                arms_client: ArmsClient = ctx.request_context.lifespan_context["arms_client"].with_region(regionId)
-                request: GetTraceAppRequest = GetTraceAppRequest(pid=pid, region_id=regionId)
-                response: GetTraceAppResponse = arms_client.get_trace_app(request)
-                trace_app: GetTraceAppResponseBodyTraceApp = response.body.trace_app
+                # 应用信息来自元数据缓存，同一应用重复分析时不再调用 GetTraceApp
+                trace_app = await asyncio.to_thread(
+                    self.app_metadata.get,
+                    ctx.request_context.lifespan_context["arms_client"],
+                    pid,
+                    regionId,
+                )
 
                 if not trace_app:
                     raise ValueError("无法找到应用信息")
 
                 # Extract application details
-                service_name = trace_app.app_name
-                language = trace_app.language
+                service_name = trace_app["app_name"]
+                language = trace_app["language"]
 
                 # Validate language parameter
                 if language not in ['java', 'go']:
@@ -291,13 +347,9 @@ class ArmsToolkit:
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000,
                                                                                  connect_timeout=60000)
 
-                tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(request=ai_request,
-                                                                                           headers={},
-                                                                                           runtime=runtime)
-                data = tool_response.body
-
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, ai_request, runtime)
+                )["data"]
 
                 return {
                     "data": data
@@ -308,7 +360,7 @@ class ArmsToolkit:
                 raise
 
         @self.server.tool()
-        def arms_diff_profile_flame_analysis(
+        async def arms_diff_profile_flame_analysis(
                 ctx: Context,
                 pid: str = Field(..., description="arms application id"),
                 currentStartMs: str = Field(..., description="current profile start ms"),
@@ -349,25 +401,27 @@ class ArmsToolkit:
                 threadGroup: 服务聚合线程组名称，非必要参数，用于选择对应线程组，如有多个填写时以英文逗号","分隔，如'http-nio-*-exec-*,http-nio-*-ClientPoller-*'，不填写默认查询服务所有聚合线程组
                 regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
                 valid_types = ['cpu', 'memory']
                 profileType = profileType.lower()
                 if profileType not in valid_types:
                     raise ValueError(f"无效的profileType: {profileType}, 仅支持: {', '.join(valid_types)}")
 
-                arms_client: ArmsClient = ctx.request_context.lifespan_context["arms_client"].with_region(regionId)
-                request: GetTraceAppRequest = GetTraceAppRequest(
-                    pid=pid,
-                    region_id=regionId,
+                trace_app = await asyncio.to_thread(
+                    self.app_metadata.get,
+                    ctx.request_context.lifespan_context["arms_client"],
+                    pid,
+                    regionId,
                 )
-                response: GetTraceAppResponse = arms_client.get_trace_app(request)
-                trace_app: GetTraceAppResponseBodyTraceApp = response.body.trace_app
 
                 if not trace_app:
                     raise ValueError("无法找到应用信息")
 
-                service_name = trace_app.app_name
-                language = trace_app.language
+                service_name = trace_app["app_name"]
+                language = trace_app["language"]
 
                 if language not in ['java', 'go']:
                     raise ValueError(f"暂不支持的语言类型: {language}. 当前仅支持 'java' 和 'go'")
@@ -395,11 +449,9 @@ class ArmsToolkit:
                 ai_request.params = params
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000, connect_timeout=60000)
 
-                tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(request=ai_request, headers={}, runtime=runtime)
-                data = tool_response.body
-
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, ai_request, runtime)
+                )["data"]
 
                 return {
                     "data": data
@@ -425,26 +477,109 @@ class ArmsToolkit:
             1. 当用户明确提出要查询某个应用的信息时，可以调用该工具
             2. 有场景需要获取应用的开发语言类型，可以调用该工具
             """
-            arms_client: ArmsClient = ctx.request_context.lifespan_context[
-                "arms_client"
-            ].with_region(regionId)
-            request: GetTraceAppRequest = GetTraceAppRequest(
-                pid=pid,
-                region_id=regionId,
+            trace_app = self.app_metadata.get(
+                ctx.request_context.lifespan_context["arms_client"], pid, regionId
             )
-            response: GetTraceAppResponse = arms_client.get_trace_app(request)
-            if response.body:
-                trace_app: GetTraceAppResponseBodyTraceApp = response.body.trace_app
+            if trace_app:
                 return {
-                    "pid": trace_app.pid,
-                    "app_name": trace_app.app_name,
-                    "language": trace_app.language,
+                    "pid": trace_app["pid"],
+                    "app_name": trace_app["app_name"],
+                    "language": trace_app["language"],
                 }
             else:
                 return "没有找到应用信息"
         
         @self.server.tool()
-        def arms_trace_quality_analysis(ctx: Context,
+        def arms_trace_structure_analysis(ctx: Context,
+                traceId: str = Field(..., description="traceId"),
+                pid: str = Field(..., description="pid,the pid of the app"),
+                startMs: int = Field(..., description="start time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
+                endMs: int = Field(..., description="end time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
+                regionId: str = Field(default=...,
+                                      description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'"),
+                maxSpans: int = Field(10000, description="max spans to fetch", ge=1, le=100000),
+        ) -> dict:
+            """Trace 结构分析
+
+            ## 功能概述
+            直接从应用的调用链日志库（logstore-tracing）拉取指定 traceId 的全部 span，在本地构建调用树，
+            计算关键路径、各服务自身耗时，识别错误 span 和断链（父 span 缺失），毫秒级返回，不调用 AI 分析服务
+
+            ## 使用场景
+
+            - 需要快速了解调用链结构、耗时主要花在哪些服务和接口上时
+            - 判断调用链是否断链时
+            - 需要根因诊断报告时，再使用 arms_slow_trace_analysis 或 arms_error_trace_analysis
+
+            ## 查询示例
+
+            - "这个 trace 的关键路径是什么"
+            - "这个 trace 哪个服务耗时最多"
+
+            Args:
+                ctx: MCP上下文，用于访问ARMS和SLS客户端
+                traceId: 待分析的 Trace 的 traceId，必要参数
+                pid: traceId 所属应用的PID，用于确定调用链数据所在的 project
+                startMs: 查询的开始时间，通过get_current_time工具获取毫秒级时间戳
+                endMs: 查询的结束时间，通过get_current_time工具获取毫秒级时间戳
+                regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
+                maxSpans: 最多拉取的 span 数量
+
+            Returns:
+                包含 spanCount、durationMs、criticalPath、services、errorSpans、brokenLinks 的字典
+            """
+            logs = self._query_trace_spans(
+                ctx, pid, regionId, build_trace_query(traceId, maxSpans), startMs, endMs
+            )
+            result = analyze_trace(logs)
+            result["traceId"] = traceId
+            return result
+
+        @self.server.tool()
+        def arms_batch_trace_analysis(ctx: Context,
+                traceIds: List[str] = Field(..., description="traceId list", min_length=1, max_length=100),
+                pid: str = Field(..., description="pid,the pid of the app"),
+                startMs: int = Field(..., description="start time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
+                endMs: int = Field(..., description="end time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
+                regionId: str = Field(default=...,
+                                      description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'"),
+                maxSpans: int = Field(100000, description="max spans to fetch", ge=1, le=1000000),
+        ) -> dict:
+            """批量分析多个 Trace
+
+            ## 功能概述
+            通过一次查询从应用的调用链日志库（logstore-tracing）拉取多个 traceId 的全部 span，
+            统计各服务的耗时分布（p50/p90/p99/max/mean）和错误数，并找出明显慢于同类 span 的异常 span
+
+            ## 使用场景
+
+            - 慢调用排查涉及多条 trace 时，一次性对比分析
+            - 找出哪些服务、接口在多条 trace 中耗时异常
+
+            ## 查询示例
+
+            - "分析这 20 条慢 trace 的共同点"
+            - "这些 trace 里哪些 span 明显偏慢"
+
+            Args:
+                ctx: MCP上下文，用于访问ARMS和SLS客户端
+                traceIds: 待分析的 traceId 列表，最多 100 个
+                pid: trace 所属应用的PID，用于确定调用链数据所在的 project
+                startMs: 查询的开始时间，通过get_current_time工具获取毫秒级时间戳
+                endMs: 查询的结束时间，通过get_current_time工具获取毫秒级时间戳
+                regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
+                maxSpans: 最多拉取的 span 数量
+
+            Returns:
+                包含 traces、services、outlierSpans 和 missingTraceIds 的字典
+            """
+            logs = self._query_trace_spans(
+                ctx, pid, regionId, build_batch_trace_query(traceIds, maxSpans), startMs, endMs
+            )
+            return analyze_traces(logs, trace_ids=traceIds)
+
+        @self.server.tool()
+        async def arms_trace_quality_analysis(ctx: Context,
                 traceId: str = Field(..., description="traceId"),
                 startMs: int = Field(..., description="start time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
                 endMs: int = Field(..., description="end time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
@@ -471,6 +606,9 @@ class ArmsToolkit:
                 endMs: 分析的结束时间，通过get_current_time工具获取毫秒级时间戳
                 regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
 
                 sls_client: Client = ctx.request_context.lifespan_context["sls_client"].with_region("cn-shanghai")
@@ -489,11 +627,9 @@ class ArmsToolkit:
                 ai_request.params = params
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000, connect_timeout=60000)
 
-                tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(request=ai_request, headers={}, runtime=runtime)
-                data = tool_response.body
-
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, ai_request, runtime)
+                )["data"]
 
                 return {
                     "data": data
@@ -504,7 +640,7 @@ class ArmsToolkit:
                 raise
 
         @self.server.tool()
-        def arms_slow_trace_analysis(ctx: Context,
+        async def arms_slow_trace_analysis(ctx: Context,
                                      traceId: str = Field(..., description="traceId"),
                                      startMs: int = Field(..., description="start time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
                                      endMs: int = Field(..., description="end time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
@@ -532,6 +668,9 @@ class ArmsToolkit:
                 endMs: 分析的结束时间，通过get_current_time工具获取毫秒级时间戳
                 regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
 
                 sls_client: Client = ctx.request_context.lifespan_context["sls_client"].with_region("cn-shanghai")
@@ -551,12 +690,9 @@ class ArmsToolkit:
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000,
                                                                                  connect_timeout=60000)
 
-                tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(request=ai_request,
-                                                                                           headers={}, runtime=runtime)
-                data = tool_response.body
-
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, ai_request, runtime)
+                )["data"]
 
                 return {
                     "data": data
@@ -567,7 +703,7 @@ class ArmsToolkit:
                 raise
 
         @self.server.tool()
-        def arms_error_trace_analysis(ctx: Context,
+        async def arms_error_trace_analysis(ctx: Context,
                                      traceId: str = Field(..., description="traceId"),
                                      startMs: int = Field(..., description="start time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
                                      endMs: int = Field(..., description="end time (ms) for trace query. unit is millisecond, should be unix timestamp, only number, no other characters"),
@@ -595,6 +731,9 @@ class ArmsToolkit:
                 endMs: 分析的结束时间，通过get_current_time工具获取毫秒级时间戳
                 regionId: 阿里云区域ID，如'cn-hangzhou'、'cn-shanghai'等
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
 
                 sls_client: Client = ctx.request_context.lifespan_context["sls_client"].with_region("cn-shanghai")
@@ -614,12 +753,9 @@ class ArmsToolkit:
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions(read_timeout=60000,
                                                                                  connect_timeout=60000)
 
-                tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(request=ai_request,
-                                                                                           headers={}, runtime=runtime)
-                data = tool_response.body
-
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, ai_request, runtime)
+                )["data"]
 
                 return {
                     "data": data
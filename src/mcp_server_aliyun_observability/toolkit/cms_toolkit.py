@@ -1,25 +1,26 @@
-from typing import Any, Callable, Dict, List, Optional, TypeVar, cast
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, TypeVar, cast
 from functools import wraps
 
-from alibabacloud_sls20201230.client import Client as SLSClient
-from alibabacloud_sls20201230.models import (
-    CallAiToolsRequest,
-    CallAiToolsResponse,
-    GetLogsRequest,
-    GetLogsResponse,
-    ListLogStoresRequest,
-    ListLogStoresResponse,
-    ListProjectRequest,
-    ListProjectResponse,
-)
-from alibabacloud_tea_util import models as util_models
 from mcp.server.fastmcp import Context, FastMCP
 from pydantic import Field
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
-from mcp_server_aliyun_observability.logger import log_error
+from mcp_server_aliyun_observability.cache import TTLCache
+from mcp_server_aliyun_observability.logger import (
+    is_debug_enabled,
+    log_debug,
+    log_error,
+)
+from mcp_server_aliyun_observability.result_store import get_result_store
+from mcp_server_aliyun_observability.spl_templates import get_spl_template
 from mcp_server_aliyun_observability.utils import handle_tea_exception
 
+if TYPE_CHECKING:
+    from alibabacloud_sls20201230.client import Client as SLSClient
+
 
 class CMSToolkit:
     """aliyun observability tools manager"""
@@ -32,6 +33,8 @@ class CMSToolkit:
             server: FastMCP server instance
         """
         self.server = server
+        self.promql_frontend = PromQLQueryFrontend()
+        self.result_store = get_result_store(server)
         self._register_tools()
 
     def _register_tools(self):
@@ -111,12 +114,13 @@ class CMSToolkit:
             Returns:
                 查询结果列表，每个元素为一条日志记录
             """
-            spls = CMSSPLContainer()
-            sls_client: SLSClient = ctx.request_context.lifespan_context[
-                "sls_client"
-            ].with_region(regionId)
-            query = spls.get_spl("raw-promql-template").replace("<PROMQL>", query)
-            print(query)
+            from alibabacloud_sls20201230.models import GetLogsRequest
+            from alibabacloud_tea_util import models as util_models
+
+            sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
+            sls_client: SLSClient = sls_client_wrapper.with_region(regionId)
+            query = get_spl_template("raw-promql-template").render(promql=query)
+            log_debug(f"cms_execute_promql_query spl: {query}")
 
             request: GetLogsRequest = GetLogsRequest(
                 query=query,
@@ -126,10 +130,9 @@ class CMSToolkit:
             runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
             runtime.read_timeout = 60000
             runtime.connect_timeout = 60000
-            response: GetLogsResponse = sls_client.get_logs_with_options(
-                project, metricStore, request, headers={}, runtime=runtime
+            response_body: List[Dict[str, Any]] = sls_client_wrapper.get_logs(
+                sls_client, project, metricStore, request, runtime
             )
-            response_body: List[Dict[str, Any]] = response.body
 
             result = {
                 "data": response_body,
@@ -139,25 +142,247 @@ class CMSToolkit:
                     else "Not found data by query,you can try to change the query or time range"
                 ),
             }
-            print(result)
-            return result
-
-
-class CMSSPLContainer:
-    def __init__(self):
-        self.spls = {}
-        self.spls[
-            "raw-promql-template"
-        ] = r"""
-.set "sql.session.velox_support_row_constructor_enabled" = 'true';
-.set "sql.session.presto_velox_mix_run_not_check_linked_agg_enabled" = 'true';
-.set "sql.session.presto_velox_mix_run_support_complex_type_enabled" = 'true';
-.set "sql.session.velox_sanity_limit_enabled" = 'false';
-.metricstore with(promql_query='<PROMQL>',range='1m')| extend latest_ts = element_at(__ts__,cardinality(__ts__)), latest_val = element_at(__value__,cardinality(__value__))
-|  stats arr_ts = array_agg(__ts__), arr_val = array_agg(__value__), title_agg = array_agg(json_format(cast(__labels__ as json))), anomalies_score_series = array_agg(array[0.0]), anomalies_type_series = array_agg(array['']), cnt = count(*), latest_ts = array_agg(latest_ts), latest_val = array_agg(latest_val)
-| extend cluster_res = cluster(arr_val,'kmeans') | extend params = concat('{"n_col": ', cast(cnt as varchar), ',"subplot":true}')
-| extend image = series_anomalies_plot(arr_ts, arr_val, anomalies_score_series, anomalies_type_series, title_agg, params)| project title_agg,cnt,latest_ts,latest_val,image
-"""
-
-    def get_spl(self, key) -> str:
-        return self.spls.get(key, "Key not found")
+            if is_debug_enabled(level=2):
+                log_debug(f"cms_execute_promql_query result: {result}", log_level=2)
+            return self.result_store.offload(result)
+
+        @self.server.tool()
+        @handle_tea_exception
+        def cms_execute_promql_range_query(
+                ctx: Context,
+                project: str = Field(..., description="sls project name"),
+                metricStore: str = Field(..., description="sls metric store name"),
+                query: str = Field(..., description="promql query"),
+                fromTimestampInSeconds: int = Field(
+                    ...,
+                    description="from timestamp,unit is second,should be unix timestamp, only number,no other characters",
+                ),
+                toTimestampInSeconds: int = Field(
+                    ...,
+                    description="to timestamp,unit is second,should be unix timestamp, only number,no other characters",
+                ),
+                stepInSeconds: int = Field(
+                    60, description="query resolution step,unit is second", ge=1, le=86400
+                ),
+                regionId: str = Field(
+                    default=...,
+                    description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'",
+                ),
+        ) -> dict:
+            """执行Prometheus范围查询，返回原始时间序列。
+
+            ## 功能概述
+
+            该工具用于在指定的SLS项目和时序库上执行PromQL范围查询，返回每条时间序列的标签、时间戳和值。
+            查询时间范围会按 step 对齐，并按固定时间片（默认1小时）拆分，已完成的时间片结果会被缓存，
+            重复查询“最近N小时”这类滑动窗口时只需要查询未缓存的尾部时间片。
+
+            ## 使用场景
+
+            - 当需要获取指标的原始时间序列数据进行分析时
+            - 当需要反复查询最近一段时间的指标趋势时
+
+            ## 时间范围
+
+            - fromTimestampInSeconds / toTimestampInSeconds 会向下对齐到 stepInSeconds 的整数倍
+            - 如果上下文没有提到具体的时间戳，必须优先使用 sls_get_current_time 工具生成时间戳参数
+
+            Args:
+                ctx: MCP上下文，用于访问SLS客户端
+                project: SLS项目名称
+                metricStore: SLS时序库名称
+                query: PromQL查询语句
+                fromTimestampInSeconds: 查询开始时间戳（秒）
+                toTimestampInSeconds: 查询结束时间戳（秒）
+                stepInSeconds: 查询步长（秒），默认60
+                regionId: 阿里云区域ID
+
+            Returns:
+                包含时间序列列表和时间片缓存命中情况的字典
+            """
+            from alibabacloud_sls20201230.models import GetLogsRequest
+            from alibabacloud_tea_util import models as util_models
+
+            spl = get_spl_template("raw-promql-range-template").render(
+                promql=query, step=stepInSeconds
+            )
+            sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
+
+            def execute(start: int, end: int) -> List[Dict[str, Any]]:
+                sls_client: SLSClient = sls_client_wrapper.with_region(regionId)
+                request: GetLogsRequest = GetLogsRequest(query=spl, from_=start, to=end)
+                runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
+                runtime.read_timeout = 60000
+                runtime.connect_timeout = 60000
+                return sls_client_wrapper.get_logs(
+                    sls_client, project, metricStore, request, runtime
+                ) or []
+
+            result = self.promql_frontend.query(
+                execute,
+                (regionId, project, metricStore, query),
+                fromTimestampInSeconds,
+                toTimestampInSeconds,
+                stepInSeconds,
+            )
+            result["message"] = (
+                "success"
+                if result["data"]
+                else "Not found data by query,you can try to change the query or time range"
+            )
+            return self.result_store.offload(result)
+
+
+class PromQLQueryFrontend:
+    """PromQL 范围查询前端
+
+    参考 Thanos/Cortex query-frontend 的做法：
+    1. 查询范围按 step 向下对齐
+    2. 按 split_interval 拆分为固定时间片，首个时间片扩展到完整边界以便复用缓存；
+       step 不能整除 split_interval 时时间片长度取 step 的整数倍，各时间片的采样点与不拆分时一致
+    3. 已结束超过 max_freshness 秒的时间片视为已完成，其结果会被缓存
+    4. 只有未命中缓存的时间片才会真正发起查询，各时间片并行执行
+    5. 合并各时间片的序列，按时间戳去重并裁剪到对齐后的查询范围
+    """
+
+    def __init__(
+        self,
+        split_interval: int = 3600,
+        max_freshness: int = 300,
+        cache: Optional[TTLCache] = None,
+        max_workers: int = 4,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.split_interval = split_interval
+        self.max_freshness = max_freshness
+        self.cache = cache if cache is not None else TTLCache(max_entries=2048)
+        self.max_workers = max_workers
+        self._clock = clock
+
+    @staticmethod
+    def align(from_ts: int, to_ts: int, step: int) -> tuple[int, int]:
+        start = from_ts - from_ts % step
+        end = to_ts - to_ts % step
+        if end <= start:
+            end = start + step
+        return start, end
+
+    def interval(self, step: int) -> int:
+        """实际拆分的时间片长度：不小于 split_interval 的 step 的整数倍，保证每个时间片的起点都在 step 网格上"""
+        return step * -(-self.split_interval // step)
+
+    def split(self, start: int, end: int, step: int = 1) -> list[tuple[int, int]]:
+        """按时间片边界拆分 [start, end]，返回完整边界的时间片，start 需已按 step 对齐"""
+        interval = self.interval(step)
+        intervals = []
+        cursor = start - start % interval
+        while cursor < end:
+            intervals.append((cursor, cursor + interval))
+            cursor += interval
+        return intervals
+
+    def query(
+        self,
+        execute: Callable[[int, int], List[Dict[str, Any]]],
+        key_prefix: tuple,
+        from_ts: int,
+        to_ts: int,
+        step: int,
+    ) -> dict:
+        start, end = self.align(from_ts, to_ts, step)
+        settled_before = self._clock() - self.max_freshness
+        parts: list[Optional[List[Dict[str, Any]]]] = []
+        pending: list[tuple[int, int, int, Optional[tuple]]] = []
+        for index, (interval_start, interval_end) in enumerate(self.split(start, end, step)):
+            if interval_end <= settled_before:
+                cache_key = key_prefix + (step, interval_start, interval_end)
+                rows = self.cache.get(cache_key)
+                if rows is not None:
+                    parts.append(rows)
+                    continue
+                pending.append((index, interval_start, interval_end, cache_key))
+            else:
+                # 尚未完成的时间片只查询到对齐后的结束时间，且不缓存
+                pending.append((index, interval_start, min(interval_end, end), None))
+            parts.append(None)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                futures = [
+                    pool.submit(execute, interval_start, interval_end)
+                    for _, interval_start, interval_end, _ in pending
+                ]
+                for (index, interval_start, interval_end, cache_key), future in zip(
+                    pending, futures
+                ):
+                    rows = future.result()
+                    parts[index] = rows
+                    if cache_key is not None:
+                        self.cache.set(cache_key, rows)
+        log_debug(
+            f"promql range query split into {len(parts)} intervals, "
+            f"{len(parts) - len(pending)} from cache"
+        )
+        return {
+            "data": merge_promql_series(parts, start, end),
+            "intervals": {
+                "total": len(parts),
+                "cached": len(parts) - len(pending),
+                "queried": len(pending),
+            },
+        }
+
+
+def merge_promql_series(
+    parts: list[List[Dict[str, Any]]], start: int, end: int
+) -> list[dict]:
+    """按标签合并多个时间片的序列结果，按时间戳去重并裁剪到 [start, end]"""
+    merged: dict[str, dict] = {}
+    for rows in parts:
+        for row in rows or []:
+            labels = _parse_json_value(row.get("__labels__"), {})
+            series_key = (
+                json.dumps(labels, sort_keys=True)
+                if isinstance(labels, dict)
+                else str(labels)
+            )
+            series = merged.get(series_key)
+            if series is None:
+                series = {"labels": labels, "timestamps": [], "values": [], "_seen": set()}
+                merged[series_key] = series
+            timestamps = _parse_json_value(row.get("__ts__"), [])
+            values = _parse_json_value(row.get("__value__"), [])
+            for ts, value in zip(timestamps, values):
+                if ts in series["_seen"]:
+                    continue
+                if not start <= _timestamp_to_seconds(ts) <= end:
+                    continue
+                series["_seen"].add(ts)
+                series["timestamps"].append(ts)
+                series["values"].append(value)
+    for series in merged.values():
+        del series["_seen"]
+    return list(merged.values())
+
+
+def _parse_json_value(value: Any, default: Any) -> Any:
+    if value is None:
+        return default
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _timestamp_to_seconds(ts: Any) -> float:
+    """时序库返回的时间戳单位不固定，按数量级换算为秒"""
+    ts = float(ts)
+    if ts >= 1e17:
+        return ts / 1e9
+    if ts >= 1e14:
+        return ts / 1e6
+    if ts >= 1e11:
+        return ts / 1e3
+    return ts
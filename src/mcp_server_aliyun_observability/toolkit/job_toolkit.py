@@ -0,0 +1,148 @@
+import asyncio
+from typing import Any, Dict
+
+from mcp.server.fastmcp import Context, FastMCP
+from pydantic import Field
+
+from mcp_server_aliyun_observability.jobs import JobContext, JobManager, JobProgress
+from mcp_server_aliyun_observability.utils import session_key
+
+# 可以提交为后台任务的工具，均为调用 CallAiTools 的耗时分析
+JOB_TOOLS = (
+    "sls_diagnose_query",
+    "arms_generate_trace_query",
+    "arms_profile_flame_analysis",
+    "arms_diff_profile_flame_analysis",
+    "arms_trace_quality_analysis",
+    "arms_slow_trace_analysis",
+    "arms_error_trace_analysis",
+)
+# job_get 等待期间每条进度通知中任务进度消息的最大字符数
+PROGRESS_MESSAGE_CHARS = 200
+
+
+class JobToolkit:
+    def __init__(self, server: FastMCP):
+        self.server = server
+        self.job_manager = JobManager()
+        self._register_tools()
+
+    def _register_tools(self):
+        """register background job tools functions"""
+
+        @self.server.tool()
+        def job_submit(
+            ctx: Context,
+            toolName: str = Field(..., description=f"tool name, one of {', '.join(JOB_TOOLS)}"),
+            arguments: Dict[str, Any] = Field(..., description="arguments of the tool"),
+        ) -> dict:
+            """将耗时的 AI 分析工具提交为后台任务。
+
+            ## 功能概述
+
+            提交后立即返回任务ID，分析在后台执行，避免客户端等待超时。之后使用 job_get 查询任务状态和结果，
+            使用 job_cancel 取消任务。
+
+            ## 使用场景
+
+            - 调用 sls_diagnose_query、arms_profile_flame_analysis、arms_diff_profile_flame_analysis、
+              arms_trace_quality_analysis、arms_slow_trace_analysis、arms_error_trace_analysis、
+              arms_generate_trace_query 等耗时可能达到一分钟的工具时
+            - 客户端请求超时较短时
+
+            Args:
+                ctx: MCP上下文
+                toolName: 要执行的工具名称
+                arguments: 工具参数，与直接调用该工具时相同
+
+            Returns:
+                包含 jobId 和 status 的字典
+            """
+            if toolName not in JOB_TOOLS:
+                raise ValueError(f"tool {toolName} can not run as a job, supported: {', '.join(JOB_TOOLS)}")
+            tool = self.server._tool_manager.get_tool(toolName)
+            if tool is None:
+                raise ValueError(f"tool {toolName} is not enabled")
+            # 提交前校验参数，参数错误立即返回
+            tool.fn_metadata.arg_model.model_validate(arguments)
+
+            # 任务在请求结束后继续执行，使用与当前请求分离的上下文，进度记录到任务上
+            progress = JobProgress()
+            job_ctx = JobContext(ctx, progress)
+
+            def run() -> Any:
+                return asyncio.run(tool.run(arguments, context=job_ctx))
+
+            return self.job_manager.submit(session_key(ctx), toolName, run, progress)
+
+        @self.server.tool()
+        async def job_get(
+            ctx: Context,
+            jobId: str = Field(..., description="job id"),
+            waitSeconds: int = Field(
+                0, description="wait up to this many seconds for the job to finish", ge=0, le=60
+            ),
+        ) -> dict:
+            """查询后台任务的状态和结果。
+
+            ## 功能概述
+
+            返回任务状态（pending、running、succeeded、failed、cancelled），任务成功时返回结果，失败时返回错误信息。
+            任务中的工具上报过进度时，progress 字段为最近一次上报的进度（progress、total、message）。
+            指定 waitSeconds 时最多等待该秒数，等待期间通过进度通知推送任务状态和进度消息新增的内容（完整内容见返回的 progress）。
+
+            Args:
+                ctx: MCP上下文
+                jobId: job_submit 返回的任务ID
+                waitSeconds: 最长等待秒数，0 表示立即返回
+
+            Returns:
+                任务状态字典
+            """
+            owner = session_key(ctx)
+
+            sent_message = ""
+
+            async def on_progress(snapshot: Dict[str, Any]) -> None:
+                # AI 工具上报的进度消息是截至目前的完整答案，每次通知只带上次通知后新增的部分，且不超过 PROGRESS_MESSAGE_CHARS 个字符
+                nonlocal sent_message
+                message = f"job {snapshot['status']}"
+                progress = snapshot.get("progress") or {}
+                if progress.get("progress") is not None:
+                    message = f"{message}, progress {progress['progress']}"
+                    if progress.get("total") is not None:
+                        message = f"{message}/{progress['total']}"
+                text = progress.get("message") or ""
+                if text and text != sent_message:
+                    delta = text[len(sent_message):] if text.startswith(sent_message) else text
+                    sent_message = text
+                    message = f"{message}: {delta[-PROGRESS_MESSAGE_CHARS:]}"
+                await ctx.report_progress(snapshot["elapsedSeconds"], None, message)
+
+            snapshot = await self.job_manager.wait(owner, jobId, waitSeconds, on_progress)
+            if snapshot is None:
+                raise ValueError(f"job {jobId} not found")
+            return snapshot
+
+        @self.server.tool()
+        def job_cancel(
+            ctx: Context,
+            jobId: str = Field(..., description="job id"),
+        ) -> dict:
+            """取消后台任务。
+
+            ## 功能概述
+
+            排队中的任务不再执行；运行中的任务无法中断已发出的请求，取消后丢弃其结果。
+
+            Args:
+                ctx: MCP上下文
+                jobId: job_submit 返回的任务ID
+
+            Returns:
+                任务状态字典
+            """
+            snapshot = self.job_manager.cancel(session_key(ctx), jobId)
+            if snapshot is None:
+                raise ValueError(f"job {jobId} not found")
+            return snapshot
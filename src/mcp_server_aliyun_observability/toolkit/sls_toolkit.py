@@ -1,34 +1,66 @@
-from typing import Any, Dict, List
-
-from alibabacloud_sls20201230.client import Client
-from alibabacloud_sls20201230.models import (
-    CallAiToolsRequest,
-    CallAiToolsResponse,
-    GetIndexResponse,
-    GetIndexResponseBody,
-    GetLogsRequest,
-    GetLogsResponse,
-    IndexJsonKey,
-    IndexKey,
-    ListLogStoresRequest,
-    ListLogStoresResponse,
-    ListProjectRequest,
-    ListProjectResponse,
-)
-from alibabacloud_tea_util import models as util_models
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Union
+
 from mcp.server.fastmcp import Context, FastMCP
 from mcp.server.fastmcp.prompts import base
 from pydantic import Field
 from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_fixed
 
-from mcp_server_aliyun_observability.logger import log_error
+from mcp_server_aliyun_observability.ai_tools import call_ai_tools_streaming
+from mcp_server_aliyun_observability.cache import TTLCache
+from mcp_server_aliyun_observability.disk_cache import (
+    GET_INDEX_TTL,
+    GET_LOGS_TTL,
+    cached,
+    cached_bytes,
+    get_logs_cacheable,
+    get_result_cache,
+)
+from mcp_server_aliyun_observability.export import (
+    ArrowExporter,
+    ExportError,
+    index_field_types,
+    load_pyarrow,
+    paged_queries,
+)
+from mcp_server_aliyun_observability.log_tail import LogTailer
+from mcp_server_aliyun_observability.log_transfer import embed_raw_json, raw_is_empty
+from mcp_server_aliyun_observability.logger import log_error, log_warning
+from mcp_server_aliyun_observability.query_planner import (
+    REFUSED,
+    SAMPLED,
+    SLICED,
+    QueryPlanner,
+    incremental_order,
+)
+from mcp_server_aliyun_observability.query_validation import split_query, validate_query
+from mcp_server_aliyun_observability.result_store import get_result_store
+from mcp_server_aliyun_observability.sliding_window import (
+    BucketedQueryCache,
+    IncrementalQueryError,
+    detect_time_bucket,
+)
 from mcp_server_aliyun_observability.utils import (
     append_current_time,
     get_current_time,
     handle_tea_exception,
     parse_json_keys,
+    session_key,
 )
 
+if TYPE_CHECKING:
+    from alibabacloud_sls20201230.client import Client
+    from alibabacloud_sls20201230.models import (
+        GetIndexResponse,
+        GetHistogramsResponse,
+        GetIndexResponseBody,
+        IndexKey,
+        ListLogStoresResponse,
+        ListProjectResponse,
+    )
+
 
 class SLSToolkit:
     """aliyun observability tools manager"""
@@ -41,9 +73,68 @@ class SLSToolkit:
             server: FastMCP server instance
         """
         self.server = server
+        self.bucketed_query_cache = BucketedQueryCache()
+        self.log_tailer = LogTailer()
+        self.index_cache = TTLCache(max_entries=1024, ttl=GET_INDEX_TTL)
+        self.query_planner = QueryPlanner()
+        self.result_store = get_result_store(server)
         self._register_sls_tools()
         self._register_prompts()
 
+    def _get_index(
+        self, ctx: Context, region_id: str, project: str, log_store: str
+    ) -> dict[str, dict[str, Any]]:
+        """获取日志库的索引结构，依次使用内存缓存和持久化缓存"""
+        key = (region_id, project, log_store)
+        index = self.index_cache.get(key)
+        if index is not None:
+            return index
+        sls_client: Client = ctx.request_context.lifespan_context[
+            "sls_client"
+        ].with_region(region_id)
+
+        def get_index() -> dict[str, dict[str, Any]]:
+            response: GetIndexResponse = sls_client.get_index(project, log_store)
+            response_body: GetIndexResponseBody = response.body
+            keys: dict[str, IndexKey] = response_body.keys or {}
+            index_dict: dict[str, dict[str, Any]] = {}
+            for name, value in keys.items():
+                index_dict[name] = {
+                    "alias": value.alias,
+                    "sensitive": value.case_sensitive,
+                    "type": value.type,
+                    "doc_value": value.doc_value,
+                    "json_keys": parse_json_keys(value.json_keys or {}),
+                }
+            return index_dict
+
+        index = cached(get_result_cache(ctx), "GetIndex", key, get_index, GET_INDEX_TTL)
+        self.index_cache.set(key, index)
+        return index
+
+    def _plan_query(
+        self,
+        sls_client: "Client",
+        project: str,
+        log_store: str,
+        query: str,
+        from_ts: int,
+        to_ts: int,
+    ) -> dict[str, Any]:
+        """用检索语句调用 GetHistograms 估算命中行数，返回 QueryPlanner 选择的执行策略"""
+        from alibabacloud_sls20201230.models import GetHistogramsRequest
+
+        request = GetHistogramsRequest(
+            from_=from_ts, to=to_ts, query=split_query(query)[0].strip() or "*"
+        )
+
+        def get_histograms() -> List[Dict[str, Any]]:
+            response: GetHistogramsResponse = sls_client.get_histograms(project, log_store, request)
+            return [bucket.to_map() for bucket in response.body or []]
+
+        histograms = self.query_planner.fetch_histograms(get_histograms)
+        return self.query_planner.plan(query, from_ts, to_ts, histograms)
+
     def _register_prompts(self):
         """register sls related prompts functions"""
 
@@ -114,6 +205,8 @@ class SLSToolkit:
             Returns:
                 包含项目信息的字典列表，每个字典包含project_name、description和region_id
             """
+            from alibabacloud_sls20201230.models import ListProjectRequest
+
             sls_client: Client = ctx.request_context.lifespan_context[
                 "sls_client"
             ].with_region(regionId)
@@ -207,6 +300,8 @@ class SLSToolkit:
                     "logstores": [],
                     "messager": "Please specify the project name,if you want to list all projects,please use sls_list_projects tool",
                 }
+            from alibabacloud_sls20201230.models import ListLogStoresRequest
+
             sls_client: Client = ctx.request_context.lifespan_context[
                 "sls_client"
             ].with_region(regionId)
@@ -270,6 +365,7 @@ class SLSToolkit:
             - alias: 字段别名
             - sensitive: 是否大小写敏感
             - type: 字段类型
+            - doc_value: 是否开启统计，未开启统计的字段不能在分析语句（SQL）中使用
             - json_keys: JSON字段的子字段信息
 
             ## 查询示例
@@ -287,23 +383,10 @@ class SLSToolkit:
             Returns:
                 包含日志库结构信息的字典
             """
-            sls_client: Client = ctx.request_context.lifespan_context[
-                "sls_client"
-            ].with_region(regionId)
-            response: GetIndexResponse = sls_client.get_index(project, logStore)
-            response_body: GetIndexResponseBody = response.body
-            keys: dict[str, IndexKey] = response_body.keys
-            index_dict: dict[str, dict[str, str]] = {}
-            for key, value in keys.items():
-                index_dict[key] = {
-                    "alias": value.alias,
-                    "sensitive": value.case_sensitive,
-                    "type": value.type,
-                    "json_keys": parse_json_keys(value.json_keys),
-                }
-            return index_dict
+            return self._get_index(ctx, regionId, project, logStore)
 
-        @self.server.tool()
+        # rawResult 时返回已序列化的文本，不生成 outputSchema，两种返回值都作为文本内容返回
+        @self.server.tool(structured_output=False)
         @retry(
             stop=stop_after_attempt(2),
             wait=wait_fixed(1),
@@ -329,7 +412,32 @@ class SLSToolkit:
                 default=...,
                 description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'",
             ),
-        ) -> dict:
+            incremental: bool = Field(
+                False,
+                description="incremental mode for queries grouped by a time bucket, closed buckets are cached and only the new tail window is queried",
+            ),
+            bucketSeconds: int = Field(
+                None,
+                description="time bucket size in seconds for incremental mode, detected from the query if not set",
+                ge=1,
+            ),
+            bucketField: str = Field(
+                None,
+                description="result column holding the time bucket (unix timestamp) for incremental mode, detected from the query alias if not set",
+            ),
+            validateQuery: bool = Field(
+                True,
+                description="check columns referenced by the sql part against the logstore index before querying",
+            ),
+            planQuery: bool = Field(
+                False,
+                description="estimate matched rows with GetHistograms first and choose to query directly, in parallel time slices, on a sampled window, or refuse",
+            ),
+            rawResult: bool = Field(
+                False,
+                description="embed the upstream result body into data as is without parsing rows, results over 100 rows fall back to the paged result, ignored in incremental or planQuery mode",
+            ),
+        ) -> Union[dict, str]:
             """执行SLS日志查询。
 
             ## 功能概述
@@ -359,6 +467,42 @@ class SLSToolkit:
             - "帮我查询下 XXX 的日志信息"
             - "查找最近一小时内的错误日志"
 
+            ## 增量模式
+
+            对于按时间桶分组的聚合查询（如 `* | select __time__ - __time__ % 60 as t, count(*) as cnt group by t order by t`），
+            反复查询最近一段时间时可以设置 incremental=True：
+            - 开始时间会向下对齐到桶边界，已关闭的桶结果会被缓存复用，只查询新增的尾部窗口
+            - 时间桶大小和结果列名默认从查询语句中识别，也可以通过 bucketSeconds 和 bucketField 指定
+            - 查询语句不能带 limit，只能不排序或按时间桶排序；每段查询会按段内桶数追加 limit
+            - 如果结果中的时间桶未对齐或超出查询区间，或分段结果达到 limit 可能被截断，会自动退回普通查询
+
+            ## 查询校验
+
+            默认在发起查询前，根据日志库的索引结构（与 sls_describe_logstore 相同，带缓存）在本地校验分析语句（| 之后的 SQL）引用的列：
+            - 未开启统计（doc_value）的列和 JSON 子字段仍然执行查询，在返回的 validation.noStatisticsColumns 中提示；查询报错时可据此在索引配置中开启统计
+            - 索引中不存在的列仍然执行查询，在返回的 validation.unknownColumns 中提示；查询失败时可据此修改列名
+            - 未加引号的 JSON 子字段（如 attributes.user_id）自动改写为 "attributes.user_id"，改写记录在返回的 validation 中
+            - 校验误报时可以设置 validateQuery=False 跳过校验
+
+            ## 代价估算
+
+            查询时间范围较大或日志量较多时可以设置 planQuery=True，先用 GetHistograms 估算检索语句命中的行数，再选择执行策略：
+            - direct: 命中行数较少，或不是聚合、排序类的分析查询，直接执行
+            - sliced: 按时间桶聚合的查询，按命中行数在桶边界处切分时间范围并行查询，合并后的结果与直接查询一致
+            - sampled: 其他聚合查询只查询结束时间之前的一段时间窗口，返回的 plan.sampled 中标注实际查询的时间范围和覆盖比例
+            - refused: 命中行数过多，不执行查询，返回缩小范围的建议和命中行数最多的时间段
+            估算结果和所选策略记录在返回的 plan 中
+
+            ## 大结果集
+
+            结果超过 100 行时，data 中只返回前 100 行，完整结果保存在服务端，返回的 resource 中包含资源 URI，
+            通过 resources/read 读取 resource.nextUri 或按 resource.pageUriTemplate 指定 offset/limit 分页获取其余行
+
+            设置 rawResult=True 时，服务端不解析每一行，直接把 SLS 返回的 JSON 数组原样放入 data，减少大结果的 CPU 和内存开销：
+            - 结果不超过 100 行时原样返回，不返回 resource
+            - 超过 100 行时退回普通结果：解析后只内联前 100 行，其余通过 resource 分页获取，并在 rawResult.disabled 中说明原因
+            - 与 incremental、planQuery 同时设置时不生效（这两种模式需要解析结果）
+
             ## 错误处理
             - Column xxx can not be resolved: 可能存在查询列未开启统计，可以提示用户增加相对应的信息，或者调用 sls_describe_logstore 工具获取索引信息之后，要用户选择正确的字段或者提示用户对列开启统计。
 
@@ -371,37 +515,409 @@ class SLSToolkit:
                 toTimestamp: 查询结束时间戳（秒）
                 limit: 返回结果的最大数量，范围1-100，默认10
                 regionId: 阿里云区域ID
+                incremental: 是否对按时间桶聚合的查询启用增量模式
+                bucketSeconds: 时间桶大小（秒），默认从查询语句识别
+                bucketField: 结果中时间桶所在的列名，默认从查询语句识别
+                validateQuery: 是否在查询前根据索引校验分析语句引用的列
+                planQuery: 是否在查询前估算命中行数并选择执行策略
+                rawResult: 是否不解析结果，原样返回 SLS 的响应数据
 
             Returns:
-                查询结果列表，每个元素为一条日志记录
+                查询结果字典，data 为日志记录列表，另含 message 及可能的 resource、validation、plan、incremental；
+                rawResult 为 True 且结果不超过 100 行时返回已序列化的 JSON 文本，其中 data 为 SLS 返回的原始日志数组
             """
+            from alibabacloud_sls20201230.models import GetLogsRequest
+            from alibabacloud_tea_util import models as util_models
+
             sls_client: Client = ctx.request_context.lifespan_context[
                 "sls_client"
             ].with_region(regionId)
-            request: GetLogsRequest = GetLogsRequest(
-                query=query,
-                from_=fromTimestampInSeconds,
-                to=toTimestampInSeconds,
-                line=limit,
+
+            validation: dict[str, Any] = {}
+            if validateQuery:
+                try:
+                    index = self._get_index(ctx, regionId, project, logStore)
+                except Exception as e:
+                    log_warning(f"获取日志库 {project}/{logStore} 索引失败，跳过查询校验: {e}")
+                else:
+                    validation = validate_query(query, index)
+                    # 列名识别可能误报（如未覆盖的语法中定义的名称），校验出的问题只提示，仍然执行查询
+                    if validation["unknownColumns"]:
+                        log_warning(
+                            f"查询引用的列 {', '.join(validation['unknownColumns'])} 不在日志库 {logStore} 的索引中"
+                        )
+                    if validation["noStatisticsColumns"]:
+                        log_warning(
+                            f"查询引用的列 {', '.join(validation['noStatisticsColumns'])} 在日志库 {logStore} 中未开启统计"
+                        )
+                    query = validation["query"]
+
+            result_cache = get_result_cache(ctx)
+
+            def get_logs_args(from_ts: int, to_ts: int, logs_query: Optional[str] = None) -> tuple:
+                request: GetLogsRequest = GetLogsRequest(
+                    query=logs_query or query,
+                    from_=from_ts,
+                    to=to_ts,
+                    line=limit,
+                )
+                runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
+                runtime.read_timeout = 60000
+                runtime.connect_timeout = 60000
+                return sls_client, project, logStore, request, runtime
+
+            def execute(
+                from_ts: int, to_ts: int, sql_limit: Optional[int] = None
+            ) -> List[Dict[str, Any]]:
+                segment_query = query
+                if sql_limit is not None:
+                    segment_query = f"{query.rstrip().rstrip(';')} limit {sql_limit}"
+                return cached(
+                    result_cache if get_logs_cacheable(to_ts) else None,
+                    "GetLogs",
+                    (regionId, project, logStore, segment_query, from_ts, to_ts, limit),
+                    lambda: ctx.request_context.lifespan_context["sls_client"].get_logs(
+                        *get_logs_args(from_ts, to_ts, segment_query)
+                    ),
+                    GET_LOGS_TTL,
+                )
+
+            if rawResult and not incremental and not planQuery:
+                raw = cached_bytes(
+                    result_cache if get_logs_cacheable(toTimestampInSeconds) else None,
+                    "GetLogsRaw",
+                    (regionId, project, logStore, query, fromTimestampInSeconds, toTimestampInSeconds, limit),
+                    lambda: ctx.request_context.lifespan_context["sls_client"].get_logs_raw(
+                        *get_logs_args(fromTimestampInSeconds, toTimestampInSeconds)
+                    ),
+                    GET_LOGS_TTL,
+                )
+                # 每行日志都是一个 JSON 对象，"{" 的个数是行数的上界，不超过内联行数时无需解析
+                if raw.count(b"{") > self.result_store.inline_rows:
+                    rows = json.loads(raw)
+                    if len(rows) > self.result_store.inline_rows:
+                        # 超过内联行数时退回普通结果，由 result_store 分页，保证单次响应的大小
+                        result = {
+                            "data": rows,
+                            "rawResult": {
+                                "disabled": f"结果超过 {self.result_store.inline_rows} 行，已改为分页返回"
+                            },
+                        }
+                        if _has_validation_notes(validation):
+                            result["validation"] = _validation_summary(logStore, query, validation)
+                        result["message"] = "success"
+                        return self.result_store.offload(result)
+                head: dict[str, Any] = {
+                    "message": (
+                        "success"
+                        if not raw_is_empty(raw)
+                        else "Not found data by query,you can try to change the query or time range"
+                    )
+                }
+                if _has_validation_notes(validation):
+                    head["validation"] = _validation_summary(logStore, query, validation)
+                return embed_raw_json(head, "data", raw)
+
+            result: dict[str, Any] = {}
+            if incremental:
+                detected = detect_time_bucket(query) or (None, None)
+                bucket_seconds = bucketSeconds or detected[0]
+                bucket_field = bucketField or detected[1]
+                if bucket_seconds and bucket_field:
+                    try:
+                        result = self.bucketed_query_cache.query(
+                            execute,
+                            (regionId, project, logStore, query),
+                            fromTimestampInSeconds,
+                            toTimestampInSeconds,
+                            bucket_seconds,
+                            bucket_field,
+                            incremental_order(query, bucket_field),
+                        )
+                    except IncrementalQueryError as e:
+                        log_warning(f"增量查询校验失败，退回普通查询: {e}")
+                        result = {"incremental": {"disabled": str(e)}}
+                else:
+                    result = {
+                        "incremental": {
+                            "disabled": "无法从查询语句识别时间桶，请指定 bucketSeconds 和 bucketField"
+                        }
+                    }
+            if "data" not in result and planQuery:
+                plan = self._plan_query(
+                    sls_client, project, logStore, query, fromTimestampInSeconds, toTimestampInSeconds
+                )
+                if plan["strategy"] == REFUSED:
+                    return _plan_refused(logStore, plan)
+                if plan["strategy"] == SLICED:
+                    with ThreadPoolExecutor(max_workers=len(plan["slices"])) as executor:
+                        results = list(executor.map(lambda s: execute(*s), plan["slices"]))
+                    result["data"] = QueryPlanner.merge_slices(plan, results)
+                elif plan["strategy"] == SAMPLED:
+                    result["data"] = execute(plan["sampled"]["from"], plan["sampled"]["to"])
+                plan.pop("merge", None)
+                result["plan"] = plan
+            if "data" not in result:
+                result["data"] = execute(fromTimestampInSeconds, toTimestampInSeconds)
+            if _has_validation_notes(validation):
+                result["validation"] = _validation_summary(logStore, query, validation)
+            result["message"] = (
+                "success"
+                if result["data"]
+                else "Not found data by query,you can try to change the query or time range"
             )
-            runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
-            runtime.read_timeout = 60000
-            runtime.connect_timeout = 60000
-            response: GetLogsResponse = sls_client.get_logs_with_options(
-                project, logStore, request, headers={}, runtime=runtime
+            return self.result_store.offload(result)
+
+
+        @self.server.tool()
+        async def sls_export_query_results(
+            ctx: Context,
+            project: str = Field(..., description="sls project name"),
+            logStore: str = Field(..., description="sls log store name"),
+            query: str = Field(..., description="query"),
+            fromTimestampInSeconds: int = Field(
+                ...,
+                description="from timestamp,unit is second,should be unix timestamp, only number,no other characters",
+            ),
+            toTimestampInSeconds: int = Field(
+                ...,
+                description="to timestamp,unit is second,should be unix timestamp, only number,no other characters",
+            ),
+            regionId: str = Field(
+                default=...,
+                description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'",
+            ),
+            fileFormat: str = Field("parquet", description="file format, parquet or arrow (Arrow IPC file)"),
+            maxRows: int = Field(100000, description="max rows to export", ge=1, le=1000000),
+        ) -> dict:
+            """将查询结果导出为本地 Parquet 或 Arrow 文件。
+
+            ## 功能概述
+
+            分页执行 GetLogs，把每一页转换为 Arrow RecordBatch 后写入服务端配置的导出目录（--export-dir），
+            只返回文件路径、行数和文件大小，数据本身不经过对话上下文。
+
+            ## 使用场景
+
+            - 需要批量拉取日志或查询结果，交给其他工具（如 pandas、DuckDB）离线分析时
+            - 结果行数较多，不适合通过 sls_execute_sql_query 直接返回时
+
+            ## 分页与类型
+
+            - 检索语句按 offset 每页 100 行分页；分析语句只查询一次，未指定 limit 时自动追加 limit maxRows
+            - 任一次 GetLogs 返回的进度不是 Complete 时，导出结果不完整，返回 incomplete=True，可缩小时间范围后重新导出
+            - 列类型根据日志库索引推断：long 为 int64，double 为 float64，其他为 string
+            - 需要安装可选依赖：pip install 'mcp-server-aliyun-observability[export]'
+
+            Args:
+                ctx: MCP上下文，用于访问SLS客户端
+                project: SLS项目名称
+                logStore: SLS日志库名称
+                query: SLS查询语句
+                fromTimestampInSeconds: 查询开始时间戳（秒）
+                toTimestampInSeconds: 查询结束时间戳（秒）
+                regionId: 阿里云区域ID
+                fileFormat: 文件格式，parquet 或 arrow
+                maxRows: 最多导出的行数
+
+            Returns:
+                导出文件的路径、行数、字节数和列信息，以及是否截断（truncated）、结果是否不完整（incomplete）
+            """
+            from alibabacloud_sls20201230.models import GetLogsRequest
+            from alibabacloud_tea_util import models as util_models
+
+            export_dir = ctx.request_context.lifespan_context.get("export_dir")
+            if not export_dir:
+                return {
+                    "message": "服务端未配置导出目录",
+                    "solution": "启动 MCP Server 时通过 --export-dir 或环境变量 MCP_EXPORT_DIR 指定导出目录",
+                }
+
+            # 分页查询和写文件都是阻塞操作，在工作线程中执行，不阻塞事件循环
+            @handle_tea_exception
+            def export() -> dict:
+                try:
+                    exporter = ArrowExporter(export_dir, fileFormat)
+                    load_pyarrow()
+                except ExportError as e:
+                    return {"message": str(e), "solution": "安装 export 可选依赖，fileFormat 可选 parquet 或 arrow"}
+
+                sls_client: Client = ctx.request_context.lifespan_context[
+                    "sls_client"
+                ].with_region(regionId)
+                try:
+                    field_types = index_field_types(self._get_index(ctx, regionId, project, logStore))
+                except Exception as e:
+                    log_warning(f"获取日志库 {project}/{logStore} 索引失败，导出的列均为字符串: {e}")
+                    field_types = index_field_types({})
+
+                progress: set = set()
+
+                def pages():
+                    for page_query, offset, size in paged_queries(query, maxRows):
+                        request = GetLogsRequest(
+                            query=page_query,
+                            from_=fromTimestampInSeconds,
+                            to=toTimestampInSeconds,
+                            line=size,
+                            offset=offset,
+                        )
+                        runtime = util_models.RuntimeOptions(read_timeout=60000, connect_timeout=60000)
+                        rows, page_progress = ctx.request_context.lifespan_context[
+                            "sls_client"
+                        ].get_logs_with_progress(sls_client, project, logStore, request, runtime)
+                        rows = rows or []
+                        progress.add(page_progress or "Complete")
+                        yield rows
+                        if len(rows) < size:
+                            break
+
+                result = exporter.export(
+                    pages(),
+                    field_types,
+                    f"{project}-{logStore}-{fromTimestampInSeconds}-{toTimestampInSeconds}",
+                    include_index=split_query(query)[1] is None,
+                )
+                result["truncated"] = result["rows"] >= maxRows
+                result["incomplete"] = bool(progress - {"Complete"})
+                if result["incomplete"]:
+                    result["message"] = "查询结果不完整（GetLogs 进度不是 Complete），请缩小时间范围后重新导出"
+                else:
+                    result["message"] = (
+                        "success"
+                        if result["rows"]
+                        else "Not found data by query,you can try to change the query or time range"
+                    )
+                return result
+
+            return await asyncio.to_thread(export)
+
+        @self.server.tool()
+        def sls_get_transfer_stats(ctx: Context) -> dict:
+            """获取查询日志时压缩传输的字节统计。
+
+            ## 功能概述
+
+            启动时通过 --sls-compression 指定响应压缩方式后，查询日志改用 GetLogsV2 接口压缩传输。
+            该工具返回当前服务进程启动以来压缩传输的请求数、实际传输的字节数、解压后的字节数、节省的字节数和压缩比，
+            用于确认压缩是否生效以及评估节省的流量。
+
+            ## 使用场景
+
+            - 排查查询慢或流量大的问题，确认压缩传输是否生效时
+
+            Args:
+                ctx: MCP上下文，用于访问SLS客户端
+
+            Returns:
+                包含 compression、requests、wireBytes、rawBytes、savedBytes 和 ratio 的字典；未启用压缩时 requests 为 0
+            """
+            sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
+            return {
+                "compression": sls_client_wrapper.compression or "none",
+                **sls_client_wrapper.transfer_stats.snapshot(),
+            }
+
+        @self.server.tool()
+        async def sls_tail_logs(
+            ctx: Context,
+            project: str = Field(..., description="sls project name"),
+            logStore: str = Field(..., description="sls log store name"),
+            regionId: str = Field(
+                default=...,
+                description="aliyun region id,region id format like 'xx-xxx',like 'cn-hangzhou'",
+            ),
+            tailId: str = Field(
+                None,
+                description="tail id returned by the previous call, continue from the saved cursors",
+            ),
+            fromTimestampInSeconds: int = Field(
+                None,
+                description="start timestamp for a new tail,unit is second,default is now",
+            ),
+            query: str = Field(
+                None, description="optional SPL statement to filter logs on the server side"
+            ),
+            maxLogs: int = Field(100, description="max logs returned per call", ge=1, le=1000),
+            followSeconds: int = Field(
+                0,
+                description="keep following new logs for the given seconds,0 means pull once",
+                ge=0,
+                le=60,
+            ),
+        ) -> dict:
+            """跟踪日志库中新写入的日志。
+
+            ## 功能概述
+
+            该工具基于 shard 游标（GetCursor/PullLogs）拉取日志库中新写入的日志，各 shard 并行拉取，
+            每次调用只返回上次调用之后新写入的数据，不需要使用重叠的时间窗口反复查询和去重。
+
+            ## 使用场景
+
+            - 当需要实时跟踪日志库的新日志时
+            - 当需要观察发布、变更之后新产生的日志时
+
+            ## 使用方式
+
+            - 首次调用不传 tailId，默认从当前时间开始跟踪，也可以通过 fromTimestampInSeconds 指定开始时间
+            - 之后的调用传入上次返回的 tailId，即可继续拉取新日志
+            - followSeconds 大于0时会持续拉取指定秒数，期间拉取到的每一批日志会通过进度通知推送
+            - 单次调用最多返回 maxLogs 条日志，拉取到的日志超过 maxLogs 时，多出的日志在下次调用时优先返回
+
+            Args:
+                ctx: MCP上下文，用于访问SLS客户端
+                project: SLS项目名称
+                logStore: SLS日志库名称
+                regionId: 阿里云区域ID
+                tailId: 上次调用返回的跟踪ID
+                fromTimestampInSeconds: 新建跟踪时的开始时间戳（秒）
+                query: 服务端过滤日志的 SPL 语句
+                maxLogs: 单次调用返回的最大日志条数
+                followSeconds: 持续跟踪的秒数
+
+            Returns:
+                包含跟踪ID和新日志列表的字典
+            """
+            sls_client: Client = ctx.request_context.lifespan_context[
+                "sls_client"
+            ].with_region(regionId)
+            owner = session_key(ctx)
+            tail_id, state = self.log_tailer.get_session(
+                owner, tailId, (regionId, project, logStore, query)
             )
-            response_body: List[Dict[str, Any]] = response.body
-            result = {
-                "data": response_body,
+            if state["start"] is None and fromTimestampInSeconds:
+                state["start"] = fromTimestampInSeconds
+
+            async def on_batch(batch: List[Dict[str, Any]], total: int) -> None:
+                await ctx.report_progress(
+                    total, maxLogs, json.dumps(batch, ensure_ascii=False)
+                )
+
+            try:
+                logs = await self.log_tailer.tail(
+                    sls_client,
+                    project,
+                    logStore,
+                    state,
+                    maxLogs,
+                    followSeconds,
+                    query=query,
+                    on_batch=on_batch,
+                )
+            finally:
+                self.log_tailer.save_session(owner, tail_id, state)
+            return {
+                "tailId": tail_id,
+                "logs": logs,
+                "count": len(logs),
                 "message": "success"
-                if response_body
-                else "Not found data by query,you can try to change the query or time range",
+                if logs
+                else "No new logs yet,call again with the same tailId to continue",
             }
-            return result
-
 
         @self.server.tool()
-        def sls_diagnose_query(
+        async def sls_diagnose_query(
             ctx: Context,
             query: str = Field(..., description="sls query"),
             errorMessage: str = Field(..., description="error message"),
@@ -436,6 +952,9 @@ class SLSToolkit:
                 log_store: SLS日志库名称
                 region_id: 阿里云区域ID
             """
+            from alibabacloud_sls20201230.models import CallAiToolsRequest
+            from alibabacloud_tea_util import models as util_models
+
             try:
                 sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
                 sls_client: Client = sls_client_wrapper.with_region("cn-shanghai")
@@ -462,15 +981,51 @@ class SLSToolkit:
                 runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
                 runtime.read_timeout = 60000
                 runtime.connect_timeout = 60000
-                tool_response: CallAiToolsResponse = (
-                    sls_client.call_ai_tools_with_options(
-                        request=request, headers={}, runtime=runtime
-                    )
-                )
-                data = tool_response.body
-                if "------answer------\n" in data:
-                    data = data.split("------answer------\n")[1]
+                data = (
+                    await call_ai_tools_streaming(ctx, sls_client, request, runtime)
+                )["data"]
                 return data
             except Exception as e:
                 log_error(f"调用SLS AI工具失败: {str(e)}")
                 raise
+
+
+def _has_validation_notes(validation: dict[str, Any]) -> bool:
+    """查询校验是否有需要随结果返回的改写或提示"""
+    return bool(
+        validation.get("rewrites")
+        or validation.get("unknownColumns")
+        or validation.get("noStatisticsColumns")
+    )
+
+
+def _validation_summary(log_store: str, query: str, validation: dict[str, Any]) -> dict[str, Any]:
+    """查询校验有改写或提示时，随查询结果返回的校验信息"""
+    summary: dict[str, Any] = {"query": query, "rewrites": validation["rewrites"]}
+    warnings = []
+    if validation["unknownColumns"]:
+        summary["unknownColumns"] = validation["unknownColumns"]
+        warnings.append(
+            f"列 {', '.join(validation['unknownColumns'])} 在日志库 {log_store} 的索引中不存在，"
+            "如果查询结果不符合预期，调用 sls_describe_logstore 获取索引信息后修改查询中的列名"
+        )
+    if validation["noStatisticsColumns"]:
+        summary["noStatisticsColumns"] = validation["noStatisticsColumns"]
+        warnings.append(
+            f"列 {', '.join(validation['noStatisticsColumns'])} 在日志库 {log_store} 中未开启统计，"
+            "如果查询报错 Column can not be resolved，需要在索引配置中开启统计后才能用于分析语句"
+        )
+    if warnings:
+        summary["warning"] = "；".join(warnings)
+    return summary
+
+
+def _plan_refused(log_store: str, plan: dict[str, Any]) -> dict[str, Any]:
+    """代价估算拒绝执行时的返回值，格式与 handle_tea_exception 处理已知错误时一致"""
+    return {
+        "message": f"{plan['reason']}，查询日志库 {log_store} 可能超时，查询未执行",
+        "solution": "缩小查询时间范围，或在检索语句（| 之前）中增加过滤条件减少命中的日志；"
+        "hotspots 中列出了命中行数最多的时间段，可以优先分析这些时间段；"
+        "按时间桶聚合的查询（如 __time__ - __time__ % 60 as t ... group by t）可以自动切片并行执行",
+        "plan": plan,
+    }
@@ -0,0 +1,453 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+TRACE_FIELDS = (
+    "traceId",
+    "spanId",
+    "parentSpanId",
+    "serviceName",
+    "spanName",
+    "startTime",
+    "duration",
+    "statusCode",
+)
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9._\-]+$")
+_ROOT_PARENT_IDS = ("", "0", "-1", "null")
+_ERROR_STATUS = ("2", "error")
+
+
+def build_trace_query(trace_id: str, max_spans: int) -> str:
+    """生成按 traceId 拉取 span 的 SLS 查询，只返回分析需要的字段"""
+    if not _TRACE_ID_PATTERN.match(trace_id):
+        raise ValueError(f"invalid trace id: {trace_id!r}")
+    return f'traceId: "{trace_id}" | select {", ".join(TRACE_FIELDS)} limit {max_spans}'
+
+
+def _to_nanoseconds(value: Any) -> int:
+    """startTime 按数量级识别秒、毫秒、微秒、纳秒并统一为纳秒"""
+    number = float(value or 0)
+    if number >= 1e17:
+        return int(number)
+    if number >= 1e14:
+        return int(number * 1e3)
+    if number >= 1e11:
+        return int(number * 1e6)
+    return int(number * 1e9)
+
+
+class Span:
+    __slots__ = (
+        "span_id",
+        "parent_id",
+        "service",
+        "name",
+        "start",
+        "end",
+        "error",
+        "children",
+        "self_time",
+    )
+
+    def __init__(self, log: Dict[str, Any]):
+        self.span_id = str(log.get("spanId") or "")
+        parent_id = str(log.get("parentSpanId") or "")
+        self.parent_id = "" if parent_id.lower() in _ROOT_PARENT_IDS else parent_id
+        self.service = log.get("serviceName") or ""
+        self.name = log.get("spanName") or ""
+        self.start = _to_nanoseconds(log.get("startTime"))
+        # duration 单位为纳秒
+        self.end = self.start + max(int(float(log.get("duration") or 0)), 0)
+        self.error = str(log.get("statusCode") or "").lower() in _ERROR_STATUS
+        self.children: List["Span"] = []
+        self.self_time = 0
+
+    @property
+    def duration(self) -> int:
+        return self.end - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id,
+            "serviceName": self.service,
+            "spanName": self.name,
+            "durationMs": _ms(self.duration),
+        }
+
+
+def _ms(nanoseconds: int) -> float:
+    return round(nanoseconds / 1e6, 3)
+
+
+def _self_time(span: Span) -> int:
+    """span 耗时减去子 span 覆盖区间的并集，并行的子调用不会被重复扣除"""
+    covered = 0
+    cursor = span.start
+    for child in span.children:
+        start = max(child.start, cursor)
+        end = min(child.end, span.end)
+        if end > start:
+            covered += end - start
+            cursor = end
+    return span.duration - covered
+
+
+def _critical_path(root: Span) -> Dict[int, int]:
+    """从根 span 的结束时间倒推关键路径，返回 id(span) -> 该 span 在关键路径上贡献的纳秒数
+
+    每个 span 从结束时刻向前，依次选取在游标之前最晚结束的子 span 进入关键路径，
+    子 span 之间的空隙计入父 span 自身。使用显式栈，深层调用链不会触发递归深度限制。
+    """
+    contributions: Dict[int, int] = {}
+
+    def frame(span: Span, end: int) -> list:
+        children = sorted(span.children, key=lambda child: child.end, reverse=True)
+        return [span, iter(children), end]
+
+    stack = [frame(root, root.end)]
+    while stack:
+        current = stack[-1]
+        span, children, cursor = current
+        for child in children:
+            if child.start >= cursor:
+                continue
+            child_end = min(child.end, cursor)
+            contributions[id(span)] = contributions.get(id(span), 0) + cursor - child_end
+            current[2] = max(child.start, span.start)
+            stack.append(frame(child, child_end))
+            break
+        else:
+            contributions[id(span)] = contributions.get(id(span), 0) + max(cursor - span.start, 0)
+            stack.pop()
+    return contributions
+
+
+def analyze_trace(logs: Iterable[Dict[str, Any]], top: int = 20) -> Dict[str, Any]:
+    """在本地构建 span 树并分析调用链结构
+
+    返回调用链总耗时、关键路径、按服务聚合的自身耗时、错误 span 以及断链信息：
+    - 断链：parentSpanId 不为空但对应的父 span 不存在（父 span 丢失或未上报）
+    - 存在多个根 span 时，以耗时最长的根 span 计算关键路径
+    - 建树、自身耗时和服务聚合均为线性复杂度，只有子 span 排序为 O(n log n)
+    """
+    spans: Dict[str, Span] = {}
+    duplicates = 0
+    for log in logs:
+        span = Span(log)
+        if span.span_id in spans:
+            duplicates += 1
+            continue
+        spans[span.span_id] = span
+
+    roots: List[Span] = []
+    orphans: List[Span] = []
+    for span in spans.values():
+        parent = spans.get(span.parent_id) if span.parent_id else None
+        if parent is not None:
+            parent.children.append(span)
+        elif span.parent_id:
+            orphans.append(span)
+        else:
+            roots.append(span)
+
+    services: Dict[str, Dict[str, Any]] = {}
+    errors: List[Span] = []
+    for span in spans.values():
+        span.children.sort(key=lambda child: child.start)
+        span.self_time = _self_time(span)
+        stats = services.setdefault(
+            span.service, {"serviceName": span.service, "spanCount": 0, "errorCount": 0, "selfTime": 0}
+        )
+        stats["spanCount"] += 1
+        stats["selfTime"] += span.self_time
+        if span.error:
+            stats["errorCount"] += 1
+            errors.append(span)
+
+    entry: Optional[Span] = max(roots or orphans, key=lambda span: span.duration, default=None)
+    critical_path: List[Dict[str, Any]] = []
+    if entry is not None:
+        contributions = _critical_path(entry)
+        on_path = [span for span in spans.values() if contributions.get(id(span), 0) > 0]
+        if top and len(on_path) > top:
+            # 关键路径过长时只保留贡献耗时最多的 span，仍按开始时间排列
+            on_path.sort(key=lambda span: contributions[id(span)], reverse=True)
+            on_path = on_path[:top]
+        on_path.sort(key=lambda span: span.start)
+        critical_path = [
+            dict(span.to_dict(), criticalMs=_ms(contributions[id(span)])) for span in on_path
+        ]
+
+    service_list = sorted(services.values(), key=lambda stats: stats["selfTime"], reverse=True)
+    for stats in service_list:
+        stats["selfTimeMs"] = _ms(stats.pop("selfTime"))
+    return {
+        "spanCount": len(spans),
+        "durationMs": _ms(entry.duration) if entry else 0,
+        "rootSpan": entry.to_dict() if entry else None,
+        "criticalPath": critical_path,
+        "services": service_list,
+        "errorSpans": [span.to_dict() for span in errors[:top]],
+        "brokenLinks": {
+            "rootCount": len(roots),
+            "orphanCount": len(orphans),
+            "orphanSpans": [span.to_dict() for span in orphans[:top]],
+            "duplicateSpanCount": duplicates,
+        },
+    }
+
+
+def build_batch_trace_query(trace_ids: List[str], max_spans: int) -> str:
+    """生成一次拉取多个 trace 的 SLS 查询
+
+    查询部分用 traceId 的 or 条件命中索引缩小扫描范围，SQL 部分再以 IN 子句过滤
+    """
+    trace_ids = list(dict.fromkeys(trace_ids))
+    for trace_id in trace_ids:
+        if not _TRACE_ID_PATTERN.match(trace_id):
+            raise ValueError(f"invalid trace id: {trace_id!r}")
+    search = " or ".join(f'traceId: "{trace_id}"' for trace_id in trace_ids)
+    values = ", ".join(f"'{trace_id}'" for trace_id in trace_ids)
+    return (
+        f"{search} | select {', '.join(TRACE_FIELDS)} "
+        f"where traceId in ({values}) limit {max_spans}"
+    )
+
+
+def _load_numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+_QUANTILES = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))
+
+
+def _group_stats_numpy(np, groups: List[int], values: List[int], group_count: int) -> Dict[str, Any]:
+    """按分组计算数量、分位数、均值、中位数和 MAD，整体排序一次，不逐组循环"""
+    groups = np.asarray(groups, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.bincount(groups, minlength=group_count)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    sorted_values = values[np.lexsort((values, groups))]
+
+    def middle(sorted_array):
+        return (sorted_array[starts + (counts - 1) // 2] + sorted_array[starts + counts // 2]) / 2
+
+    median = middle(sorted_values)
+    deviations = np.abs(values - median[groups])
+    stats = {
+        "count": counts,
+        "max": sorted_values[starts + counts - 1],
+        "mean": np.bincount(groups, weights=values, minlength=group_count) / counts,
+        "median": median,
+        "mad": middle(deviations[np.lexsort((deviations, groups))]),
+    }
+    for name, q in _QUANTILES:
+        stats[name] = sorted_values[starts + np.floor(q * (counts - 1)).astype(np.int64)]
+    return {name: array.tolist() for name, array in stats.items()}
+
+
+def _group_stats_python(groups: List[int], values: List[int], group_count: int) -> Dict[str, Any]:
+    """未安装 NumPy 时的实现，结果与 _group_stats_numpy 一致"""
+    grouped: List[List[float]] = [[] for _ in range(group_count)]
+    for group, value in zip(groups, values):
+        grouped[group].append(float(value))
+
+    def middle(sorted_values):
+        count = len(sorted_values)
+        return (sorted_values[(count - 1) // 2] + sorted_values[count // 2]) / 2
+
+    stats: Dict[str, List[float]] = {
+        name: [] for name in ("count", "max", "mean", "median", "mad", *(name for name, _ in _QUANTILES))
+    }
+    for group_values in grouped:
+        group_values.sort()
+        count = len(group_values)
+        median = middle(group_values)
+        stats["count"].append(count)
+        stats["max"].append(group_values[-1])
+        stats["mean"].append(sum(group_values) / count)
+        stats["median"].append(median)
+        stats["mad"].append(middle(sorted(abs(value - median) for value in group_values)))
+        for name, q in _QUANTILES:
+            stats[name].append(group_values[int(q * (count - 1))])
+    return stats
+
+
+def _outliers_numpy(np, groups, durations, stats, min_samples: int, threshold: float) -> List[tuple]:
+    """返回稳健 z 分数不低于 threshold 的 (span 下标, 分数)"""
+    groups = np.asarray(groups, dtype=np.int64)
+    durations = np.asarray(durations, dtype=np.float64)
+    median = np.asarray(stats["median"])[groups]
+    scale = np.maximum(np.maximum(1.4826 * np.asarray(stats["mad"])[groups], 0.1 * median), 1.0)
+    scores = (durations - median) / scale
+    scores[np.asarray(stats["count"])[groups] < min_samples] = 0.0
+    indexes = np.flatnonzero(scores >= threshold)
+    return list(zip(indexes.tolist(), scores[indexes].tolist()))
+
+
+def _outliers_python(groups, durations, stats, min_samples: int, threshold: float) -> List[tuple]:
+    outliers = []
+    for i, (group, duration) in enumerate(zip(groups, durations)):
+        if stats["count"][group] < min_samples:
+            continue
+        median = stats["median"][group]
+        scale = max(1.4826 * stats["mad"][group], 0.1 * median, 1.0)
+        score = (duration - median) / scale
+        if score >= threshold:
+            outliers.append((i, score))
+    return outliers
+
+
+def _trace_bounds_numpy(np, groups, starts, ends, errors, group_count: int) -> Dict[str, List]:
+    groups = np.asarray(groups, dtype=np.int64)
+    first = np.full(group_count, np.iinfo(np.int64).max, dtype=np.int64)
+    last = np.full(group_count, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(first, groups, np.asarray(starts, dtype=np.int64))
+    np.maximum.at(last, groups, np.asarray(ends, dtype=np.int64))
+    return {
+        "count": np.bincount(groups, minlength=group_count).tolist(),
+        "errors": np.bincount(groups, weights=np.asarray(errors, dtype=np.float64), minlength=group_count)
+        .astype(np.int64)
+        .tolist(),
+        "duration": (last - first).tolist(),
+    }
+
+
+def _trace_bounds_python(groups, starts, ends, errors, group_count: int) -> Dict[str, List]:
+    count = [0] * group_count
+    error_count = [0] * group_count
+    first: List[Optional[int]] = [None] * group_count
+    last: List[Optional[int]] = [None] * group_count
+    for group, start, end, error in zip(groups, starts, ends, errors):
+        count[group] += 1
+        error_count[group] += error
+        first[group] = start if first[group] is None else min(first[group], start)
+        last[group] = end if last[group] is None else max(last[group], end)
+    return {
+        "count": count,
+        "errors": error_count,
+        "duration": [end - start for start, end in zip(first, last)],
+    }
+
+
+def _group_index(keys: Iterable[Any]) -> tuple[List[Any], List[int]]:
+    index: Dict[Any, int] = {}
+    groups = [index.setdefault(key, len(index)) for key in keys]
+    return list(index), groups
+
+
+def analyze_traces(
+    logs: Iterable[Dict[str, Any]],
+    trace_ids: Optional[List[str]] = None,
+    top: int = 20,
+    outlier_threshold: float = 3.5,
+    min_samples: int = 5,
+    use_numpy: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """批量分析多个 trace 的 span
+
+    - 按 trace 汇总 span 数、错误数和总耗时
+    - 按服务统计 span 耗时分布（p50/p90/p99/max/mean）和错误数
+    - 按 (服务, spanName) 分组，用稳健 z 分数 (耗时 - 中位数) / (1.4826 * MAD) 识别异常慢的 span，
+      分组样本数少于 min_samples 时不参与判断；MAD 不低于中位数的 10%，避免耗时几乎相同的分组误报
+    - span 先解析为按列存放的数组，安装 NumPy 时对所有 trace 的 span 整体做向量化计算，否则退回纯 Python 实现
+    """
+    np = _load_numpy() if use_numpy is not False else None
+    if use_numpy and np is None:
+        raise ImportError("numpy is required, install with: pip install 'mcp-server-aliyun-observability[analysis]'")
+
+    rows: List[Dict[str, Any]] = []
+    trace_column: List[str] = []
+    service_column: List[str] = []
+    operation_column: List[tuple] = []
+    start_column: List[int] = []
+    end_column: List[int] = []
+    duration_column: List[int] = []
+    error_column: List[bool] = []
+    seen: set = set()
+    for log in logs:
+        trace_id = str(log.get("traceId") or "")
+        key = (trace_id, log.get("spanId"))
+        if key in seen:
+            continue
+        seen.add(key)
+        service = log.get("serviceName") or ""
+        start = _to_nanoseconds(log.get("startTime"))
+        duration = max(int(float(log.get("duration") or 0)), 0)
+        rows.append(log)
+        trace_column.append(trace_id)
+        service_column.append(service)
+        operation_column.append((service, log.get("spanName") or ""))
+        start_column.append(start)
+        end_column.append(start + duration)
+        duration_column.append(duration)
+        error_column.append(str(log.get("statusCode") or "").lower() in _ERROR_STATUS)
+
+    def group_stats(groups: List[int], group_count: int) -> Dict[str, Any]:
+        if np is not None:
+            return _group_stats_numpy(np, groups, duration_column, group_count)
+        return _group_stats_python(groups, duration_column, group_count)
+
+    traces: List[Dict[str, Any]] = []
+    services: List[Dict[str, Any]] = []
+    outliers: List[Dict[str, Any]] = []
+    if rows:
+        trace_names, groups = _group_index(trace_column)
+        if np is not None:
+            bounds = _trace_bounds_numpy(np, groups, start_column, end_column, error_column, len(trace_names))
+        else:
+            bounds = _trace_bounds_python(groups, start_column, end_column, error_column, len(trace_names))
+        for i, trace_id in enumerate(trace_names):
+            traces.append(
+                {
+                    "traceId": trace_id,
+                    "spanCount": bounds["count"][i],
+                    "errorCount": bounds["errors"][i],
+                    "durationMs": _ms(bounds["duration"][i]),
+                }
+            )
+        traces.sort(key=lambda trace: trace["durationMs"], reverse=True)
+
+        service_names, groups = _group_index(service_column)
+        stats = group_stats(groups, len(service_names))
+        errors = [0] * len(service_names)
+        for group, error in zip(groups, error_column):
+            errors[group] += error
+        for i, name in enumerate(service_names):
+            service = {"serviceName": name, "spanCount": int(stats["count"][i]), "errorCount": errors[i]}
+            for field in ("p50", "p90", "p99", "max", "mean"):
+                service[f"{field}Ms"] = _ms(stats[field][i])
+            services.append(service)
+        services.sort(key=lambda service: service["p99Ms"], reverse=True)
+
+        operations, groups = _group_index(operation_column)
+        stats = group_stats(groups, len(operations))
+        if np is not None:
+            candidates = _outliers_numpy(np, groups, duration_column, stats, min_samples, outlier_threshold)
+        else:
+            candidates = _outliers_python(groups, duration_column, stats, min_samples, outlier_threshold)
+        for i, score in candidates:
+            outliers.append(
+                dict(
+                    Span(rows[i]).to_dict(),
+                    traceId=trace_column[i],
+                    medianMs=_ms(stats["median"][groups[i]]),
+                    score=round(score, 2),
+                )
+            )
+        outliers.sort(key=lambda outlier: outlier["score"], reverse=True)
+
+    found = set(trace_column)
+    return {
+        "traceCount": len(traces),
+        "spanCount": len(rows),
+        "missingTraceIds": [trace_id for trace_id in trace_ids or [] if trace_id not in found],
+        "traces": traces,
+        "services": services,
+        "outlierSpans": outliers[:top],
+        "vectorized": np is not None,
+    }
@@ -2,87 +2,43 @@ import hashlib
 import json
 import logging
 import os.path
+import threading
+import uuid
+import weakref
 from datetime import datetime
+from urllib.parse import urlparse
 from functools import wraps
 from pathlib import Path
-from typing import Any, Callable, Optional, TypeVar, cast
-
-from alibabacloud_arms20190808.client import Client as ArmsClient
-from alibabacloud_credentials.client import Client as CredClient
-from alibabacloud_sls20201230.client import Client
-from alibabacloud_sls20201230.client import Client as SLSClient
-from alibabacloud_sls20201230.models import (
-    CallAiToolsRequest,
-    CallAiToolsResponse,
-    IndexJsonKey,
-)
-from alibabacloud_tea_openapi import models as open_api_models
-from alibabacloud_tea_util import models as util_models
+from typing import (TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple,
+                    TypeVar, cast)
+
 from mcp.server.fastmcp import Context
-from Tea.exceptions import TeaException
 
 from mcp_server_aliyun_observability.api_error import TEQ_EXCEPTION_ERROR
+from mcp_server_aliyun_observability.credentials import default_credentials_client
+from mcp_server_aliyun_observability.knowledge import KnowledgeEndpoint
+from mcp_server_aliyun_observability.log_transfer import (
+    TransferStats,
+    get_logs,
+    get_logs_raw,
+    get_logs_with_progress,
+)
+
+# 阿里云 SDK 导入耗时较长，仅用于类型标注时在此导入，运行时在首次使用处导入
+if TYPE_CHECKING:
+    from alibabacloud_arms20190808.client import Client as ArmsClient
+    from alibabacloud_sls20201230.client import Client as SLSClient
+    from alibabacloud_sls20201230.models import (
+        CallAiToolsResponse,
+        GetLogsRequest,
+        IndexJsonKey,
+    )
+    from alibabacloud_tea_openapi import models as open_api_models
+    from alibabacloud_tea_util.models import RuntimeOptions
 
 logger = logging.getLogger(__name__)
 
 
-class KnowledgeEndpoint:
-    """外部知识库配置
-    该类用于加载和管理外部知识库的配置，包括全局/Project/Logstore级别的外部知识库 endpoint 配置。
-    其配置优先级：Logstore > Project default > Global default
-    配置文件示例如下：
-    ```json
-    {
-    "default_endpoint": {"uri": "https://api.default.com", "key": "Bearer dataset-***"},
-    "projects": {
-        "project1": {
-            "default_endpoint": {"uri": "https://api.project1.com", "key": "Bearer dataset-***"},
-            "logstore1": {"uri": "https://api.project1.logstore1.com","key": "Bearer dataset-***"},
-            "logstore2": {"uri": "https://api.project1.logstore2.com","key": "Bearer dataset-***"}
-        },
-        "project2": {
-            "logstore3": {"uri": "https://api.project2.logstore3.com","key": "Bearer dataset-***"}
-        }
-    }
-    ```
-    }
-    """
-    def __init__(self, file_path):
-        try:
-            # 将路径转换为绝对路径，支持用户目录（~）和环境变量（如 $HOME）
-            expanded_path = os.path.expandvars(file_path)
-            self.file_path = Path(expanded_path).expanduser().resolve()
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                self.config = json.load(file)
-                logger.warning(f"已加载外部知识库配置文件 {self.file_path}")
-        except FileNotFoundError:
-            logger.warning(f"外部知识库配置文件 {self.file_path} 不存在")
-        except json.JSONDecodeError as e:
-            logger.warning(f"外部知识库配置 JSON 格式错误: {e}")
-
-        # 全局默认 endpoint
-        self.global_default = self.config.get("default_endpoint", None)
-
-        # 项目配置
-        self.projects = self.config.get("projects", {})
-
-    def get_config(self, project:str, logstore:str) -> str:
-        """获取指定项目和日志仓库的外部知识库 endpoint 配置
-        优先级：logstore > project default > global default
-        :param project: 项目名称
-        :param logstore: 日志仓库名称
-        :return: 外部知识库 endpoint
-        """
-        project_config = self.projects.get(project, None)
-        if project_config is None:
-            return self.global_default
-
-        logstore_config = project_config.get(logstore)
-        if logstore_config is None:
-            return self.project_config.get("default_endpoint", None)
-
-        return logstore_config
-
 class CredentialWrapper:
     """
     A wrapper for aliyun credentials
@@ -91,7 +47,7 @@ class CredentialWrapper:
     access_key_id: str
     access_key_secret: str
     security_token: Optional[str]
-    knowledge_config: KnowledgeEndpoint
+    knowledge_config: Optional[KnowledgeEndpoint]
 
     def __init__(self, access_key_id: str, access_key_secret: str, knowledge_config: str, security_token: Optional[str] = None):
         self.access_key_id = access_key_id
@@ -100,17 +56,61 @@ class CredentialWrapper:
         self.knowledge_config = KnowledgeEndpoint(knowledge_config) if knowledge_config else None
     
     
+# endpoint 以该协议指定时按 HTTP 代理方式访问，见 apply_endpoint
+PROXY_SCHEME = "proxy"
+
+
+def apply_endpoint(
+    config: "open_api_models.Config", endpoint: Optional[str], region: str, default: str
+) -> None:
+    """设置客户端 endpoint，支持通过 endpoint 覆盖默认的公网地址
+
+    - 不指定 endpoint 时使用 default
+    - endpoint 中的 {region} 会被替换为当前 region，如 {region}-intranet.log.aliyuncs.com
+    - endpoint 为 http(s)://host:port 形式时按给定的协议和地址直接访问
+    - endpoint 为 proxy://host:port 形式时（如本地替身服务），以该地址作为 HTTP 代理，请求仍保留 default 对应的 Host；
+      SLS 的 Host 为 {project}.{endpoint}，IP 地址无法携带 project 前缀，需要通过代理方式访问
+    """
+    if not endpoint:
+        config.endpoint = default
+        return
+    endpoint = endpoint.replace("{region}", region or "")
+    if "://" not in endpoint:
+        config.endpoint = endpoint
+        return
+    parsed = urlparse(endpoint)
+    if parsed.scheme == PROXY_SCHEME:
+        config.protocol = "http"
+        config.endpoint = default
+        config.http_proxy = f"http://{parsed.netloc}"
+    else:
+        config.protocol = parsed.scheme
+        config.endpoint = parsed.netloc
+
+
 class SLSClientWrapper:
     """
     A wrapper for aliyun client
     """
 
-    def __init__(self, credential: Optional[CredentialWrapper] = None):
+    def __init__(
+        self,
+        credential: Optional[CredentialWrapper] = None,
+        endpoint: Optional[str] = None,
+        compression: Optional[str] = None,
+    ):
         self.credential = credential
+        self.endpoint = endpoint
+        # 查询日志时请求的响应压缩方式，见 log_transfer.get_logs
+        self.compression = compression
+        self.transfer_stats = TransferStats()
 
     def with_region(
         self, region: str = None, endpoint: Optional[str] = None
-    ) -> SLSClient:
+    ) -> "SLSClient":
+        from alibabacloud_sls20201230.client import Client as SLSClient
+        from alibabacloud_tea_openapi import models as open_api_models
+
         if self.credential:
             config = open_api_models.Config(
                 access_key_id=self.credential.access_key_id,
@@ -119,16 +119,56 @@ class SLSClientWrapper:
             if self.credential.security_token:
                 config.security_token = self.credential.security_token
         else:
-            credentialsClient = CredClient()
+            credentialsClient = default_credentials_client()
             config = open_api_models.Config(credential=credentialsClient)
-        config.endpoint = f"{region}.log.aliyuncs.com"
+        apply_endpoint(
+            config, endpoint or self.endpoint, region, f"{region}.log.aliyuncs.com"
+        )
         return SLSClient(config)
-    
-    def get_knowledge_config(self, project: str, logstore: str) -> str:
+
+    def get_logs(
+        self,
+        sls_client: "SLSClient",
+        project: str,
+        logstore: str,
+        request: "GetLogsRequest",
+        runtime: "RuntimeOptions",
+    ) -> List[Dict[str, Any]]:
+        """按配置的压缩方式查询日志，返回日志列表"""
+        return get_logs(
+            sls_client, project, logstore, request, runtime, self.compression, self.transfer_stats
+        )
+
+    def get_logs_with_progress(
+        self,
+        sls_client: "SLSClient",
+        project: str,
+        logstore: str,
+        request: "GetLogsRequest",
+        runtime: "RuntimeOptions",
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """按配置的压缩方式查询日志，返回日志列表和查询进度"""
+        return get_logs_with_progress(
+            sls_client, project, logstore, request, runtime, self.compression, self.transfer_stats
+        )
+
+    def get_logs_raw(
+        self,
+        sls_client: "SLSClient",
+        project: str,
+        logstore: str,
+        request: "GetLogsRequest",
+        runtime: "RuntimeOptions",
+    ) -> bytes:
+        """按配置的压缩方式查询日志，返回日志列表的原始 JSON 字节"""
+        return get_logs_raw(
+            sls_client, project, logstore, request, runtime, self.compression, self.transfer_stats
+        )
+
+    def get_knowledge_config(self, project: str, logstore: str) -> Optional[dict]:
         if self.credential and self.credential.knowledge_config:
-            res = self.credential.knowledge_config.get_config(project, logstore)
-            if "uri" in res and "key" in res:
-                return res
+            # 配置在加载时已校验，只会返回同时包含 uri 和 key 的 endpoint
+            return self.credential.knowledge_config.get_config(project, logstore)
         return None
 
 
@@ -137,10 +177,18 @@ class ArmsClientWrapper:
     A wrapper for aliyun arms client
     """
 
-    def __init__(self, credential: Optional[CredentialWrapper] = None):
+    def __init__(
+        self,
+        credential: Optional[CredentialWrapper] = None,
+        endpoint: Optional[str] = None,
+    ):
         self.credential = credential
+        self.endpoint = endpoint
+
+    def with_region(self, region: str, endpoint: Optional[str] = None) -> "ArmsClient":
+        from alibabacloud_arms20190808.client import Client as ArmsClient
+        from alibabacloud_tea_openapi import models as open_api_models
 
-    def with_region(self, region: str, endpoint: Optional[str] = None) -> ArmsClient:
         if self.credential:
             config = open_api_models.Config(
                 access_key_id=self.credential.access_key_id,
@@ -149,19 +197,22 @@ class ArmsClientWrapper:
             if self.credential.security_token:
                 config.security_token = self.credential.security_token
         else:
-            credentialsClient = CredClient()
+            credentialsClient = default_credentials_client()
             config = open_api_models.Config(credential=credentialsClient)
-        config.endpoint = endpoint or f"arms.{region}.aliyuncs.com"
+        apply_endpoint(
+            config, endpoint or self.endpoint, region, f"arms.{region}.aliyuncs.com"
+        )
         return ArmsClient(config)
 
 
-def parse_json_keys(json_keys: dict[str, IndexJsonKey]) -> dict[str, dict[str, str]]:
+def parse_json_keys(json_keys: dict[str, "IndexJsonKey"]) -> dict[str, dict[str, str]]:
     result: dict[str, dict[str, str]] = {}
     for key, value in json_keys.items():
         result[key] = {
             "alias": value.alias,
             "sensitive": value.case_sensitive,
             "type": value.type,
+            "doc_value": value.doc_value,
         }
     return result
 
@@ -186,6 +237,30 @@ def get_arms_user_trace_log_store(user_id: int, region: str) -> dict[str, str]:
 
 
 
+_session_keys: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+_session_keys_lock = threading.Lock()
+
+
+def session_key(ctx: Context) -> str:
+    """返回当前 MCP 会话的标识，用于隔离按会话保存的状态
+
+    会话对象的 id 在会话被回收后可能被新会话复用，这里为每个会话生成随机标识，随会话对象一起回收；
+    没有会话（如直接调用工具）时返回空字符串。
+    """
+    session = ctx.request_context.session
+    if session is None:
+        return ""
+    with _session_keys_lock:
+        try:
+            key = _session_keys.get(session)
+            if key is None:
+                key = _session_keys[session] = uuid.uuid4().hex
+        except TypeError:
+            # 不支持弱引用的会话对象（ServerSession 均支持）退回使用对象 id
+            return f"id-{id(session)}"
+        return key
+
+
 def get_current_time() -> str:
     """
     获取当前时间
@@ -240,7 +315,11 @@ def handle_tea_exception(func: Callable[..., T]) -> Callable[..., T]:
     def wrapper(*args, **kwargs) -> T:
         try:
             return func(*args, **kwargs)
-        except TeaException as e:
+        except Exception as e:
+            from Tea.exceptions import TeaException
+
+            if not isinstance(e, TeaException):
+                raise
             for error in TEQ_EXCEPTION_ERROR:
                 if e.code == error["errorCode"]:
                     return cast(
@@ -275,9 +354,12 @@ def handle_tea_exception(func: Callable[..., T]) -> Callable[..., T]:
 def text_to_sql(
     ctx: Context, text: str, project: str, log_store: str, region_id: str
 ) -> dict[str, Any]:
+    from alibabacloud_sls20201230.models import CallAiToolsRequest
+    from alibabacloud_tea_util import models as util_models
+
     try:
         sls_client_wrapper = ctx.request_context.lifespan_context["sls_client"]
-        sls_client: Client = sls_client_wrapper.with_region("cn-shanghai")
+        sls_client: SLSClient = sls_client_wrapper.with_region("cn-shanghai")
         knowledge_config = sls_client_wrapper.get_knowledge_config(project, log_store)
         request: CallAiToolsRequest = CallAiToolsRequest()
         request.tool_name = "text_to_sql"
@@ -293,16 +375,21 @@ def text_to_sql(
         runtime: util_models.RuntimeOptions = util_models.RuntimeOptions()
         runtime.read_timeout = 60000
         runtime.connect_timeout = 60000
-        tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(
-            request=request, headers={}, runtime=runtime
-        )
-        data = tool_response.body
-        if "------answer------\n" in data:
-            data = data.split("------answer------\n")[1]
-        return {
-            "data": data,
-            "requestId": tool_response.headers.get("x-log-requestid", ""),
-        }
+
+        def call_ai_tools() -> dict[str, Any]:
+            tool_response: CallAiToolsResponse = sls_client.call_ai_tools_with_options(
+                request=request, headers={}, runtime=runtime
+            )
+            data = tool_response.body
+            if "------answer------\n" in data:
+                data = data.split("------answer------\n")[1]
+            return {
+                "data": data,
+                "requestId": tool_response.headers.get("x-log-requestid", ""),
+            }
+
+        # 生成的查询可能依赖问题中的当前时间（如"最近一小时"），结果不缓存
+        return call_ai_tools()
     except Exception as e:
         logger.error(f"调用SLS AI工具失败: {str(e)}")
         raise
@@ -0,0 +1,348 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+import uuid
+from multiprocessing.connection import wait as wait_processes
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server_aliyun_observability.logger import log_error, log_info, log_warning
+
+METRICS_PATH = "/metrics"
+# 转发请求携带该请求头，接收方直接在本进程处理，避免循环转发
+FORWARDED_HEADER = b"x-mcp-forwarded-by"
+METRIC_FIELDS = ("pid", "requests", "active", "forwarded", "errors", "sessions")
+_HOP_BY_HOP_HEADERS = {
+    b"connection",
+    b"keep-alive",
+    b"proxy-connection",
+    b"te",
+    b"transfer-encoding",
+    b"upgrade",
+    b"content-length",
+}
+
+
+def worker_session_id(index: int) -> uuid.UUID:
+    """生成会话ID，前 16 位为创建该会话的 worker 序号"""
+    return uuid.UUID(int=(index << 112) | (uuid.uuid4().int & ((1 << 112) - 1)))
+
+
+def session_owner(session_id: Optional[str], workers: int) -> Optional[int]:
+    """从会话ID解析所属的 worker 序号，无法解析时返回 None"""
+    if not session_id or len(session_id) < 4:
+        return None
+    try:
+        index = int(session_id[:4], 16)
+    except ValueError:
+        return None
+    return index if index < workers else None
+
+
+class WorkerMetrics:
+    """各 worker 的计数器，保存在 fork 前创建的共享内存中
+
+    每个 worker 只写自己的一行，任意 worker 都可以读取全部行并汇总。
+    """
+
+    def __init__(self, workers: int, context: Any = multiprocessing):
+        self.workers = workers
+        self._values = context.RawArray("q", workers * len(METRIC_FIELDS))
+
+    def _offset(self, index: int, field: str) -> int:
+        return index * len(METRIC_FIELDS) + METRIC_FIELDS.index(field)
+
+    def incr(self, index: int, field: str, delta: int = 1) -> None:
+        self._values[self._offset(index, field)] += delta
+
+    def set(self, index: int, field: str, value: int) -> None:
+        self._values[self._offset(index, field)] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        workers = []
+        for index in range(self.workers):
+            row = {"worker": index}
+            row.update({field: self._values[self._offset(index, field)] for field in METRIC_FIELDS})
+            workers.append(row)
+        total = {
+            field: sum(row[field] for row in workers) for field in METRIC_FIELDS if field != "pid"
+        }
+        return {"workers": workers, "total": total}
+
+
+class WorkerRouter:
+    """多进程模式下每个 worker 的 ASGI 入口
+
+    - SSE 和有状态的 streamable-http 会话只存在于创建它的 worker 中，请求携带的会话ID
+      （mcp-session-id 请求头或 session_id 查询参数）属于其他 worker 时，通过该 worker 的
+      Unix Socket 转发，响应以流式方式返回
+    - GET /metrics 返回所有 worker 的计数器及汇总
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        index: int,
+        socket_paths: List[str],
+        metrics: WorkerMetrics,
+    ):
+        self.app = app
+        self.index = index
+        self.socket_paths = socket_paths
+        self.metrics = metrics
+        self._clients: Dict[int, Any] = {}
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if scope["path"] == METRICS_PATH:
+            await self._send_metrics(send)
+            return
+        owner = self._owner(scope)
+        if owner is not None and owner != self.index:
+            self.metrics.incr(self.index, "forwarded")
+            await self._forward(owner, scope, receive, send)
+            return
+        await self._handle(scope, receive, send)
+
+    def _owner(self, scope: dict) -> Optional[int]:
+        session_id = None
+        for name, value in scope["headers"]:
+            if name == FORWARDED_HEADER:
+                return None
+            if name == b"mcp-session-id":
+                session_id = value.decode("latin-1")
+        if session_id is None:
+            query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+            session_id = query.get("session_id", [None])[0]
+        return session_owner(session_id, len(self.socket_paths))
+
+    async def _handle(self, scope: dict, receive: Callable, send: Callable) -> None:
+        status = 0
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.metrics.incr(self.index, "requests")
+        self.metrics.incr(self.index, "active")
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.incr(self.index, "active", -1)
+            if status == 0 or status >= 500:
+                self.metrics.incr(self.index, "errors")
+
+    def _client(self, owner: int) -> Any:
+        import httpx
+
+        client = self._clients.get(owner)
+        if client is None:
+            # 会话的 SSE 流可能长期保持，不设置读超时
+            client = httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(uds=self.socket_paths[owner]),
+                timeout=httpx.Timeout(None, connect=5),
+            )
+            self._clients[owner] = client
+        return client
+
+    async def _forward(self, owner: int, scope: dict, receive: Callable, send: Callable) -> None:
+        import httpx
+
+        body = b""
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+
+        raw_path = scope.get("raw_path") or scope["path"].encode()
+        if scope.get("query_string"):
+            raw_path += b"?" + scope["query_string"]
+        headers = [
+            (name, value) for name, value in scope["headers"] if name not in _HOP_BY_HOP_HEADERS
+        ]
+        headers.append((FORWARDED_HEADER, str(self.index).encode()))
+        client = self._client(owner)
+        request = client.build_request(
+            scope["method"],
+            httpx.URL(scheme="http", host="worker", raw_path=raw_path),
+            headers=headers,
+            content=body,
+        )
+        try:
+            response = await client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            log_error(f"转发请求到 worker {owner} 失败: {e}")
+            await send({"type": "http.response.start", "status": 502, "headers": []})
+            await send({"type": "http.response.body", "body": b"worker unavailable"})
+            return
+
+        async def pump() -> None:
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": [
+                        (name, value)
+                        for name, value in response.headers.raw
+                        if name.lower() not in _HOP_BY_HOP_HEADERS
+                    ],
+                }
+            )
+            async for chunk in response.aiter_raw():
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": b""})
+
+        async def wait_disconnect() -> None:
+            while (await receive())["type"] != "http.disconnect":
+                pass
+
+        # 客户端断开时停止转发并关闭到目标 worker 的连接，目标 worker 随之结束对应的流
+        pump_task = asyncio.ensure_future(pump())
+        disconnect_task = asyncio.ensure_future(wait_disconnect())
+        try:
+            await asyncio.wait({pump_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (pump_task, disconnect_task):
+                task.cancel()
+            results = await asyncio.gather(pump_task, disconnect_task, return_exceptions=True)
+            await response.aclose()
+        if isinstance(results[0], Exception):
+            log_warning(f"转发 worker {owner} 的响应失败: {results[0]}")
+
+    async def _send_metrics(self, send: Callable) -> None:
+        body = json.dumps(self.metrics.snapshot()).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"application/json")],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+
+def _install_session_ids(index: int, metrics: WorkerMetrics) -> None:
+    """让 SSE 和 streamable-http 传输生成带有 worker 序号的会话ID"""
+    import mcp.server.sse as sse
+    import mcp.server.streamable_http_manager as streamable_http_manager
+
+    def new_session_id() -> uuid.UUID:
+        metrics.incr(index, "sessions")
+        return worker_session_id(index)
+
+    sse.uuid4 = new_session_id
+    streamable_http_manager.uuid4 = new_session_id
+
+
+def _serve_worker(
+    mcp_server: FastMCP,
+    transport: str,
+    index: int,
+    listener: socket.socket,
+    socket_paths: List[str],
+    metrics: WorkerMetrics,
+) -> None:
+    import uvicorn
+
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    metrics.set(index, "pid", os.getpid())
+    _install_session_ids(index, metrics)
+    app = mcp_server.sse_app() if transport == "sse" else mcp_server.streamable_http_app()
+
+    private = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    if os.path.exists(socket_paths[index]):
+        os.unlink(socket_paths[index])
+    private.bind(socket_paths[index])
+    private.listen(128)
+
+    config = uvicorn.Config(
+        WorkerRouter(app, index, socket_paths, metrics),
+        log_level=mcp_server.settings.log_level.lower(),
+    )
+    uvicorn.Server(config).run(sockets=[listener, private])
+
+
+def run_workers(
+    mcp_server: FastMCP,
+    transport: str,
+    workers: int,
+    restart_interval: float = 1.0,
+) -> None:
+    """以多进程模式运行 HTTP 传输（sse 或 streamable-http）
+
+    主进程监听端口后 fork 出 workers 个 worker 进程，共享同一个监听 Socket，由内核分配连接；
+    会话请求按会话ID转发到创建该会话的 worker（见 WorkerRouter）。
+    worker 异常退出时自动重启，主进程收到 SIGINT/SIGTERM 时停止全部 worker。
+    """
+    if not hasattr(os, "fork") or not hasattr(socket, "AF_UNIX"):
+        raise RuntimeError("multiple workers require fork and unix sockets")
+    if transport not in ("sse", "streamable-http"):
+        raise ValueError(f"multiple workers are not supported for transport {transport}")
+
+    settings = mcp_server.settings
+    listener = socket.create_server((settings.host, settings.port), backlog=2048)
+    runtime_dir = tempfile.mkdtemp(prefix="mcp-workers-")
+    socket_paths = [os.path.join(runtime_dir, f"worker-{index}.sock") for index in range(workers)]
+    context = multiprocessing.get_context("fork")
+    metrics = WorkerMetrics(workers, context)
+
+    def start(index: int) -> Any:
+        process = context.Process(
+            target=_serve_worker,
+            args=(mcp_server, transport, index, listener, socket_paths, metrics),
+            name=f"mcp-worker-{index}",
+        )
+        process.start()
+        return process
+
+    stopping = False
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+
+    previous_handlers = {sig: signal.signal(sig, stop) for sig in (signal.SIGINT, signal.SIGTERM)}
+    processes = [start(index) for index in range(workers)]
+    started_at = [time.monotonic()] * workers
+    log_info(f"started {workers} workers on {settings.host}:{settings.port}, transport {transport}")
+    try:
+        while not stopping:
+            wait_processes([process.sentinel for process in processes], timeout=1)
+            for index, process in enumerate(processes):
+                if stopping or process.is_alive():
+                    continue
+                log_error(f"worker {index} exited with code {process.exitcode}, restarting")
+                # 避免启动即退出的 worker 被频繁重启
+                delay = started_at[index] + restart_interval - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                processes[index] = start(index)
+                started_at[index] = time.monotonic()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(10)
+            if process.is_alive():
+                process.kill()
+        listener.close()
+        shutil.rmtree(runtime_dir, ignore_errors=True)
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
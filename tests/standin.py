@@ -0,0 +1,470 @@
+"""本地 SLS/ARMS 替身服务
+
+用于离线测试和性能基准测试，实现了本项目用到的 SLS OpenAPI 和 ARMS RPC 接口，返回合成数据，
+支持配置延迟、错误注入和数据量。通过 endpoint 覆盖接入：
+
+    python -m tests.standin --port 18080 --latency-ms 50 --error-rate 0.01 --rows 1000
+    python -m mcp_server_aliyun_observability \\
+        --access-key-id fake --access-key-secret fake \\
+        --sls-endpoint proxy://127.0.0.1:18080 --arms-endpoint proxy://127.0.0.1:18080
+
+endpoint 使用 proxy:// 协议，客户端以 HTTP 代理的方式访问替身服务，请求中保留原始 Host（如 {project}.cn-hangzhou.log.aliyuncs.com），
+替身服务据此区分 SLS/ARMS 请求并解析 project。
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import aliyun_log_fastpb
+import lz4.block
+import zstd
+
+
+@dataclass
+class StandinConfig:
+    """替身服务配置"""
+
+    latency_ms: float = 0.0
+    latency_jitter_ms: float = 0.0
+    error_rate: float = 0.0
+    rows: int = 100
+    projects: int = 20
+    logstores: int = 10
+    apps: int = 50
+    shards: int = 2
+    ai_answer: str = "这是替身服务返回的分析结果"
+    ai_chunk_delay_ms: float = 0.0
+    histogram_rows_per_second: int = 1000
+    progress: str = "Complete"
+    seed: int = 42
+
+
+class StandinData:
+    """确定性的合成数据"""
+
+    LEVELS = ["INFO", "WARN", "ERROR", "DEBUG"]
+    SERVICES = ["gateway", "order", "payment", "user", "inventory"]
+
+    def __init__(self, config: StandinConfig):
+        self.config = config
+        self._log_cache: dict[int, list[dict[str, str]]] = {}
+        self._lock = threading.Lock()
+
+    def projects(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "projectName": f"standin-project-{i}",
+                "description": f"standin project {i}",
+                "region": "cn-hangzhou",
+                "status": "Normal",
+            }
+            for i in range(self.config.projects)
+        ]
+
+    def logstores(self) -> list[str]:
+        return [f"standin-logstore-{i}" for i in range(self.config.logstores)]
+
+    def index(self) -> dict[str, Any]:
+        keys = {
+            name: {"type": key_type, "caseSensitive": False, "doc_value": True, "alias": ""}
+            for name, key_type in [
+                ("level", "text"),
+                ("service", "text"),
+                ("status", "long"),
+                ("latency", "double"),
+                ("message", "text"),
+            ]
+        }
+        keys["attributes"] = {
+            "type": "json",
+            "caseSensitive": False,
+            "doc_value": True,
+            "alias": "",
+            "json_keys": {
+                "user_id": {"type": "text", "doc_value": True},
+                "cost": {"type": "double", "doc_value": True},
+            },
+        }
+        # 未开启统计的字段，分析语句引用时查询校验会提示
+        keys["payload"] = {"type": "text", "caseSensitive": False, "doc_value": False, "alias": ""}
+        return {"keys": keys, "line": {"token": [",", " "], "caseSensitive": False}}
+
+    def logs(self, from_ts: int, to_ts: int, count: int) -> list[dict[str, str]]:
+        with self._lock:
+            base = self._log_cache.get(count)
+            if base is None:
+                rng = random.Random(self.config.seed)
+                base = [
+                    {
+                        "level": rng.choice(self.LEVELS),
+                        "service": rng.choice(self.SERVICES),
+                        "status": str(rng.choice([200, 200, 200, 404, 500])),
+                        "latency": f"{rng.uniform(1, 500):.3f}",
+                        "message": f"synthetic log line {i} " + "x" * rng.randint(10, 120),
+                        "__source__": f"10.0.0.{i % 16}",
+                        "__topic__": "",
+                    }
+                    for i in range(count)
+                ]
+                self._log_cache[count] = base
+        span = max(to_ts - from_ts, 1)
+        return [
+            dict(log, __time__=str(from_ts + i * span // max(count, 1)))
+            for i, log in enumerate(base)
+        ]
+
+    def histograms(self, from_ts: int, to_ts: int, rows_per_second: int) -> list[dict[str, Any]]:
+        # 与 SLS 一致，把时间范围等分为最多 60 个区间
+        step = max(1, -(-(to_ts - from_ts) // 60))
+        return [
+            {
+                "from": start,
+                "to": min(start + step, to_ts),
+                "count": (min(start + step, to_ts) - start) * rows_per_second,
+                "progress": "Complete",
+            }
+            for start in range(from_ts, to_ts, step)
+        ]
+
+    def trace_apps(self) -> list[dict[str, Any]]:
+        return [
+            {
+                "AppId": i,
+                "AppName": f"standin-app-{i}",
+                "Pid": f"standin-pid-{i}",
+                "UserId": "1234567890",
+                "Type": "TRACE",
+                "RegionId": "cn-hangzhou",
+                "Language": "java" if i % 2 == 0 else "go",
+                "CreateTime": 1700000000000,
+                "UpdateTime": 1700000000000,
+                "Show": True,
+            }
+            for i in range(self.config.apps)
+        ]
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    server: "StandinServer"
+    protocol_version = "HTTP/1.1"
+    # 响应头和响应体分两次写入，关闭 Nagle 算法避免与客户端的延迟确认叠加出 40ms 的等待
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        self._dispatch()
+
+    def do_POST(self) -> None:
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        length = int(self.headers.get("content-length") or 0)
+        body = self.rfile.read(length) if length else b""
+        target = urlsplit(self.path)
+        host = (target.hostname or self.headers.get("host") or "").split(":")[0]
+        query = {key: values[-1] for key, values in parse_qs(target.query).items()}
+        self.server.stats_request(host, target.path)
+
+        config = self.server.config
+        if config.latency_ms or config.latency_jitter_ms:
+            time.sleep(
+                (config.latency_ms + random.uniform(0, config.latency_jitter_ms)) / 1000
+            )
+        is_arms = host.startswith("arms")
+        if config.error_rate and random.random() < config.error_rate:
+            if is_arms:
+                self._send_json(
+                    500,
+                    {"Code": "InternalError", "Message": "injected error", "RequestId": _request_id()},
+                )
+            else:
+                self._send_json(
+                    500, {"errorCode": "InternalServerError", "errorMessage": "injected error"}
+                )
+            return
+
+        if is_arms:
+            if self.command == "POST" and body:
+                query.update(
+                    {key: values[-1] for key, values in parse_qs(body.decode()).items()}
+                )
+            self._handle_arms(query)
+        else:
+            self._handle_sls(host, target.path, query, body)
+
+    def _handle_arms(self, query: dict[str, str]) -> None:
+        data = self.server.data
+        action = query.get("Action")
+        apps = data.trace_apps()
+        if action == "SearchTraceAppByPage":
+            name = query.get("TraceAppName") or ""
+            matched = [app for app in apps if name in app["AppName"]]
+            page_size = int(query.get("PageSize") or 20)
+            page_number = int(query.get("PageNumber") or 1)
+            offset = (page_number - 1) * page_size
+            self._send_json(
+                200,
+                {
+                    "RequestId": _request_id(),
+                    "PageBean": {
+                        "TotalCount": len(matched),
+                        "PageSize": page_size,
+                        "PageNumber": page_number,
+                        "TraceApps": matched[offset : offset + page_size],
+                    },
+                },
+            )
+        elif action == "GetTraceApp":
+            pid = query.get("Pid")
+            app = next((app for app in apps if app["Pid"] == pid), None)
+            self._send_json(200, {"RequestId": _request_id(), "TraceApp": app})
+        else:
+            self._send_json(
+                404,
+                {"Code": "InvalidAction.NotFound", "Message": f"unknown action {action}", "RequestId": _request_id()},
+            )
+
+    def _handle_sls(self, host: str, path: str, query: dict[str, str], body: bytes) -> None:
+        data = self.server.data
+        parts = [part for part in path.split("/") if part]
+        project = host.split(".")[0] if host.count(".") >= 4 else None
+
+        if path == "/ml/tool/call":
+            answer = f"thinking...\n------answer------\n{self.server.config.ai_answer}"
+            if self.server.config.ai_chunk_delay_ms:
+                self._send_chunked(answer.encode(), self.server.config.ai_chunk_delay_ms / 1000)
+            else:
+                self._send_bytes(200, answer.encode(), "text/plain")
+        elif project is None and not parts:
+            projects = data.projects()
+            name = query.get("projectName") or ""
+            matched = [p for p in projects if name in p["projectName"]]
+            size = int(query.get("size") or 100)
+            self._send_json(
+                200, {"count": min(len(matched), size), "total": len(matched), "projects": matched[:size]}
+            )
+        elif parts == ["logstores"]:
+            name = query.get("logstoreName") or ""
+            matched = [ls for ls in data.logstores() if name in ls]
+            self._send_json(200, {"count": len(matched), "total": len(matched), "logstores": matched})
+        elif len(parts) == 3 and parts[0] == "logstores" and parts[2] == "logs":
+            # GetLogsV2：参数在请求体中，按 Accept-Encoding 压缩响应
+            params = json.loads(body or b"{}")
+            from_ts = int(params.get("from") or 0)
+            to_ts = int(params.get("to") or from_ts + 900)
+            logs = data.logs(from_ts, to_ts, self.server.config.rows)
+            if params.get("offset") is not None:
+                offset = int(params["offset"])
+                logs = logs[offset : offset + int(params.get("line") or 100)]
+            payload = json.dumps(
+                {"meta": {"progress": self.server.config.progress, "count": len(logs)}, "data": logs}
+            ).encode()
+            self._send_compressed(payload, self.headers.get("accept-encoding"))
+        elif len(parts) == 3 and parts[0] == "logstores" and query.get("type") == "histogram":
+            from_ts = int(query.get("from") or 0)
+            to_ts = int(query.get("to") or from_ts + 900)
+            self._send_json(
+                200,
+                data.histograms(from_ts, to_ts, self.server.config.histogram_rows_per_second),
+                headers={"x-log-progress": "Complete"},
+            )
+        elif len(parts) == 3 and parts[0] == "logstores" and parts[2] == "index":
+            self._send_json(200, data.index())
+        elif len(parts) == 3 and parts[0] == "logstores" and parts[2] == "shards":
+            self._send_json(
+                200,
+                [
+                    {"shardID": i, "status": "readwrite", "createTime": 1700000000}
+                    for i in range(self.server.config.shards)
+                ],
+            )
+        elif len(parts) == 4 and parts[0] == "logstores" and parts[2] == "shards":
+            if query.get("type") == "cursor":
+                start = query.get("from") or "end"
+                position = int(time.time()) if not start.isdigit() else int(start)
+                self._send_json(200, {"cursor": f"{parts[3]}:{position}"})
+            else:
+                self._handle_pull_logs(query)
+        elif len(parts) == 2 and parts[0] == "logstores":
+            from_ts = int(query.get("from") or 0)
+            to_ts = int(query.get("to") or from_ts + 900)
+            logs = data.logs(from_ts, to_ts, self.server.config.rows)
+            if "offset" in query:
+                offset = int(query["offset"])
+                logs = logs[offset : offset + int(query.get("line") or 100)]
+            self._send_json(
+                200,
+                logs,
+                headers={"x-log-progress": self.server.config.progress, "x-log-count": str(len(logs))},
+            )
+        else:
+            self._send_json(
+                404, {"errorCode": "ParameterInvalid", "errorMessage": f"unsupported path {path}"}
+            )
+
+    def _handle_pull_logs(self, query: dict[str, str]) -> None:
+        shard, position = query["cursor"].split(":")
+        now = int(time.time())
+        logs = self.server.data.logs(int(position), now, min(int(query.get("count") or 10), 10))
+        groups = b""
+        if int(position) < now:
+            group = aliyun_log_fastpb.serialize_log_group(
+                {
+                    "LogItems": [
+                        {
+                            "Time": int(log["__time__"]),
+                            "Contents": [
+                                {"Key": key, "Value": value}
+                                for key, value in log.items()
+                                if not key.startswith("__")
+                            ],
+                        }
+                        for log in logs
+                    ],
+                    "LogTags": [],
+                    "Topic": "",
+                    "Source": "standin",
+                }
+            )
+            groups = b"\x0a" + _varint(len(group)) + group
+        self._send_bytes(
+            200,
+            groups,
+            "application/x-protobuf",
+            headers={"x-log-cursor": f"{shard}:{now}", "x-log-count": "1" if groups else "0"},
+        )
+
+    def _send_compressed(self, payload: bytes, encoding: Optional[str]) -> None:
+        headers = {"x-log-bodyrawsize": str(len(payload))}
+        if encoding == "lz4":
+            body = lz4.block.compress(payload, store_size=False)
+        elif encoding == "zstd":
+            body = zstd.compress(payload, 1)
+        elif encoding in ("gzip", "deflate"):
+            body = zlib.compress(payload, 6)
+        else:
+            self._send_bytes(200, payload, "application/json")
+            return
+        headers["x-log-compresstype"] = encoding
+        self._send_bytes(200, body, "application/json", headers)
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[dict] = None) -> None:
+        self._send_bytes(status, json.dumps(payload).encode(), "application/json", headers)
+
+    def _send_bytes(
+        self, status: int, payload: bytes, content_type: str, headers: Optional[dict] = None
+    ) -> None:
+        self.send_response(status)
+        self.send_header("content-type", content_type)
+        self.send_header("content-length", str(len(payload)))
+        self.send_header("x-log-requestid", _request_id())
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+    def _send_chunked(self, payload: bytes, delay: float, chunk_size: int = 8) -> None:
+        """以 chunked 编码分段返回，模拟模型逐段输出答案"""
+        self.protocol_version = "HTTP/1.1"
+        self.send_response(200)
+        self.send_header("content-type", "text/plain")
+        self.send_header("transfer-encoding", "chunked")
+        self.send_header("connection", "close")
+        self.send_header("x-log-requestid", _request_id())
+        self.end_headers()
+        self.close_connection = True
+        try:
+            for i in range(0, len(payload), chunk_size):
+                chunk = payload[i : i + chunk_size]
+                self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                self.wfile.flush()
+                time.sleep(delay)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: Optional[StandinConfig] = None):
+        super().__init__(address, StandinHandler)
+        self.config = config or StandinConfig()
+        self.data = StandinData(self.config)
+        self.requests: dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def endpoint(self) -> str:
+        """以 HTTP 代理方式接入替身服务的 endpoint"""
+        host, port = self.server_address[:2]
+        return f"proxy://{host}:{port}"
+
+    def stats_request(self, host: str, path: str) -> None:
+        key = "arms" if host.startswith("arms") else path
+        with self._stats_lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def start(self) -> "StandinServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def start_standin(config: Optional[StandinConfig] = None, port: int = 0) -> StandinServer:
+    """在后台线程中启动替身服务，port 为 0 时自动分配端口"""
+    return StandinServer(("127.0.0.1", port), config).start()
+
+
+def _request_id() -> str:
+    return uuid.uuid4().hex.upper()
+
+
+def _varint(value: int) -> bytes:
+    out = b""
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out += bytes([bits | 0x80])
+        else:
+            return out + bytes([bits])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="local SLS/ARMS stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--apps", type=int, default=50)
+    parser.add_argument("--ai-chunk-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    config = StandinConfig(
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        error_rate=args.error_rate,
+        rows=args.rows,
+        apps=args.apps,
+        ai_chunk_delay_ms=args.ai_chunk_delay_ms,
+    )
+    server = StandinServer((args.host, args.port), config)
+    print(f"stand-in listening on {server.endpoint}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
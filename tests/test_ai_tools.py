@@ -0,0 +1,225 @@
+import asyncio
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+from alibabacloud_sls20201230.models import CallAiToolsRequest
+from alibabacloud_tea_util.models import RuntimeOptions
+from mcp.types import RequestParams
+
+from mcp_server_aliyun_observability.ai_tools import (ANSWER_MARKER,
+                                                      AnswerExtractor,
+                                                      CallAiToolsStream,
+                                                      ai_tools_cache_key,
+                                                      call_ai_tools_streaming)
+from mcp_server_aliyun_observability.toolkit.arms_toolkit import ArmsToolkit
+from mcp_server_aliyun_observability.toolkit.job_toolkit import JobToolkit
+from mcp_server_aliyun_observability.utils import (ArmsClientWrapper,
+                                                   CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+
+def test_cache_key_ignores_current_time(monkeypatch):
+    from mcp_server_aliyun_observability import utils
+
+    def request(now):
+        monkeypatch.setattr(utils, "get_current_time", lambda: {"current_time": now})
+        params = {"project": "p", "sys.query": utils.append_current_time("帮我诊断下 * | select 1")}
+        return CallAiToolsRequest(tool_name="diagnosis_sql", region_id="cn-hangzhou", params=params)
+
+    first, second = request("2024-01-01 00:00:00"), request("2024-01-01 00:00:07")
+    assert first.params != second.params
+    assert ai_tools_cache_key(first) == ai_tools_cache_key(second)
+    assert ai_tools_cache_key(first)[2]["sys.query"] == "帮我诊断下 * | select 1"
+
+
+def _extract(payload: bytes, size: int) -> tuple[list[str], str]:
+    extractor = AnswerExtractor()
+    outputs = [extractor.feed(payload[i : i + size]) for i in range(0, len(payload), size)]
+    outputs.append(extractor.finish())
+    assert "".join(outputs) == extractor.answer
+    return [output for output in outputs if output], extractor.answer
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1024])
+def test_answer_extractor_matches_split(size):
+    for body in (
+        f"思考中...\n{ANSWER_MARKER}答案第一段\n答案第二段 ------",
+        f"思考\n{ANSWER_MARKER}答案{ANSWER_MARKER}后续内容",
+        "没有标记的答案",
+        f"{ANSWER_MARKER}",
+    ):
+        expected = body.split(ANSWER_MARKER)[1] if ANSWER_MARKER in body else body
+        assert _extract(body.encode(), size)[1] == expected
+
+
+def test_answer_extractor_streams_after_marker():
+    outputs, answer = _extract(f"thinking {ANSWER_MARKER}0123456789abcdef".encode(), 4)
+    assert answer == "0123456789abcdef"
+    # 标记之后的内容逐段输出，而不是等到响应结束
+    assert len(outputs) > 2
+
+
+class _ProgressSession:
+    def __init__(self):
+        self.messages = []
+
+    async def send_progress_notification(self, progress_token, progress, total, message, related_request_id):
+        self.messages.append(message)
+
+
+@pytest.mark.asyncio
+async def test_trace_analysis_streams_answer_from_standin():
+    standin = start_standin(StandinConfig(ai_answer="根因是数据库慢查询" * 4, ai_chunk_delay_ms=5))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        ArmsToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        session = _ProgressSession()
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=RequestParams.Meta(progressToken="progress-1"),
+                session=session,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                    "arms_client": ArmsClientWrapper(credential, endpoint=standin.endpoint),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("arms_slow_trace_analysis")
+        result = await tool.run(
+            {"traceId": "t1", "startMs": 1700000000000, "endMs": 1700000900000, "regionId": "cn-hangzhou"},
+            context=context,
+        )
+        assert result == {"data": "根因是数据库慢查询" * 4}
+        assert len(session.messages) > 1
+        assert "".join(session.messages) == result["data"]
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+async def test_streaming_call_is_cancellable():
+    standin = start_standin(StandinConfig(ai_answer="x" * 400, ai_chunk_delay_ms=50))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        ArmsToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                    "arms_client": ArmsClientWrapper(credential, endpoint=standin.endpoint),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("arms_error_trace_analysis")
+        task = asyncio.create_task(
+            tool.run(
+                {"traceId": "t1", "startMs": 1700000000000, "endMs": 1700000900000, "regionId": "cn-hangzhou"},
+                context=context,
+            )
+        )
+        await asyncio.sleep(0.3)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+async def test_trace_analysis_runs_as_job():
+    standin = start_standin(StandinConfig(ai_answer="根因是数据库慢查询" * 4, ai_chunk_delay_ms=5))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        ArmsToolkit(mcp_server)
+        JobToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        session = _ProgressSession()
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=RequestParams.Meta(progressToken="progress-1"),
+                session=session,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                    "arms_client": ArmsClientWrapper(credential, endpoint=standin.endpoint),
+                },
+            )
+        )
+        job = await mcp_server._tool_manager.get_tool("job_submit").run(
+            {
+                "toolName": "arms_slow_trace_analysis",
+                "arguments": {
+                    "traceId": "t1",
+                    "startMs": 1700000000000,
+                    "endMs": 1700000900000,
+                    "regionId": "cn-hangzhou",
+                },
+            },
+            context=context,
+        )
+        # 后台任务的答案记录在任务上，不向提交任务的请求推送
+        assert session.messages == []
+        get_context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id_2", meta=None, session=session, lifespan_context={}
+            )
+        )
+        result = await mcp_server._tool_manager.get_tool("job_get").run(
+            {"jobId": job["jobId"], "waitSeconds": 10}, context=get_context
+        )
+        assert result["status"] == "succeeded"
+        assert result["result"] == {"data": "根因是数据库慢查询" * 4}
+        assert result["progress"]["message"] == result["result"]["data"]
+        assert session.messages == []
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_without_streaming_support(monkeypatch):
+    from darabonba.core import DaraCore
+
+    standin = start_standin(StandinConfig(ai_answer="根因是数据库慢查询" * 4, ai_chunk_delay_ms=5))
+    try:
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        sls_client = SLSClientWrapper(credential, endpoint=standin.endpoint).with_region("cn-hangzhou")
+        assert CallAiToolsStream.supported(sls_client)
+        # 模拟 SDK 升级后流式请求依赖的内部方法被移除
+        monkeypatch.delattr(DaraCore, "do_sse_action")
+        assert not CallAiToolsStream.supported(sls_client)
+
+        session = _ProgressSession()
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=RequestParams.Meta(progressToken="progress-1"),
+                session=session,
+                lifespan_context={},
+            )
+        )
+        request = CallAiToolsRequest(tool_name="trace_analysis", region_id="cn-hangzhou", params={})
+        result = await call_ai_tools_streaming(context, sls_client, request, RuntimeOptions())
+        assert result["data"] == "根因是数据库慢查询" * 4
+        assert session.messages == [result["data"]]
+    finally:
+        standin.shutdown()
+        standin.server_close()
@@ -0,0 +1,135 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from mcp_server_aliyun_observability.arms_apps import (ArmsAppIndex,
+                                                       ArmsAppMetadataCache)
+from mcp_server_aliyun_observability.utils import get_arms_user_trace_log_store
+
+
+class FakeArmsClient:
+    """按 pid 返回预置应用的ARMS客户端"""
+
+    def __init__(self, apps):
+        self.apps = apps
+        self.calls = 0
+        self.fail = False
+
+    def with_region(self, region_id):
+        return self
+
+    def get_trace_app(self, request):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("rpc failed")
+        app = self.apps.get(request.pid)
+        return SimpleNamespace(body=SimpleNamespace(trace_app=app))
+
+    def search_trace_app_by_page(self, request):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("rpc failed")
+        apps = list(self.apps.values())
+        offset = (request.page_number - 1) * request.page_size
+        return SimpleNamespace(
+            body=SimpleNamespace(
+                page_bean=SimpleNamespace(
+                    total_count=len(apps), trace_apps=apps[offset : offset + request.page_size]
+                )
+            )
+        )
+
+
+def _trace_app(pid, app_name, update_time=1):
+    return SimpleNamespace(
+        pid=pid, app_name=app_name, user_id="123", type="TRACE", update_time=update_time
+    )
+
+
+def test_metadata_cache_positive_and_negative():
+    now = [0.0]
+    app = SimpleNamespace(
+        pid="pid-1", app_name="order", language="java", user_id="123", region_id="cn-hangzhou"
+    )
+    client = FakeArmsClient({"pid-1": app})
+    cache = ArmsAppMetadataCache(ttl=600, negative_ttl=60, clock=lambda: now[0])
+
+    metadata = cache.get(client, "pid-1", "cn-hangzhou")
+    assert metadata["app_name"] == "order"
+    assert metadata["project"] == get_arms_user_trace_log_store("123", "cn-hangzhou")["project"]
+    metadata["app_name"] = "changed"
+    assert cache.get(client, "pid-1", "cn-hangzhou")["app_name"] == "order"
+    assert client.calls == 1
+
+    assert cache.get(client, "missing", "cn-hangzhou") is None
+    assert cache.get(client, "missing", "cn-hangzhou") is None
+    assert client.calls == 2
+    now[0] = 61
+    assert cache.get(client, "missing", "cn-hangzhou") is None
+    assert client.calls == 3
+
+    client.fail = True
+    with pytest.raises(RuntimeError):
+        cache.get(client, "pid-2", "cn-hangzhou")
+    with pytest.raises(RuntimeError):
+        cache.get(client, "pid-2", "cn-hangzhou")
+    assert client.calls == 5
+
+
+def test_app_index_search_and_incremental_sync():
+    names = ["order-service", "order", "payment-order", "user-center", "ordre-service"]
+    client = FakeArmsClient({f"pid-{i}": _trace_app(f"pid-{i}", name) for i, name in enumerate(names)})
+    index = ArmsAppIndex(page_size=2)
+
+    assert not index.is_ready("cn-hangzhou")
+    assert index.sync(client, "cn-hangzhou") == {"added": 5, "updated": 0, "removed": 0}
+    assert client.calls == 3
+    assert index.is_ready("cn-hangzhou")
+
+    result = index.search("cn-hangzhou", "Order")
+    # 完全匹配、前缀、子串在前，拼写相近的 ordre-service 作为模糊匹配排在最后
+    assert [app["app_name"] for app in result["trace_apps"]] == [
+        "order",
+        "order-service",
+        "payment-order",
+        "ordre-service",
+    ]
+    page = index.search("cn-hangzhou", "order", page_size=2, page_number=2)
+    assert page["total"] == 4
+    assert [app["pid"] for app in page["trace_apps"]] == ["pid-2", "pid-4"]
+    assert index.search("cn-hangzhou", "er")["total"] == 5
+
+    del client.apps["pid-3"]
+    client.apps["pid-1"] = _trace_app("pid-1", "order-v2", update_time=2)
+    client.apps["pid-5"] = _trace_app("pid-5", "inventory")
+    assert index.sync(client, "cn-hangzhou") == {"added": 1, "updated": 1, "removed": 1}
+    assert index.search("cn-hangzhou", "user-center")["total"] == 0
+    assert index.search("cn-hangzhou", "order-v2")["trace_apps"][0]["pid"] == "pid-1"
+    assert index.search("cn-hangzhou", "invent")["trace_apps"][0]["pid"] == "pid-5"
+
+
+def test_app_index_backs_off_after_failed_sync():
+    """同步失败后在 retry_interval 内不再发起同步"""
+    now = [0.0]
+    client = FakeArmsClient({"pid-0": _trace_app("pid-0", "order")})
+    client.fail = True
+    index = ArmsAppIndex(retry_interval=60, clock=lambda: now[0])
+
+    def ensure_synced():
+        index.ensure_synced(client, "cn-hangzhou")
+        for thread in threading.enumerate():
+            if thread.name == "arms-app-index-cn-hangzhou":
+                thread.join()
+
+    ensure_synced()
+    assert client.calls == 1
+    now[0] += 30
+    ensure_synced()
+    assert client.calls == 1
+
+    client.fail = False
+    now[0] += 31
+    ensure_synced()
+    assert client.calls == 2
+    assert index.is_ready("cn-hangzhou")
@@ -113,3 +113,62 @@ async def test_cms_execute_promql_query_success(
     # item = text["data"][0]
     # assert item["total"] is not None
     # assert text["message"] == "success"
+
+
+def test_promql_frontend_reuses_completed_intervals():
+    """测试PromQL范围查询前端只查询未缓存的时间片"""
+    from mcp_server_aliyun_observability.toolkit.cms_toolkit import PromQLQueryFrontend
+
+    base = 472222 * 3600
+    now = [base + 10 * 3600 + 1800]
+    calls = []
+
+    def execute(start, end):
+        calls.append((start, end))
+        return [
+            {
+                "__labels__": '{"job":"api"}',
+                "__ts__": str([ts * 1000 for ts in range(start, end + 1, 60)]),
+                "__value__": str([1.0 for _ in range(start, end + 1, 60)]),
+            }
+        ]
+
+    frontend = PromQLQueryFrontend(max_freshness=0, clock=lambda: now[0])
+    first = frontend.query(execute, ("key",), base + 7 * 3600 + 1810, now[0], 60)
+    assert first["intervals"] == {"total": 4, "cached": 0, "queried": 4}
+    series = first["data"][0]
+    assert series["labels"] == {"job": "api"}
+    assert series["timestamps"][0] == (base + 7 * 3600 + 1800) * 1000
+    assert series["timestamps"][-1] == now[0] * 1000
+    assert len(series["timestamps"]) == len(set(series["timestamps"]))
+
+    calls.clear()
+    now[0] += 600
+    second = frontend.query(execute, ("key",), base + 7 * 3600 + 2410, now[0], 60)
+    assert second["intervals"] == {"total": 4, "cached": 3, "queried": 1}
+    assert calls == [(base + 10 * 3600, now[0])]
+
+
+def test_promql_frontend_splits_on_step_grid():
+    """测试 step 不能整除拆分间隔时，各时间片的采样点与不拆分的查询一致"""
+    from mcp_server_aliyun_observability.toolkit.cms_toolkit import PromQLQueryFrontend
+
+    def execute(start, end):
+        # 与 Prometheus 一致，从 start 开始每 step 一个采样点
+        return [
+            {
+                "__labels__": '{"job":"api"}',
+                "__ts__": str([ts * 1000 for ts in range(start, end + 1, step)]),
+                "__value__": str([1.0 for _ in range(start, end + 1, step)]),
+            }
+        ]
+
+    for step in (420, 7200):
+        frontend = PromQLQueryFrontend(max_freshness=0, clock=lambda: 4_000_000_000)
+        from_ts, to_ts = 1_700_000_000, 1_700_000_000 + 20 * 3600
+        start, end = frontend.align(from_ts, to_ts, step)
+        assert all(interval_start % step == 0 for interval_start, _ in frontend.split(start, end, step))
+        result = frontend.query(execute, ("key",), from_ts, to_ts, step)
+        assert result["intervals"]["total"] > 1
+        expected = [ts * 1000 for ts in range(start, end + 1, step)]
+        assert result["data"][0]["timestamps"] == expected
@@ -0,0 +1,164 @@
+import multiprocessing
+import threading
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.disk_cache import DiskCache
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_and_lru_byte_bound(tmp_path):
+    clock = FakeClock()
+    # 每个值序列化后约 1000 字节，最多容纳 3 个
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"), max_bytes=3500, clock=clock)
+    value = "x" * 998
+
+    cache.set("GetLogs", "a", value)
+    cache.set("GetLogs", "short", value, ttl=10)
+    assert cache.get("GetLogs", "short") == value
+    clock.now += 11
+    assert cache.get("GetLogs", "short") is None
+
+    clock.now += 10
+    cache.set("GetLogs", "b", value)
+    clock.now += 10
+    cache.set("GetLogs", "c", value)
+    clock.now += 10
+    # 访问 a 后，b 成为最久未访问的条目
+    assert cache.get("GetLogs", "a") == value
+    clock.now += 10
+    cache.set("GetLogs", "d", value)
+    assert cache.get("GetLogs", "b") is None
+    assert [cache.get("GetLogs", key) for key in "acd"] == [value] * 3
+    assert cache.total_bytes() == 3000
+    # 不同 namespace 互不影响，超过上限的值不写入
+    assert cache.get("GetIndex", "a") is None
+    cache.set("GetLogs", "huge", "x" * 4000)
+    assert cache.get("GetLogs", "huge") is None
+
+
+def test_sqlite_errors_are_treated_as_misses(tmp_path):
+    cache = DiskCache(str(tmp_path / "cache.sqlite3"))
+    cache.set("GetLogs", "a", 1)
+    threads = [
+        threading.Thread(target=lambda: [cache.get("GetLogs", key) for key in ("a", "b") * 100])
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (cache.hits, cache.misses) == (400, 400)
+
+    # 数据库文件损坏时所有操作都记录告警并返回默认值，不抛出异常
+    broken = DiskCache(str(tmp_path / "broken.sqlite3"))
+    for path in tmp_path.glob("broken.sqlite3*"):
+        path.write_bytes(b"not a database" * 1000)
+    assert broken.get("GetLogs", "a") is None
+    broken.set("GetLogs", "a", 1)
+    broken.clear()
+    assert broken.total_bytes() == 0
+    assert len(broken) == 0
+    assert broken.misses == 1
+
+
+def _write_entries(path: str, worker: int, max_bytes: int) -> None:
+    cache = DiskCache(path, max_bytes=max_bytes)
+    for i in range(50):
+        cache.set("GetLogs", [worker, i], {"worker": worker, "i": i, "pad": "x" * 200})
+
+
+def _run_workers(path: str, max_bytes: int) -> None:
+    processes = [
+        multiprocessing.get_context("spawn").Process(
+            target=_write_entries, args=(path, worker, max_bytes)
+        )
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+@pytest.mark.parametrize("max_bytes", [1_000_000, 20_000])
+def test_shared_across_processes(tmp_path, max_bytes):
+    path = str(tmp_path / "cache.sqlite3")
+    _run_workers(path, max_bytes)
+
+    cache = DiskCache(path, max_bytes=max_bytes)
+    # 多个进程并发写入后，触发器维护的总字节数仍与实际一致
+    total = cache._connect().execute("SELECT SUM(size) FROM entries").fetchone()[0]
+    assert 0 < cache.total_bytes() == total <= max_bytes
+    found = [
+        cache.get("GetLogs", [worker, i]) for worker in range(4) for i in range(50)
+    ]
+    if max_bytes == 1_000_000:
+        # 容量足够时没有丢失任何写入
+        assert [item["i"] for item in found] == list(range(50)) * 4
+    else:
+        assert len([item for item in found if item]) == len(cache)
+
+
+@pytest.mark.asyncio
+async def test_tools_served_from_cache_after_restart(tmp_path):
+    standin = start_standin(StandinConfig(rows=20))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        SLSToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+
+        async def call_tools():
+            context = Context(
+                request_context=RequestContext(
+                    request_id="test_request_id",
+                    meta=None,
+                    session=None,
+                    lifespan_context={
+                        "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                        # 每次调用使用新的缓存实例，模拟进程重启
+                        "result_cache": DiskCache(str(tmp_path / "results.sqlite3")),
+                    },
+                )
+            )
+            index = await mcp_server._tool_manager.get_tool("sls_describe_logstore").run(
+                {"project": "standin-project-0", "logStore": "standin-logstore-0", "regionId": "cn-hangzhou"},
+                context=context,
+            )
+            logs = await mcp_server._tool_manager.get_tool("sls_execute_sql_query").run(
+                {
+                    "project": "standin-project-0",
+                    "logStore": "standin-logstore-0",
+                    "query": "*",
+                    "fromTimestampInSeconds": 1700000000,
+                    "toTimestampInSeconds": 1700000900,
+                    "limit": 10,
+                    "regionId": "cn-hangzhou",
+                },
+                context=context,
+            )
+            return index, logs
+
+        first = await call_tools()
+        requests = sum(standin.requests.values())
+        assert await call_tools() == first
+        assert sum(standin.requests.values()) == requests
+    finally:
+        standin.shutdown()
+        standin.server_close()
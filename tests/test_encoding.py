@@ -0,0 +1,95 @@
+import json
+from datetime import datetime
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from mcp_server_aliyun_observability.encoding import ResultEncoder
+from mcp_server_aliyun_observability.server import create_lifespan
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import CredentialWrapper
+from tests.standin import StandinConfig, start_standin
+
+RESULT = {
+    "projects": [{"project_name": f"项目-{i}", "region_id": "cn-hangzhou", "count": i} for i in range(3)],
+    "message": "success",
+}
+
+
+def _server() -> FastMCP:
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+
+    @mcp_server.tool()
+    def projects() -> dict:
+        return RESULT
+
+    @mcp_server.tool()
+    def timestamped() -> dict:
+        return {"time": datetime(2024, 1, 1)}
+
+    @mcp_server.tool()
+    def plain() -> dict:
+        return "没有找到应用信息"
+
+    return mcp_server
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("name", ["pydantic", "orjson", "msgspec"])
+async def test_encoded_results_match_default(name):
+    pytest.importorskip(name)
+    default, encoded = _server(), _server()
+    ResultEncoder(name).install(encoded)
+    async with create_connected_server_and_client_session(
+        default._mcp_server
+    ) as default_client, create_connected_server_and_client_session(encoded._mcp_server) as client:
+        for tool in ("projects", "timestamped", "plain"):
+            expected = (await default_client.call_tool(tool, {})).content[0].text
+            text = (await client.call_tool(tool, {})).content[0].text
+            if tool == "plain":
+                assert text == expected
+            else:
+                assert json.loads(text) == json.loads(expected)
+                assert len(text) < len(expected)
+
+
+@pytest.mark.asyncio
+async def test_cacheable_tool_reuses_encoded_text():
+    standin = start_standin(StandinConfig())
+    try:
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        mcp_server = FastMCP(
+            name="mcp_aliyun_observability_server",
+            lifespan=create_lifespan(credential, sls_endpoint=standin.endpoint),
+        )
+        SLSToolkit(mcp_server)
+        encoder = ResultEncoder("pydantic").install(mcp_server)
+        args = {"project": "standin-project-0", "logStore": "standin-logstore-0", "regionId": "cn-hangzhou"}
+        async with create_connected_server_and_client_session(mcp_server._mcp_server) as client:
+            first = (await client.call_tool("sls_describe_logstore", args)).content[0].text
+            second = (await client.call_tool("sls_describe_logstore", args)).content[0].text
+        assert first == second
+        assert json.loads(first)
+        assert encoder.memo_hits == 1
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+async def test_encoder_skips_install_without_mcp_internals():
+    mcp_server = _server()
+    tool_manager = mcp_server._tool_manager
+    default_call_tool = tool_manager.call_tool
+
+    async def call_tool(name, arguments, context=None):
+        return await default_call_tool(name, arguments, context=context, convert_result=True)
+
+    tool_manager.call_tool = call_tool
+    assert not ResultEncoder.supported(mcp_server)
+    ResultEncoder("pydantic").install(mcp_server)
+    assert tool_manager.call_tool is call_tool
+    assert ResultEncoder.supported(_server())
@@ -0,0 +1,200 @@
+import asyncio
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.export import (ArrowExporter,
+                                                    index_field_types,
+                                                    paged_queries)
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_paged_queries():
+    assert list(paged_queries("error", 250)) == [("error", 0, 100), ("error", 100, 100), ("error", 200, 50)]
+    assert list(paged_queries("* | select status, count(*) group by status limit 10", 500)) == [
+        ("* | select status, count(*) group by status limit 10", 0, 500)
+    ]
+    # 分析语句不按 offset 分页，只执行一次
+    assert list(paged_queries("* | select status", 15000)) == [("* | select status limit 15000", 0, 15000)]
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_exporter_writes_typed_columns(tmp_path, file_format):
+    field_types = index_field_types(
+        {"status": {"type": "long"}, "latency": {"type": "double"}, "message": {"type": "text"}}
+    )
+    pages = [
+        [{"__time__": "1700000000", "status": "200", "latency": "1.5", "message": "ok"}],
+        [{"__time__": "1700000001", "status": "-", "latency": "", "message": "bad", "extra": "x"}],
+    ]
+    result = ArrowExporter(str(tmp_path), file_format).export(iter(pages), field_types, "p/ls")
+    assert result["rows"] == 2
+    assert result["droppedColumns"] == ["extra"]
+    assert result["bytes"] > 0
+    assert [path.name for path in tmp_path.iterdir()] == [result["path"].rsplit("/", 1)[1]]
+    if file_format == "parquet":
+        table = pq.read_table(result["path"])
+    else:
+        table = pa.ipc.open_file(result["path"]).read_all()
+    assert table.column_names == ["__time__", "status", "latency", "message"]
+    assert table.schema.field("status").type == pa.int64()
+    assert table.column("status").to_pylist() == [200, None]
+    assert table.column("latency").to_pylist() == [1.5, None]
+
+
+def test_exporter_removes_partial_file(tmp_path):
+    def pages():
+        yield [{"message": "ok"}]
+        raise RuntimeError("GetLogs failed")
+
+    with pytest.raises(RuntimeError):
+        ArrowExporter(str(tmp_path)).export(pages(), {}, "p-ls")
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_export_tool_pages_get_logs(tmp_path):
+    standin = start_standin(StandinConfig(rows=250))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        SLSToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        lifespan_context = {"sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint)}
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id", meta=None, session=None, lifespan_context=lifespan_context
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("sls_export_query_results")
+        arguments = {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "query": "*",
+            "fromTimestampInSeconds": 1700000000,
+            "toTimestampInSeconds": 1700000900,
+            "regionId": "cn-hangzhou",
+        }
+        result = await tool.run(arguments, context=context)
+        assert "solution" in result
+
+        lifespan_context["export_dir"] = str(tmp_path)
+        result = await tool.run(arguments, context=context)
+        assert result["rows"] == 250
+        assert result["truncated"] is False
+        assert result["incomplete"] is False
+        assert standin.requests["/logstores/standin-logstore-0"] == 3
+        table = pq.read_table(result["path"])
+        assert table.num_rows == 250
+        assert table.schema.field("status").type == pa.int64()
+        assert table.schema.field("latency").type == pa.float64()
+        # 检索语句的导出文件包含索引中的全部字段
+        assert "attributes" in table.column_names
+
+        result = await tool.run(dict(arguments, maxRows=120, fileFormat="arrow"), context=context)
+        assert result["rows"] == 120
+        assert result["truncated"] is True
+        assert result["path"].endswith(".arrow")
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("compression", [None, "lz4"])
+async def test_export_tool_reports_incomplete_progress(tmp_path, compression):
+    standin = start_standin(StandinConfig(rows=250, progress="Incomplete"))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        SLSToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(
+                        credential, endpoint=standin.endpoint, compression=compression
+                    ),
+                    "export_dir": str(tmp_path),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("sls_export_query_results")
+        result = await tool.run(
+            {
+                "project": "standin-project-0",
+                "logStore": "standin-logstore-0",
+                "query": "* | select status",
+                "fromTimestampInSeconds": 1700000000,
+                "toTimestampInSeconds": 1700000900,
+                "regionId": "cn-hangzhou",
+            },
+            context=context,
+        )
+        assert result["rows"] == 250
+        assert result["incomplete"] is True
+        assert result["message"] != "success"
+        # 分析语句只执行一次
+        get_logs_path = "/logstores/standin-logstore-0/logs" if compression else "/logstores/standin-logstore-0"
+        assert standin.requests[get_logs_path] == 1
+    finally:
+        standin.shutdown()
+        standin.server_close()
+
+
+@pytest.mark.asyncio
+async def test_export_tool_does_not_block_event_loop(tmp_path):
+    standin = start_standin(StandinConfig(rows=250, latency_ms=100))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        SLSToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                    "export_dir": str(tmp_path),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("sls_export_query_results")
+        export = asyncio.create_task(
+            tool.run(
+                {
+                    "project": "standin-project-0",
+                    "logStore": "standin-logstore-0",
+                    "query": "*",
+                    "fromTimestampInSeconds": 1700000000,
+                    "toTimestampInSeconds": 1700000900,
+                    "regionId": "cn-hangzhou",
+                },
+                context=context,
+            )
+        )
+        ticks = 0
+        while not export.done():
+            await asyncio.sleep(0.01)
+            ticks += 1
+        assert (await export)["rows"] == 250
+        # 导出期间（至少 4 次请求，每次 100ms）事件循环仍在调度其他任务
+        assert ticks >= 10
+    finally:
+        standin.shutdown()
+        standin.server_close()
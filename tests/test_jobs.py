@@ -0,0 +1,154 @@
+import asyncio
+import threading
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.jobs import JobManager
+from mcp_server_aliyun_observability.toolkit.job_toolkit import JobToolkit
+
+
+@pytest.mark.asyncio
+async def test_job_manager_lifecycle():
+    manager = JobManager(max_workers=1, max_jobs=3)
+    release = threading.Event()
+
+    first = manager.submit("s1", "slow", lambda: release.wait(5) and {"answer": 42})
+    second = manager.submit("s1", "queued", lambda: "never")
+    failing = manager.submit("s1", "failing", lambda: 1 / 0)
+    assert first["status"] in ("pending", "running")
+    with pytest.raises(RuntimeError, match="too many unfinished jobs"):
+        manager.submit("s1", "rejected", lambda: None)
+
+    # 其他会话无法查询或取消
+    assert manager.get("s2", first["jobId"]) is None
+    assert manager.cancel("s2", second["jobId"]) is None
+    assert manager.cancel("s1", second["jobId"])["status"] == "cancelled"
+
+    assert (await manager.wait("s1", first["jobId"], timeout=0.2, poll_interval=0.05))["status"] == "running"
+    release.set()
+    result = await manager.wait("s1", first["jobId"], timeout=5, poll_interval=0.05)
+    assert result["status"] == "succeeded"
+    assert result["result"] == {"answer": 42}
+    error = await manager.wait("s1", failing["jobId"], timeout=5, poll_interval=0.05)
+    assert error["status"] == "failed"
+    assert "division by zero" in error["error"]
+
+    # 任务数已满时淘汰最早结束的任务
+    manager.submit("s1", "next", lambda: None)
+    assert manager.get("s1", first["jobId"]) is None
+    manager.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_job_toolkit_runs_tool_in_background():
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    release = threading.Event()
+
+    @mcp_server.tool()
+    def sls_diagnose_query(ctx: Context, query: str) -> dict:
+        release.wait(5)
+        return {"query": query, "region": ctx.request_context.lifespan_context["region"]}
+
+    JobToolkit(mcp_server)
+    context = Context(
+        request_context=RequestContext(
+            request_id="test_request_id",
+            meta=None,
+            session=object(),
+            lifespan_context={"region": "cn-hangzhou"},
+        )
+    )
+    submit = mcp_server._tool_manager.get_tool("job_submit")
+    get = mcp_server._tool_manager.get_tool("job_get")
+
+    with pytest.raises(Exception, match="can not run as a job"):
+        await submit.run({"toolName": "sls_list_projects", "arguments": {}}, context=context)
+    with pytest.raises(Exception, match="validation error"):
+        await submit.run({"toolName": "sls_diagnose_query", "arguments": {}}, context=context)
+
+    job = await submit.run(
+        {"toolName": "sls_diagnose_query", "arguments": {"query": "* | select 1"}}, context=context
+    )
+    assert (await get.run({"jobId": job["jobId"]}, context=context))["status"] in ("pending", "running")
+    release.set()
+    result = await get.run({"jobId": job["jobId"], "waitSeconds": 5}, context=context)
+    assert result["status"] == "succeeded"
+    assert result["result"] == {"query": "* | select 1", "region": "cn-hangzhou"}
+
+
+@pytest.mark.asyncio
+async def test_job_runs_with_detached_context():
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    release = threading.Event()
+
+    @mcp_server.tool()
+    async def sls_diagnose_query(ctx: Context, query: str) -> dict:
+        await ctx.report_progress(1, 2, "half")
+        release.wait(5)
+        return {"session": ctx.request_context.session, "region": ctx.request_context.lifespan_context["region"]}
+
+    JobToolkit(mcp_server)
+    context = Context(
+        request_context=RequestContext(
+            request_id="test_request_id",
+            meta=None,
+            session=object(),
+            lifespan_context={"region": "cn-hangzhou"},
+        )
+    )
+    submit = mcp_server._tool_manager.get_tool("job_submit")
+    get = mcp_server._tool_manager.get_tool("job_get")
+
+    job = await submit.run({"toolName": "sls_diagnose_query", "arguments": {"query": "*"}}, context=context)
+    for _ in range(50):
+        snapshot = await get.run({"jobId": job["jobId"]}, context=context)
+        if "progress" in snapshot:
+            break
+        await asyncio.sleep(0.05)
+    assert snapshot["progress"] == {"progress": 1, "total": 2, "message": "half"}
+    release.set()
+    result = await get.run({"jobId": job["jobId"], "waitSeconds": 5}, context=context)
+    # 任务中的工具不持有提交请求的会话
+    assert result["result"] == {"session": None, "region": "cn-hangzhou"}
+    assert result["progress"]["message"] == "half"
+
+
+@pytest.mark.asyncio
+async def test_job_get_notifies_only_new_progress(monkeypatch):
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    release = threading.Event()
+
+    @mcp_server.tool()
+    async def sls_diagnose_query(ctx: Context, query: str) -> dict:
+        await ctx.report_progress(1000, None, "a" * 1000)
+        release.wait(5)
+        return {}
+
+    JobToolkit(mcp_server)
+    notifications = []
+
+    async def report_progress(self, progress, total=None, message=None):
+        notifications.append(message)
+
+    monkeypatch.setattr(Context, "report_progress", report_progress)
+    context = Context(
+        request_context=RequestContext(
+            request_id="test_request_id", meta=None, session=object(), lifespan_context={}
+        )
+    )
+    submit = mcp_server._tool_manager.get_tool("job_submit")
+    get = mcp_server._tool_manager.get_tool("job_get")
+
+    job = await submit.run({"toolName": "sls_diagnose_query", "arguments": {"query": "*"}}, context=context)
+    for _ in range(50):
+        if "progress" in await get.run({"jobId": job["jobId"]}, context=context):
+            break
+        await asyncio.sleep(0.05)
+    snapshot = await get.run({"jobId": job["jobId"], "waitSeconds": 1}, context=context)
+    release.set()
+    # 完整答案只在 job_get 的返回值中，通知中只有状态和截断后的新增内容，之后没有新增内容时只有状态
+    assert snapshot["progress"]["message"] == "a" * 1000
+    assert notifications[0] == "job running, progress 1000: " + "a" * 200
+    assert notifications[1:] and all(n == "job running, progress 1000" for n in notifications[1:])
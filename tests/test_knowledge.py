@@ -0,0 +1,91 @@
+import json
+import os
+
+from mcp_server_aliyun_observability.knowledge import KnowledgeEndpoint
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+
+
+def _endpoint(name):
+    return {"uri": f"https://{name}.example.com", "key": f"Bearer {name}"}
+
+
+CONFIG = {
+    "default_endpoint": _endpoint("global"),
+    "projects": {
+        "project1": {
+            "default_endpoint": _endpoint("project1"),
+            "logstore1": _endpoint("logstore1"),
+            "logstore2": {"uri": "https://missing-key.example.com"},
+        },
+        "project2": {"logstore3": _endpoint("logstore3")},
+    },
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _write(path, content, mtime):
+    path.write_text(content if isinstance(content, str) else json.dumps(content))
+    os.utime(path, ns=(mtime, mtime))
+
+
+def test_resolution_priority(tmp_path):
+    path = tmp_path / "knowledge.json"
+    _write(path, CONFIG, 1_000_000_000)
+    knowledge = KnowledgeEndpoint(str(path))
+
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("logstore1")
+    assert knowledge.get_config("project1", "other") == _endpoint("project1")
+    # 缺少 key 的配置视为未配置
+    assert knowledge.get_config("project1", "logstore2") is None
+    assert knowledge.get_config("project2", "logstore3") == _endpoint("logstore3")
+    assert knowledge.get_config("project2", "other") is None
+    assert knowledge.get_config("project3", "logstore1") == _endpoint("global")
+
+
+def test_hot_reload_and_invalid_file(tmp_path):
+    path = tmp_path / "knowledge.json"
+    _write(path, CONFIG, 1_000_000_000)
+    clock = FakeClock()
+    knowledge = KnowledgeEndpoint(str(path), poll_interval=5, clock=clock)
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("logstore1")
+
+    updated = {"projects": {"project1": {"logstore1": _endpoint("updated")}}}
+    _write(path, updated, 2_000_000_000)
+    # 未到检查间隔时继续使用当前配置
+    clock.now = 1
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("logstore1")
+    clock.now = 6
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("updated")
+    assert knowledge.get_config("project3", "logstore1") is None
+    assert knowledge.reloads == 2
+
+    # 格式错误的配置不生效，也不会重复解析
+    _write(path, "{broken", 3_000_000_000)
+    clock.now = 12
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("updated")
+    clock.now = 18
+    assert knowledge.get_config("project1", "logstore1") == _endpoint("updated")
+    assert knowledge.reloads == 2
+
+    # 文件删除后清空配置，重新创建后再次加载
+    path.unlink()
+    clock.now = 24
+    assert knowledge.get_config("project1", "logstore1") is None
+    _write(path, CONFIG, 4_000_000_000)
+    clock.now = 30
+    assert knowledge.get_config("project1", "other") == _endpoint("project1")
+
+
+def test_missing_file_at_startup(tmp_path):
+    wrapper = SLSClientWrapper(
+        CredentialWrapper("ak", "sk", str(tmp_path / "missing.json"))
+    )
+    assert wrapper.get_knowledge_config("project1", "logstore1") is None
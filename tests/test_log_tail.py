@@ -0,0 +1,122 @@
+import asyncio
+from types import SimpleNamespace
+
+import aliyun_log_fastpb
+from mcp.server.fastmcp import Context
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.log_tail import LogTailer
+from mcp_server_aliyun_observability.utils import session_key
+
+
+def _log_group_list(*values):
+    group = aliyun_log_fastpb.serialize_log_group(
+        {
+            "LogItems": [
+                {"Time": 1700000000, "Contents": [{"Key": "msg", "Value": value}]}
+                for value in values
+            ],
+            "LogTags": [{"Key": "host", "Value": "h1"}],
+            "Topic": "",
+            "Source": "127.0.0.1",
+        }
+    )
+    return b"\x0a" + bytes([len(group)]) + group
+
+
+class FakeSLSClient:
+    """按 shard 返回预置数据的SLS客户端"""
+
+    def __init__(self, data):
+        self.data = data
+        self.pulled_cursors = []
+
+    def list_shards(self, project, log_store):
+        return SimpleNamespace(body=[SimpleNamespace(shard_id=s) for s in self.data])
+
+    def get_cursor(self, project, log_store, shard_id, request):
+        return SimpleNamespace(body=SimpleNamespace(cursor=f"{shard_id}:0"))
+
+    def execute(self, params, request, runtime):
+        shard, offset = request.query["cursor"].split(":")
+        self.pulled_cursors.append(request.query["cursor"])
+        batches = self.data[int(shard)]
+        offset = int(offset)
+        if offset >= len(batches):
+            return {"headers": {"x-log-cursor": request.query["cursor"]}, "body": b""}
+        return {
+            "headers": {"x-log-cursor": f"{shard}:{offset + 1}"},
+            "body": _log_group_list(*batches[offset]),
+        }
+
+
+def test_tail_resumes_from_saved_cursors():
+    """测试再次跟踪时只拉取新数据"""
+    client = FakeSLSClient({0: [["a", "b"]], 1: [["c"]]})
+    tailer = LogTailer()
+    tail_id, state = tailer.get_session("session", None, ("key",))
+    batches = []
+
+    async def on_batch(batch, total):
+        batches.append((len(batch), total))
+
+    logs = asyncio.run(tailer.tail(client, "p", "l", state, 100, 0, on_batch=on_batch))
+    tailer.save_session("session", tail_id, state)
+    assert sorted(log["msg"] for log in logs) == ["a", "b", "c"]
+    assert logs[0]["__tag__:host"] == "h1"
+    assert batches == [(3, 3)]
+
+    client.data[1].append(["d"])
+    same_id, same_state = tailer.get_session("session", tail_id, ("key",))
+    assert same_id == tail_id
+    logs = asyncio.run(tailer.tail(client, "p", "l", same_state, 100, 0))
+    assert [log["msg"] for log in logs] == ["d"]
+
+    other_id, _ = tailer.get_session("other-session", tail_id, ("key",))
+    assert other_id != tail_id
+
+
+def test_tail_keeps_logs_beyond_max_logs():
+    """测试单个 LogGroup 的日志超过 max_logs 时，多出的日志留到下次调用返回"""
+    client = FakeSLSClient({0: [[str(i) for i in range(5)]]})
+    tailer = LogTailer()
+    tail_id, state = tailer.get_session("session", None, ("key",))
+    totals = []
+
+    async def on_batch(batch, total):
+        totals.append(total)
+
+    logs = asyncio.run(tailer.tail(client, "p", "l", state, 2, 0, on_batch=on_batch))
+    assert [log["msg"] for log in logs] == ["0", "1"]
+    assert totals == [2]
+    tailer.save_session("session", tail_id, state)
+
+    _, state = tailer.get_session("session", tail_id, ("key",))
+    pulled = len(client.pulled_cursors)
+    logs = asyncio.run(tailer.tail(client, "p", "l", state, 2, 0))
+    assert [log["msg"] for log in logs] == ["2", "3"]
+    # 保存的日志足够返回时不再拉取
+    assert len(client.pulled_cursors) == pulled
+
+    client.data[0].append(["5"])
+    logs = asyncio.run(tailer.tail(client, "p", "l", state, 2, 0))
+    assert [log["msg"] for log in logs] == ["4", "5"]
+
+
+def test_session_key_is_stable_per_session():
+    """测试会话标识按会话对象生成，不依赖对象 id"""
+
+    class Session:
+        pass
+
+    def context(session):
+        return Context(
+            request_context=RequestContext(
+                request_id="r", meta=None, session=session, lifespan_context={}
+            )
+        )
+
+    first, second = Session(), Session()
+    assert session_key(context(first)) == session_key(context(first))
+    assert session_key(context(first)) != session_key(context(second))
+    assert session_key(context(None)) == ""
@@ -0,0 +1,179 @@
+import json
+
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.disk_cache import DiskCache
+from mcp_server_aliyun_observability.log_transfer import (_data_member, embed_raw_json,
+                                                          raw_is_empty)
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+CREDENTIAL = CredentialWrapper(
+    access_key_id="standin", access_key_secret="standin", knowledge_config=None
+)
+
+
+@pytest.fixture(scope="module")
+def standin():
+    server = start_standin(StandinConfig(rows=500))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("compression", ["lz4", "zstd", "gzip"])
+def test_compressed_get_logs_matches_plain(standin, compression):
+    from alibabacloud_sls20201230.models import GetLogsRequest
+    from alibabacloud_tea_util import models as util_models
+
+    request = GetLogsRequest(query="*", from_=1700000000, to=1700000900, line=100, offset=50)
+    runtime = util_models.RuntimeOptions()
+    plain = SLSClientWrapper(CREDENTIAL, endpoint=standin.endpoint)
+    expected = plain.get_logs(
+        plain.with_region("cn-hangzhou"), "standin-project-0", "standin-logstore-0", request, runtime
+    )
+    assert len(expected) == 100
+
+    wrapper = SLSClientWrapper(CREDENTIAL, endpoint=standin.endpoint, compression=compression)
+    logs = wrapper.get_logs(
+        wrapper.with_region("cn-hangzhou"), "standin-project-0", "standin-logstore-0", request, runtime
+    )
+    assert logs == expected
+    stats = wrapper.transfer_stats.snapshot()
+    assert stats["requests"] == 1
+    assert stats["wireBytes"] < stats["rawBytes"] / 2
+    assert plain.transfer_stats.snapshot()["requests"] == 0
+
+
+@pytest.mark.asyncio
+async def test_query_tool_uses_compressed_transfer(standin):
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    SLSToolkit(mcp_server)
+    wrapper = SLSClientWrapper(CREDENTIAL, endpoint=standin.endpoint, compression="lz4")
+    context = Context(
+        request_context=RequestContext(
+            request_id="test_request_id",
+            meta=None,
+            session=None,
+            lifespan_context={"sls_client": wrapper},
+        )
+    )
+    before = standin.requests.get("/logstores/standin-logstore-0/logs", 0)
+    result = await mcp_server._tool_manager.get_tool("sls_execute_sql_query").run(
+        {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "query": "*",
+            "fromTimestampInSeconds": 1700000000,
+            "toTimestampInSeconds": 1700000900,
+            "regionId": "cn-hangzhou",
+            "validateQuery": False,
+        },
+        context=context,
+    )
+    assert len(result["data"]) == 100
+    assert result["resource"]["totalRows"] == 500
+    assert standin.requests["/logstores/standin-logstore-0/logs"] == before + 1
+    stats = await mcp_server._tool_manager.get_tool("sls_get_transfer_stats").run({}, context=context)
+    assert stats["compression"] == "lz4"
+    assert stats["requests"] == 1
+    assert stats["savedBytes"] == stats["rawBytes"] - stats["wireBytes"] > 0
+
+
+@pytest.mark.parametrize("compression", [None, "zstd"])
+def test_raw_get_logs_matches_parsed(standin, compression):
+    from alibabacloud_sls20201230.models import GetLogsRequest
+    from alibabacloud_tea_util import models as util_models
+
+    request = GetLogsRequest(query="*", from_=1700000000, to=1700000900, line=100, offset=20)
+    runtime = util_models.RuntimeOptions()
+    wrapper = SLSClientWrapper(CREDENTIAL, endpoint=standin.endpoint, compression=compression)
+    client = wrapper.with_region("cn-hangzhou")
+    raw = wrapper.get_logs_raw(client, "standin-project-0", "standin-logstore-0", request, runtime)
+    assert isinstance(raw, bytes)
+    assert json.loads(raw) == wrapper.get_logs(
+        client, "standin-project-0", "standin-logstore-0", request, runtime
+    )
+
+
+def test_data_member_skips_data_key_inside_meta():
+    body = b'{"meta": {"keys": ["data"], "x": {"y": 1, "data": 2}}, "data": [{"a": "1"}]}'
+    assert _data_member(body) == b'[{"a": "1"}]'
+    assert _data_member(b'{"data": [], "meta": {}}') is None
+    # data 之后还有其他成员时不能截取，包括成员本身也是数组的情况
+    assert _data_member(b'{"meta": {}, "data": [{"a": "1"}], "extra": [1]}') is None
+    assert _data_member(b'{"meta": {}, "data": [[1], [2]], "count": 2}') is None
+    # 字符串中的方括号和转义字符不影响匹配
+    body = b'{"meta": {}, "data": [{"a": "x]\\\\"}, {"b": "[\\"]"}]\n}'
+    assert json.loads(_data_member(body)) == json.loads(body)["data"]
+    assert embed_raw_json({"message": "success"}, "data", b"[1, 2]") == '{"message": "success", "data": [1, 2]}'
+    assert embed_raw_json({}, "data", b"[]") == '{"data": []}'
+
+
+@pytest.mark.asyncio
+async def test_query_tool_raw_result(standin, tmp_path):
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    SLSToolkit(mcp_server)
+
+    def context(server, name):
+        return Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(CREDENTIAL, endpoint=server.endpoint),
+                    "result_cache": DiskCache(str(tmp_path / name)),
+                },
+            )
+        )
+
+    args = {
+        "project": "standin-project-0",
+        "logStore": "standin-logstore-0",
+        "query": "* | select status limit 1000",
+        "fromTimestampInSeconds": 1700000000,
+        "toTimestampInSeconds": 1700000900,
+        "regionId": "cn-hangzhou",
+        "validateQuery": False,
+        "rawResult": True,
+    }
+    tool = mcp_server._tool_manager.get_tool("sls_execute_sql_query")
+    small = start_standin(StandinConfig(rows=80))
+    try:
+        small_context = context(small, "small.sqlite3")
+        text = await tool.run(args, context=small_context)
+        result = json.loads(text)
+        assert result["message"] == "success"
+        assert len(result["data"]) == 80
+        assert "resource" not in result
+
+        # 已结束的时间范围缓存原始字节，再次查询不访问 SLS
+        assert await tool.run(args, context=small_context) == text
+        assert small.requests["/logstores/standin-logstore-0"] == 1
+
+        # 经过 FastMCP 的结果转换，两种返回值都是一段 JSON 文本，没有结构化输出
+        assert tool.fn_metadata.output_schema is None
+        content = await tool.run(args, context=small_context, convert_result=True)
+        assert [item.text for item in content] == [text]
+        content = await tool.run(dict(args, rawResult=False), context=small_context, convert_result=True)
+        assert len(content) == 1
+        assert len(json.loads(content[0].text)["data"]) == 80
+    finally:
+        small.shutdown()
+        small.server_close()
+
+    # 超过内联行数时退回普通结果，通过 resource 分页，不把完整数组内联到响应中
+    result = await tool.run(args, context=context(standin, "large.sqlite3"))
+    assert result["message"] == "success"
+    assert "disabled" in result["rawResult"]
+    assert len(result["data"]) == 100
+    assert result["resource"]["totalRows"] == 500
+
+    # 空数组的判断兼容未归一化的响应体
+    assert raw_is_empty(b"[]") and raw_is_empty(b" [ \n] ") and raw_is_empty(b"null")
+    assert not raw_is_empty(b'[{"status": "200"}]')
@@ -0,0 +1,141 @@
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.query_planner import (
+    DIRECT,
+    REFUSED,
+    SAMPLED,
+    SLICED,
+    QueryPlanner,
+    is_heavy_query,
+)
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+BASE = 1700000000 - 1700000000 % 3600
+BUCKETED = "error | select __time__ - __time__ % 60 as t, count(*) as cnt group by t order by t limit 1000"
+
+
+def _histograms(counts, step=60, progress="Complete"):
+    return [
+        {"from": BASE + i * step, "to": BASE + (i + 1) * step, "count": count, "progress": progress}
+        for i, count in enumerate(counts)
+    ]
+
+
+def test_heavy_query_detection():
+    assert is_heavy_query("* | select status, count(*) group by status")
+    assert is_heavy_query("* | select distinct status")
+    assert not is_heavy_query("error and status: 500")
+    assert not is_heavy_query("* | select status, message limit 10")
+    assert not is_heavy_query("* | where status = 500 | extend cnt = 1")
+
+
+def test_plan_strategies():
+    planner = QueryPlanner(direct_max_rows=100, max_slices=4, max_rows=1000)
+    histograms = _histograms([10] * 60)
+    to_ts = BASE + 3600
+
+    plan = planner.plan(BUCKETED, BASE, to_ts, _histograms([1] * 60))
+    assert plan == {"strategy": DIRECT, "estimatedRows": 60, "complete": True}
+    assert planner.plan("error", BASE, to_ts, histograms)["strategy"] == DIRECT
+
+    # 600 行按每片 100 行需要 6 片，超过 max_slices，退化为抽样
+    plan = planner.plan(BUCKETED, BASE, to_ts, histograms)
+    assert plan["strategy"] == SAMPLED
+
+    planner.max_slices = 8
+    plan = planner.plan(BUCKETED, BASE + 30, to_ts - 15, histograms)
+    assert plan["strategy"] == SLICED
+    slices = plan["slices"]
+    assert len(slices) == 6
+    assert slices[0][0] == BASE + 30 and slices[-1][1] == to_ts - 15
+    assert all(start % 60 == 0 for start, _ in slices[1:])
+    assert all(a[1] == b[0] for a, b in zip(slices, slices[1:]))
+
+    # 不能切片的聚合查询只查询结束时间之前约 direct_max_rows 行
+    plan = planner.plan("* | select status, count(*) group by status", BASE, to_ts, histograms)
+    assert plan["strategy"] == SAMPLED
+    assert plan["sampled"] == {"from": BASE + 3000, "to": to_ts, "estimatedRows": 100, "ratio": 0.1667}
+
+    plan = planner.plan(BUCKETED, BASE, to_ts, _histograms([10] * 59 + [500], progress="Running"))
+    assert plan["strategy"] == REFUSED
+    assert plan["complete"] is False
+    assert plan["hotspots"][0] == {"from": BASE + 3540, "to": to_ts, "count": 500}
+
+    planner.allow_sampling = False
+    plan = planner.plan("* | select status, count(*) group by status", BASE, to_ts, histograms)
+    assert plan["strategy"] == REFUSED
+
+
+def test_slice_order_requires_bucket_ordering():
+    planner = QueryPlanner(direct_max_rows=100)
+    histograms = _histograms([10] * 60)
+    for query in [
+        "* | select __time__ - __time__ % 60 as t, count(*) as cnt group by t order by cnt desc",
+        "* | select __time__ - __time__ % 60, count(*) as cnt group by 1",
+        "* | select __time__ - __time__ % 60 as t, count(*) as cnt",
+    ]:
+        assert planner.plan(query, BASE, BASE + 3600, histograms)["strategy"] == SAMPLED
+
+
+def test_merge_slices():
+    planner = QueryPlanner(direct_max_rows=100)
+    query = "* | select __time__ - __time__ % 60 as t, count(*) as cnt group by t order by t desc limit 3"
+    plan = planner.plan(query, BASE, BASE + 3600, _histograms([10] * 60))
+    results = [[{"t": str(BASE + 60 * i), "cnt": "1"}] for i in range(len(plan["slices"]))]
+    merged = QueryPlanner.merge_slices(plan, results)
+    assert [row["t"] for row in merged] == [str(BASE + 60 * i) for i in (5, 4, 3)]
+
+
+@pytest.mark.asyncio
+async def test_plan_query_tool():
+    standin = start_standin(StandinConfig(rows=5, histogram_rows_per_second=100))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        toolkit = SLSToolkit(mcp_server)
+        toolkit.query_planner = QueryPlanner(direct_max_rows=100_000, max_rows=1_000_000)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("sls_execute_sql_query")
+        arguments = {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "regionId": "cn-hangzhou",
+            "query": BUCKETED,
+            "fromTimestampInSeconds": BASE,
+            "validateQuery": False,
+            "planQuery": True,
+        }
+
+        # 3600 秒 * 100 行 = 36 万行，切分为 4 片并行查询
+        result = await tool.run(dict(arguments, toTimestampInSeconds=BASE + 3600), context=context)
+        assert result["plan"]["strategy"] == SLICED
+        assert result["plan"]["estimatedRows"] == 360000
+        assert len(result["plan"]["slices"]) == 4
+        assert len(result["data"]) == 20
+        assert standin.requests["/logstores/standin-logstore-0"] == 4
+
+        result = await tool.run(
+            dict(arguments, toTimestampInSeconds=BASE + 86400), context=context
+        )
+        assert result["plan"]["strategy"] == REFUSED
+        assert "solution" in result
+        assert standin.requests["/logstores/standin-logstore-0"] == 4
+    finally:
+        standin.shutdown()
+        standin.server_close()
@@ -0,0 +1,127 @@
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.query_validation import validate_query
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (CredentialWrapper,
+                                                   SLSClientWrapper)
+from tests.standin import StandinConfig, start_standin
+
+INDEX = {
+    "status": {"type": "long", "doc_value": True, "alias": "code"},
+    "message": {"type": "text", "doc_value": False},
+    "attributes": {
+        "type": "json",
+        "doc_value": True,
+        "json_keys": {
+            "user_id": {"type": "text", "doc_value": True},
+            "raw": {"type": "text", "doc_value": False},
+        },
+    },
+}
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "* | select status, count(*) as cnt from log group by status order by cnt desc",
+        "* | select code, count(1) c group by code",
+        "* | select __time__ - __time__ % 60 as t, avg(status) from log group by t",
+        '* | select "__tag__:__hostname__", "attributes.user_id"',
+        "* | select date_trunc('minute', __time__) m, transform(array[1], x -> x + 1) group by m",
+        "* | with t as (select status as s from log) select a.s from t a",
+        "* | select cast(status as double), extract(hour from __time__)",
+        "* | select item, count(*) from log cross join unnest(cast(attributes as array(varchar))) as t(item) group by item",
+        "* | select key from log cross join unnest(map_keys(cast(attributes as map(varchar, varchar)))) as t(key)",
+        "* | select map_filter(cast(attributes as map(varchar, bigint)), (k, v) -> v > 0)",
+        "unknown_field: 1",
+        "* | where unknown_field > 1 | extend foo = bar",
+    ],
+)
+def test_valid_queries_unchanged(query):
+    result = validate_query(query, INDEX)
+    assert result == {
+        "query": query,
+        "unknownColumns": [],
+        "noStatisticsColumns": [],
+        "rewrites": [],
+    }
+
+
+def test_invalid_columns_and_rewrites():
+    result = validate_query(
+        "error | select statsu, message, \"attributes.raw\", 'statsu' as s group by statsu", INDEX
+    )
+    assert result["unknownColumns"] == ["statsu"]
+    assert result["noStatisticsColumns"] == ["message", "attributes.raw"]
+
+    result = validate_query(
+        "* | select attributes.user_id, count(*) as pv group by attributes.user_id", INDEX
+    )
+    assert result["query"] == (
+        '* | select "attributes.user_id", count(*) as pv group by "attributes.user_id"'
+    )
+    assert result["rewrites"] == [{"from": "attributes.user_id", "to": '"attributes.user_id"'}]
+
+
+@pytest.mark.asyncio
+async def test_unknown_columns_reported_with_results():
+    standin = start_standin(StandinConfig(rows=5))
+    try:
+        mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+        SLSToolkit(mcp_server)
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        context = Context(
+            request_context=RequestContext(
+                request_id="test_request_id",
+                meta=None,
+                session=None,
+                lifespan_context={
+                    "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                },
+            )
+        )
+        tool = mcp_server._tool_manager.get_tool("sls_execute_sql_query")
+        arguments = {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "fromTimestampInSeconds": 1700000000,
+            "toTimestampInSeconds": 1700000900,
+            "regionId": "cn-hangzhou",
+        }
+        # 索引中不存在的列可能是误报，只提示，仍然执行查询
+        result = await tool.run(
+            dict(arguments, query="* | select statsu, count(*) group by statsu"), context=context
+        )
+        assert result["validation"]["unknownColumns"] == ["statsu"]
+        assert "statsu" in result["validation"]["warning"]
+        assert "data" in result
+        # 查询了一次索引和一次 GetLogs
+        assert sum(standin.requests.values()) == 2
+
+        result = await tool.run(
+            dict(arguments, query="* | select attributes.user_id, status"), context=context
+        )
+        assert result["validation"]["query"] == '* | select "attributes.user_id", status'
+        assert "unknownColumns" not in result["validation"]
+        assert result["data"]
+        # 索引命中缓存
+        assert sum(standin.requests.values()) == 3
+
+        # 未开启统计的列同样只提示，由 SLS 决定查询是否失败
+        result = await tool.run(dict(arguments, query="* | select payload, status"), context=context)
+        assert result["validation"]["noStatisticsColumns"] == ["payload"]
+        assert "payload" in result["validation"]["warning"]
+        assert "data" in result
+        assert sum(standin.requests.values()) == 4
+
+        result = await tool.run(
+            dict(arguments, query="* | select statsu", validateQuery=False), context=context
+        )
+        assert "unknownColumns" not in result
+    finally:
+        standin.shutdown()
+        standin.server_close()
@@ -0,0 +1,95 @@
+import json
+
+import pytest
+from mcp.server.fastmcp import FastMCP
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from mcp_server_aliyun_observability.result_store import (ResultNotFoundError,
+                                                          ResultStore)
+from mcp_server_aliyun_observability.server import create_lifespan
+from mcp_server_aliyun_observability.toolkit.cms_toolkit import CMSToolkit
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import CredentialWrapper
+from tests.standin import StandinConfig, start_standin
+
+
+def test_result_store_pages_and_bounds():
+    now = [0.0]
+    store = ResultStore(inline_rows=2, page_size=3, max_rows=10, ttl=60, clock=lambda: now[0])
+    small = store.offload({"data": [1, 2]})
+    assert "resource" not in small
+
+    result = store.offload({"data": list(range(8))})
+    assert result["data"] == [0, 1]
+    resource = result["resource"]
+    result_id = resource["uri"].rsplit("/", 1)[1]
+    assert resource["totalRows"] == 8
+    assert resource["nextUri"] == f"result://{result_id}/2/3"
+
+    page = store.page(result_id, 2, 3)
+    assert page["rows"] == [2, 3, 4]
+    assert page["nextUri"] == f"result://{result_id}/5/3"
+    assert "nextUri" not in store.page(result_id, 5, 3)
+
+    # 总行数超过 max_rows 时淘汰最久未访问的结果
+    other = store.put(list(range(5)))
+    assert store.total_rows == 5
+    with pytest.raises(ResultNotFoundError):
+        store.page(result_id)
+    assert store.put(list(range(11))) is None
+
+    now[0] += 61
+    with pytest.raises(ResultNotFoundError):
+        store.page(other)
+
+
+@pytest.mark.asyncio
+async def test_large_query_result_read_as_resource():
+    standin = start_standin(StandinConfig(rows=250))
+    try:
+        credential = CredentialWrapper(
+            access_key_id="standin", access_key_secret="standin", knowledge_config=None
+        )
+        mcp_server = FastMCP(
+            name="mcp_aliyun_observability_server",
+            lifespan=create_lifespan(credential, sls_endpoint=standin.endpoint),
+        )
+        SLSToolkit(mcp_server)
+        CMSToolkit(mcp_server)
+        async with create_connected_server_and_client_session(mcp_server._mcp_server) as client:
+            templates = (await client.list_resource_templates()).resourceTemplates
+            assert sorted(template.uriTemplate for template in templates) == [
+                "result://{result_id}",
+                "result://{result_id}/{offset}/{limit}",
+            ]
+            response = await client.call_tool(
+                "sls_execute_sql_query",
+                {
+                    "project": "standin-project-0",
+                    "logStore": "standin-logstore-0",
+                    "query": "* | select status limit 1000",
+                    "fromTimestampInSeconds": 1700000000,
+                    "toTimestampInSeconds": 1700000900,
+                    "regionId": "cn-hangzhou",
+                    "validateQuery": False,
+                },
+            )
+            result = json.loads(response.content[0].text)
+            assert len(result["data"]) == 100
+            assert result["resource"]["totalRows"] == 250
+
+            rows = list(result["data"])
+            uri = result["resource"]["nextUri"]
+            while uri:
+                contents = (await client.read_resource(uri)).contents
+                page = json.loads(contents[0].text)
+                rows += page["rows"]
+                uri = page.get("nextUri")
+            assert len(rows) == 250
+            assert rows[100]["message"].startswith("synthetic log line 100 ")
+
+            first = json.loads((await client.read_resource(result["resource"]["uri"])).contents[0].text)
+            assert first["totalRows"] == 250 and first["offset"] == 0
+    finally:
+        standin.shutdown()
+        standin.server_close()
@@ -0,0 +1,64 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from mcp_server_aliyun_observability import server as server_module
+from mcp_server_aliyun_observability.server import (TOOLKITS,
+                                                    create_result_cache,
+                                                    init_server,
+                                                    parse_toolkits)
+from mcp_server_aliyun_observability.utils import CredentialWrapper
+
+
+def _tool_names(mcp_server):
+    return {tool.name for tool in mcp_server._tool_manager.list_tools()}
+
+
+def test_parse_toolkits():
+    assert parse_toolkits(["sls", " arms.arms_search_apps", "arms.arms_get_application_info", ""]) == {
+        "sls": None,
+        "arms": {"arms_search_apps", "arms_get_application_info"},
+    }
+    assert parse_toolkits(["sls.sls_list_projects", "sls"]) == {"sls": None}
+    with pytest.raises(ValueError, match="unknown toolkit"):
+        parse_toolkits(["foo"])
+
+
+def test_init_server_with_selected_tools():
+    mcp_server = init_server(toolkits=["util", "sls.sls_execute_sql_query"])
+    assert _tool_names(mcp_server) == {
+        "sls_get_regions",
+        "sls_get_current_time",
+        "sls_execute_sql_query",
+    }
+    with pytest.raises(ValueError, match="not found in toolkit sls"):
+        init_server(toolkits=["sls.arms_search_apps"])
+
+
+def test_unselected_toolkits_are_not_imported():
+    code = (
+        "import json, sys\n"
+        "from mcp_server_aliyun_observability.server import init_server\n"
+        "init_server(toolkits=['util'])\n"
+        "print(json.dumps(sorted(m for m in sys.modules if '.toolkit.' in m)))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert json.loads(output.strip().splitlines()[-1]) == [
+        TOOLKITS["util"].split(":")[0]
+    ]
+
+
+def test_result_cache_scoped_by_resolved_identity(tmp_path, monkeypatch):
+    credential = CredentialWrapper(access_key_id="ak-explicit", access_key_secret="sk", knowledge_config=None)
+    assert create_result_cache(credential, str(tmp_path)).scope == "ak-explicit"
+
+    monkeypatch.setattr(server_module, "default_access_key_id", lambda: "ak-default")
+    assert create_result_cache(None, str(tmp_path)).scope == "ak-default"
+
+    # 默认凭证链无法解析时不启用缓存，避免不同身份共享缓存
+    monkeypatch.setattr(server_module, "default_access_key_id", lambda: None)
+    assert create_result_cache(None, str(tmp_path)) is None
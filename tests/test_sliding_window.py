@@ -0,0 +1,91 @@
+import pytest
+
+from mcp_server_aliyun_observability.query_planner import incremental_order
+from mcp_server_aliyun_observability.sliding_window import (
+    BucketedQueryCache,
+    IncrementalQueryError,
+    detect_time_bucket,
+)
+
+BASE = 1700000000 - 1700000000 % 3600
+
+
+def test_detect_time_bucket():
+    """测试从查询语句识别时间桶大小和列名"""
+    assert detect_time_bucket(
+        "* | select __time__ - __time__ % 60 as t, count(*) as cnt group by t"
+    ) == (60, "t")
+    assert detect_time_bucket(
+        "* | select to_unixtime(date_trunc('hour', __time__)) as \"ts\", count(*) group by 1"
+    ) == (3600, "ts")
+    assert detect_time_bucket("* | select count(*)") is None
+
+
+def test_bucketed_query_cache_queries_only_tail():
+    """测试滑动窗口再次查询时只查询尾部窗口"""
+    now = [BASE + 3600 + 30]
+    calls = []
+
+    def execute(start, end, limit):
+        calls.append((start, end))
+        return [{"t": str(t), "cnt": "1"} for t in range(start, end, 60)]
+
+    cache = BucketedQueryCache(settle_seconds=0, clock=lambda: now[0])
+    first = cache.query(execute, ("q",), BASE + 25, now[0], 60, "t")
+    assert calls == [(BASE, now[0])]
+    assert first["data"][0]["t"] == str(BASE)
+    assert first["incremental"]["cached_buckets"] == 0
+
+    calls.clear()
+    now[0] += 300
+    second = cache.query(execute, ("q",), BASE + 325, now[0], 60, "t")
+    assert calls == [(BASE + 3600, now[0])]
+    assert second["incremental"]["cached_buckets"] == 55
+    buckets = [int(row["t"]) for row in second["data"]]
+    assert buckets == list(range(BASE + 300, now[0], 60))
+
+
+def test_bucketed_query_cache_rejects_unaligned_buckets():
+    """测试结果中的时间桶未对齐时抛出异常"""
+    cache = BucketedQueryCache(settle_seconds=0, clock=lambda: BASE + 600)
+    with pytest.raises(IncrementalQueryError):
+        cache.query(lambda s, e, limit: [{"t": str(s + 7)}], ("q",), BASE, BASE + 600, 60, "t")
+
+
+def test_bucketed_query_cache_refuses_truncated_segments():
+    """测试分段查询返回的行数达到 limit 时抛出异常且不缓存"""
+    calls = []
+
+    def execute(start, end, limit):
+        calls.append(limit)
+        # 每个桶两行（如同时按 status 分组），3 小时的 1 分钟桶超过 limit
+        return [{"t": str(t), "cnt": "1"} for t in range(start, end, 60) for _ in range(2)][:limit]
+
+    cache = BucketedQueryCache(settle_seconds=0, rows_per_bucket=1, clock=lambda: BASE + 3 * 3600)
+    with pytest.raises(IncrementalQueryError):
+        cache.query(execute, ("q",), BASE, BASE + 3 * 3600, 60, "t")
+    assert calls == [180]
+    with pytest.raises(IncrementalQueryError):
+        cache.query(execute, ("q",), BASE, BASE + 3 * 3600, 60, "t")
+    assert calls == [180, 180]
+
+    cache = BucketedQueryCache(settle_seconds=0, clock=lambda: BASE + 3 * 3600)
+    result = cache.query(execute, ("q",), BASE, BASE + 3 * 3600, 60, "t", descending=True)
+    assert len(result["data"]) == 360
+    assert int(result["data"][0]["t"]) == BASE + 3 * 3600 - 60
+
+
+def test_incremental_order():
+    """测试增量模式拒绝带 limit 或按其他列排序的查询"""
+    select = "* | select __time__ - __time__ % 60 as t, count(*) as cnt group by t"
+    assert incremental_order(select, "t") is False
+    assert incremental_order(select + " order by t desc", "t") is True
+    for query in [
+        select + " limit 1000",
+        select + " order by t limit 10",
+        select + " order by cnt desc",
+        "* | select * from (" + select + " order by cnt) order by t",
+        "status: 500",
+    ]:
+        with pytest.raises(IncrementalQueryError):
+            incremental_order(query, "t")
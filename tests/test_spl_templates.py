@@ -0,0 +1,32 @@
+import pytest
+
+from mcp_server_aliyun_observability.spl_templates import (
+    SPLTemplate,
+    get_spl_template,
+)
+
+
+def test_render_escapes_single_quotes():
+    """测试PromQL中的单引号会被转义"""
+    spl = get_spl_template("raw-promql-range-template").render(
+        promql="up{job='api'}", step=60
+    )
+    assert "promql_query='up{job=''api''}'" in spl
+    assert "range='60s'" in spl
+
+
+def test_render_validates_params():
+    """测试模板参数缺失或类型错误时抛出异常"""
+    template = get_spl_template("raw-promql-range-template")
+    with pytest.raises(ValueError):
+        template.render(promql="up")
+    with pytest.raises(ValueError):
+        template.render(promql="up", step="1 minute")
+    with pytest.raises(TypeError):
+        template.render(promql=1, step=60)
+
+
+def test_template_declaration_must_match_placeholders():
+    """测试模板占位符与声明的参数不一致时注册失败"""
+    with pytest.raises(ValueError):
+        SPLTemplate("bad", "select <A>, <B>", {"a": "string"})
@@ -0,0 +1,105 @@
+import pytest
+from mcp.server.fastmcp import Context, FastMCP
+from mcp.shared.context import RequestContext
+
+from mcp_server_aliyun_observability.toolkit.arms_toolkit import ArmsToolkit
+from mcp_server_aliyun_observability.toolkit.sls_toolkit import SLSToolkit
+from mcp_server_aliyun_observability.utils import (ArmsClientWrapper,
+                                                   CredentialWrapper,
+                                                   SLSClientWrapper,
+                                                   apply_endpoint)
+from tests.standin import StandinConfig, start_standin
+
+
+@pytest.fixture(scope="module")
+def standin():
+    server = start_standin(StandinConfig(rows=20, apps=5))
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mcp_server():
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    SLSToolkit(mcp_server)
+    ArmsToolkit(mcp_server)
+    return mcp_server
+
+
+@pytest.fixture
+def standin_context(standin):
+    """将 SLS/ARMS 客户端指向本地替身服务的Context"""
+    credential = CredentialWrapper(
+        access_key_id="standin", access_key_secret="standin", knowledge_config=None
+    )
+    return Context(
+        request_context=RequestContext(
+            request_id="test_request_id",
+            meta=None,
+            session=None,
+            lifespan_context={
+                "sls_client": SLSClientWrapper(credential, endpoint=standin.endpoint),
+                "arms_client": ArmsClientWrapper(credential, endpoint=standin.endpoint),
+            },
+        )
+    )
+
+
+@pytest.mark.asyncio
+async def test_sls_tools_against_standin(mcp_server, standin_context, standin):
+    tool = mcp_server._tool_manager.get_tool("sls_list_projects")
+    projects = await tool.run(
+        {"projectName": "standin", "limit": 5, "regionId": "cn-hangzhou"},
+        context=standin_context,
+    )
+    assert len(projects["projects"]) == 5
+    assert projects["projects"][0]["project_name"] == "standin-project-0"
+
+    tool = mcp_server._tool_manager.get_tool("sls_execute_sql_query")
+    logs = await tool.run(
+        {
+            "project": "standin-project-0",
+            "logStore": "standin-logstore-0",
+            "query": "*",
+            "fromTimestampInSeconds": 1700000000,
+            "toTimestampInSeconds": 1700000900,
+            "limit": 10,
+            "regionId": "cn-hangzhou",
+        },
+        context=standin_context,
+    )
+    assert len(logs["data"]) == 20
+    assert standin.requests["/logstores/standin-logstore-0"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_arms_tools_against_standin(mcp_server, standin_context):
+    tool = mcp_server._tool_manager.get_tool("arms_search_apps")
+    result = await tool.run(
+        {"appNameQuery": "standin-app", "regionId": "cn-hangzhou"},
+        context=standin_context,
+    )
+    assert result["total"] == 5
+
+
+def test_apply_endpoint_proxy_is_explicit():
+    """测试只有 proxy:// 协议的 endpoint 按 HTTP 代理访问，IP 地址按给定协议直接访问"""
+    from alibabacloud_tea_openapi import models as open_api_models
+
+    default = "cn-hangzhou.log.aliyuncs.com"
+    config = open_api_models.Config()
+    apply_endpoint(config, "https://10.0.0.8:443", "cn-hangzhou", default)
+    assert (config.protocol, config.endpoint, config.http_proxy) == ("https", "10.0.0.8:443", None)
+
+    config = open_api_models.Config()
+    apply_endpoint(config, "proxy://127.0.0.1:18080", "cn-hangzhou", default)
+    assert (config.protocol, config.endpoint, config.http_proxy) == (
+        "http",
+        default,
+        "http://127.0.0.1:18080",
+    )
+
+    config = open_api_models.Config()
+    apply_endpoint(config, "{region}-intranet.log.aliyuncs.com", "cn-beijing", default)
+    assert config.endpoint == "cn-beijing-intranet.log.aliyuncs.com"
@@ -0,0 +1,36 @@
+import json
+import subprocess
+import sys
+
+
+def test_init_server_does_not_import_sdk():
+    """注册工具时不应导入阿里云 SDK，SDK 在首次调用工具时才加载"""
+    code = (
+        "import json, sys\n"
+        "from mcp_server_aliyun_observability.server import init_server\n"
+        "init_server()\n"
+        "print(json.dumps(sorted(m for m in sys.modules "
+        "if m.startswith(('alibabacloud_', 'Tea', 'darabonba')))))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert json.loads(output.strip().splitlines()[-1]) == []
+
+
+def test_logger_handlers_created_on_first_record(tmp_path):
+    """导入 logger 时不创建日志处理器，输出第一条日志时才创建（stderr 和文件两个处理器）"""
+    code = (
+        "from mcp_server_aliyun_observability.logger import logger, log_info\n"
+        "print(len(logger.handlers))\n"
+        "log_info('hello')\n"
+        "print(len(logger.handlers))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={"HOME": str(tmp_path), "PATH": ""},
+    ).stdout
+    assert output.split() == ["0", "2"]
@@ -0,0 +1,67 @@
+import pytest
+from mcp import types
+from mcp.server.fastmcp import FastMCP
+
+from mcp_server_aliyun_observability.server import init_server
+from mcp_server_aliyun_observability.tool_catalog import (ToolCatalog,
+                                                          compact_description)
+
+DUMP_OPTIONS = {"by_alias": True, "mode": "json", "exclude_none": True}
+
+
+def test_compact_description():
+    description = """查询日志。
+
+            ## 功能概述
+
+            在指定日志库上执行查询。
+            返回查询结果。
+
+            ## 使用场景
+
+            - 当需要查询日志时
+
+            Args:
+                query: 查询语句
+            """
+    assert compact_description(description) == "查询日志。\n\n在指定日志库上执行查询。\n返回查询结果。"
+
+
+@pytest.mark.asyncio
+async def test_catalog_rebuilds_only_on_registration_change():
+    mcp_server = init_server(toolkits=["util", "sls"])
+    catalog = ToolCatalog(mcp_server)
+
+    first = await catalog.result()
+    second = await catalog.result()
+    assert first is second
+    assert catalog.builds == 1
+    assert first.model_dump(**DUMP_OPTIONS) == types.ServerResult(first.root).model_dump(
+        **DUMP_OPTIONS
+    )
+
+    mcp_server.remove_tool("sls_get_regions")
+    third = await catalog.result()
+    assert catalog.builds == 2
+    assert "sls_get_regions" not in {tool.name for tool in third.root.tools}
+
+
+@pytest.mark.asyncio
+async def test_installed_catalog_serves_tools_list():
+    mcp_server = init_server(toolkits=["util"], compact_tool_descriptions=True)
+    handler = mcp_server._mcp_server.request_handlers[types.ListToolsRequest]
+    result = await handler(types.ListToolsRequest(method="tools/list"))
+    descriptions = {tool.name: tool.description for tool in result.root.tools}
+    assert descriptions["sls_get_current_time"].startswith("获取当前时间。")
+    assert "使用场景" not in descriptions["sls_get_current_time"]
+
+
+def test_catalog_skips_install_without_mcp_internals():
+    mcp_server = FastMCP(name="mcp_aliyun_observability_server")
+    lowlevel = mcp_server._mcp_server
+    default_handler = lowlevel.request_handlers[types.ListToolsRequest]
+    del lowlevel._tool_cache
+    catalog = ToolCatalog(mcp_server)
+    assert not catalog.supported()
+    catalog.install()
+    assert lowlevel.request_handlers[types.ListToolsRequest] is default_handler
@@ -0,0 +1,118 @@
+import pytest
+
+from mcp_server_aliyun_observability.trace_analysis import (
+    analyze_trace, analyze_traces, build_batch_trace_query, build_trace_query)
+
+MS = 1_000_000
+
+
+def _span(span_id, parent_id, service, start_ms, duration_ms, status="0", trace_id="t1"):
+    # startTime 为微秒，duration 为纳秒
+    return {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "parentSpanId": parent_id,
+        "serviceName": service,
+        "spanName": f"{service}/{span_id}",
+        "startTime": str(1_700_000_000_000_000 + start_ms * 1000),
+        "duration": str(duration_ms * MS),
+        "statusCode": status,
+    }
+
+
+def test_build_trace_query():
+    assert build_trace_query("abc-1", 100).startswith('traceId: "abc-1" | select traceId, spanId')
+    with pytest.raises(ValueError):
+        build_trace_query('abc" or *', 100)
+
+
+def test_analyze_trace():
+    logs = [
+        _span("a", "", "gateway", 0, 100),
+        # b、c 部分重叠，c 结束更晚，b 只有 c 开始前的部分位于关键路径上
+        _span("b", "a", "order", 10, 30),
+        _span("c", "a", "user", 20, 60),
+        _span("d", "c", "db", 30, 40, status="2"),
+        _span("e", "missing", "payment", 0, 5),
+        _span("e", "missing", "payment", 0, 5),
+    ]
+    result = analyze_trace(logs)
+
+    assert result["spanCount"] == 5
+    assert result["durationMs"] == 100
+    assert [(span["spanId"], span["criticalMs"]) for span in result["criticalPath"]] == [
+        ("a", 30),
+        ("b", 10),
+        ("c", 20),
+        ("d", 40),
+    ]
+    self_times = {stats["serviceName"]: stats["selfTimeMs"] for stats in result["services"]}
+    assert self_times == {"gateway": 30, "order": 30, "user": 20, "db": 40, "payment": 5}
+    assert result["services"][0]["serviceName"] == "db"
+    assert [span["spanId"] for span in result["errorSpans"]] == ["d"]
+    assert result["brokenLinks"]["rootCount"] == 1
+    assert result["brokenLinks"]["orphanCount"] == 1
+    assert result["brokenLinks"]["orphanSpans"][0]["parentSpanId"] == "missing"
+    assert result["brokenLinks"]["duplicateSpanCount"] == 1
+
+
+def test_analyze_deep_trace():
+    logs = [_span(f"s{i}", f"s{i - 1}" if i else "", "svc", i, 5000 - 2 * i) for i in range(2000)]
+    result = analyze_trace(logs, top=5)
+    assert result["spanCount"] == 2000
+    assert len(result["criticalPath"]) == 5
+
+
+def test_build_batch_trace_query():
+    query = build_batch_trace_query(["t1", "t2", "t1"], 1000)
+    assert query.startswith('traceId: "t1" or traceId: "t2" | select ')
+    assert query.endswith("where traceId in ('t1', 't2') limit 1000")
+    with pytest.raises(ValueError):
+        build_batch_trace_query(["t1", "t2') or 1=1 --"], 1000)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_analyze_traces(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    logs = []
+    for i in range(10):
+        trace_id = f"t{i}"
+        # t7 的 db 查询明显偏慢
+        db_ms = 200 if i == 7 else 20 + i
+        logs.append(_span("root", "", "gateway", 0, 50 + db_ms, trace_id=trace_id))
+        logs.append(_span("db", "root", "mysql", 10, db_ms, status="2" if i == 3 else "0", trace_id=trace_id))
+    logs.append(dict(logs[0]))
+
+    result = analyze_traces(logs, trace_ids=["t0", "t7", "t99"], use_numpy=use_numpy)
+    assert result["vectorized"] is use_numpy
+    assert result["traceCount"] == 10
+    assert result["spanCount"] == 20
+    assert result["missingTraceIds"] == ["t99"]
+    assert result["traces"][0] == {"traceId": "t7", "spanCount": 2, "errorCount": 0, "durationMs": 250}
+
+    mysql = next(service for service in result["services"] if service["serviceName"] == "mysql")
+    assert mysql["spanCount"] == 10
+    assert mysql["errorCount"] == 1
+    assert mysql["p50Ms"] == 24
+    assert mysql["p99Ms"] == 29
+    assert mysql["maxMs"] == 200
+
+    outliers = [(span["traceId"], span["spanId"]) for span in result["outlierSpans"]]
+    assert outliers == [("t7", "db"), ("t7", "root")]
+    assert result["outlierSpans"][0]["medianMs"] == 24.5
+
+
+def test_analyze_traces_numpy_matches_python():
+    pytest.importorskip("numpy")
+    logs = [
+        _span(f"s{j}", "", f"svc{j % 3}", j, 100 + (i * 7919 + j * 104729) % 97 + (900 if i % 17 == 0 else 0), trace_id=f"t{i}")
+        for i in range(50)
+        for j in range(20)
+    ]
+    vectorized = analyze_traces(logs, use_numpy=True, top=1000)
+    vectorized.pop("vectorized")
+    fallback = analyze_traces(logs, use_numpy=False, top=1000)
+    fallback.pop("vectorized")
+    assert vectorized["outlierSpans"]
+    assert vectorized == fallback
@@ -0,0 +1,120 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+from mcp import ClientSession
+from mcp.client.streamable_http import streamable_http_client
+
+from mcp_server_aliyun_observability.workers import (WorkerMetrics,
+                                                     WorkerRouter,
+                                                     session_owner,
+                                                     worker_session_id)
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+
+
+def _text_app(text: str):
+    async def app(scope, receive, send):
+        if scope["type"] != "http":
+            return
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"x-worker", text.encode())]})
+        await send({"type": "http.response.body", "body": text.encode()})
+
+    return app
+
+
+def test_session_id_encodes_worker():
+    session_id = worker_session_id(3)
+    assert session_owner(session_id.hex, 4) == 3
+    assert session_owner(session_id.hex, 2) is None
+    assert session_owner("not-hex", 4) is None
+    assert session_owner(None, 4) is None
+
+
+@pytest.mark.asyncio
+async def test_router_forwards_to_session_owner(tmp_path):
+    socket_paths = [str(tmp_path / "worker-0.sock"), str(tmp_path / "worker-1.sock")]
+    owner = uvicorn.Server(uvicorn.Config(_text_app("worker-1"), uds=socket_paths[1], log_level="warning"))
+    thread = threading.Thread(target=owner.run, daemon=True)
+    thread.start()
+    while not owner.started:
+        await asyncio.sleep(0.01)
+    try:
+        metrics = WorkerMetrics(2)
+        router = WorkerRouter(_text_app("worker-0"), 0, socket_paths, metrics)
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=router), base_url="http://test"
+        ) as client:
+            remote = worker_session_id(1).hex
+            assert (await client.post("/mcp", headers={"mcp-session-id": remote})).text == "worker-1"
+            assert (await client.post(f"/messages/?session_id={remote}")).text == "worker-1"
+            local = worker_session_id(0).hex
+            assert (await client.post("/mcp", headers={"mcp-session-id": local})).text == "worker-0"
+            assert (await client.post("/mcp")).text == "worker-0"
+            # 已转发的请求不会再次转发
+            response = await client.post(
+                "/mcp", headers={"mcp-session-id": remote, "x-mcp-forwarded-by": "1"}
+            )
+            assert response.text == "worker-0"
+            total = (await client.get("/metrics")).json()["total"]
+        assert total == {"requests": 3, "active": 0, "forwarded": 2, "errors": 0, "sessions": 0}
+    finally:
+        owner.should_exit = True
+        thread.join(5)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _call_tool(url: str) -> bool:
+    async with streamable_http_client(url) as (read_stream, write_stream, _):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+            result = await session.call_tool("sls_get_current_time", {})
+            return result.isError
+
+
+@pytest.mark.asyncio
+async def test_streamable_http_workers_end_to_end():
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "mcp_server_aliyun_observability",
+            "--transport", "streamable-http", "--workers", "2", "--host", "127.0.0.1",
+            "--transport-port", str(port), "--toolkits", "util",
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                metrics = httpx.get(f"{base_url}/metrics").json()
+                if all(row["pid"] for row in metrics["workers"]):
+                    break
+            except httpx.HTTPError:
+                pass
+            assert time.monotonic() < deadline, "workers did not start"
+            await asyncio.sleep(0.2)
+
+        errors = await asyncio.gather(*[_call_tool(f"{base_url}/mcp") for _ in range(6)])
+        assert errors == [False] * 6
+        metrics = httpx.get(f"{base_url}/metrics").json()
+        assert len({row["pid"] for row in metrics["workers"]}) == 2
+        assert metrics["total"]["sessions"] == 6
+        assert metrics["total"]["errors"] == 0
+    finally:
+        process.terminate()
+        process.wait(30)